@@ -0,0 +1,78 @@
+"""Cold-start time of each CLI subcommand.
+
+Every subcommand runs in a fresh interpreter with -X importtime on a seeded
+SQLite database. Prints the best wall time and import time over REPEAT runs.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/cli_startup.py [REPEAT]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import script_args, temp_url
+
+COMMANDS = {
+    "--help": ["--help"],
+    "todo": ["todo", "--limit", "10"],
+    "get": ["get", "-t", "1"],
+    "add": ["add", "-t", "Task", "-d", "01/01/2100"],
+    "done": ["done", "1"],
+    "remove": ["remove", "2"],
+    "texport": ["texport", "-f", "bench.csv"],
+}
+
+
+def cli(*args: str, env: dict, importtime: bool = False) -> subprocess.CompletedProcess:
+    """Run the CLI in a new interpreter."""
+    return subprocess.run(
+        [sys.executable]
+        + (["-X", "importtime"] if importtime else [])
+        + ["-c", "from views.cli import cli; cli()", *args],
+        env=env,
+        cwd=env["BENCH_DIR"],
+        capture_output=True,
+        text=True,
+        input="y\n",
+        check=False,
+    )
+
+
+def import_time(stderr: str) -> float:
+    """Sum the cumulative time of the top-level imports of a -X importtime output."""
+    total = 0
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if not name.startswith("  ") and cumulative.strip().isdigit():
+                total += int(cumulative)
+    return total / 1000
+
+
+if __name__ == "__main__":
+    (REPEAT,) = script_args(5)
+    directory = tempfile.mkdtemp()
+    ENV = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(sys.path),
+        "TASKS_DATABASE_URL": temp_url(directory=directory),
+        "TASKS_DEBUG": "False",
+        "BENCH_DIR": directory,
+    }
+    cli("init-db", env=ENV)
+    for _ in range(REPEAT * 2 + 2):
+        cli(*COMMANDS["add"], env=ENV)
+
+    for name, args in COMMANDS.items():
+        walls, imports = [], []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            result = cli(*args, env=ENV, importtime=True)
+            walls.append(time.perf_counter() - start)
+            imports.append(import_time(result.stderr))
+        print(
+            f"{name:<8} wall {min(walls) * 1000:7.1f} ms  "
+            f"imports {min(imports):7.1f} ms"
+        )
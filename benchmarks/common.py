@@ -0,0 +1,51 @@
+"""Setup shared by the benchmark scripts: a temporary SQLite database and the
+positional arguments of the command line.
+
+Import it before models, whose engine is built from the environment:
+    from benchmarks.common import script_args, temp_database
+    DIRECTORY = temp_database(unset=["TASKS_CACHE_SIZE"])
+"""
+
+import os
+import sys
+import tempfile
+
+
+def temp_url(name: str = "bench.db", directory: str = None) -> str:
+    """Get the URL of a new SQLite database.
+    Args:
+        name (str): The file name of the database.
+        directory (str): Its directory, a new temporary one by default.
+    Returns:
+        str: The database URL."""
+    return f"sqlite:///{os.path.join(directory or tempfile.mkdtemp(), name)}"
+
+
+def temp_database(name: str = "bench.db", unset: list[str] = ()) -> str:
+    """Configure the app for a benchmark: a new SQLite database in a temporary
+    directory, no SQL logging, and the given variables unset.
+    Args:
+        name (str): The file name of the database.
+        unset (list[str]): The environment variables to remove.
+    Returns:
+        str: The temporary directory, for the other files of the benchmark."""
+    directory = tempfile.mkdtemp()
+    os.environ["TASKS_DATABASE_URL"] = temp_url(name, directory)
+    os.environ["TASKS_DEBUG"] = "False"
+    for variable in unset:
+        os.environ.pop(variable, None)
+    return directory
+
+
+def script_args(*defaults: object) -> list:
+    """Get the positional arguments of the script, each one converted to the
+    type of its default, the default if it is not given.
+    Args:
+        defaults (object): The default of each argument, in order.
+    Returns:
+        list: The arguments."""
+    given = sys.argv[1:]
+    return [
+        type(default)(given[i]) if i < len(given) else default
+        for i, default in enumerate(defaults)
+    ]
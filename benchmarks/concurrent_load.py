@@ -0,0 +1,74 @@
+"""Concurrent read/write load on SQLite, for each SQLITE_PROFILES entry.
+
+Reader threads list pages of tasks while writer threads add tasks, as
+concurrent Flask workers would. Prints the throughput and the number of
+"database is locked" errors for each profile.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/concurrent_load.py [SECONDS] [READERS] [WRITERS]
+"""
+
+import os
+import threading
+import time
+from datetime import date
+from benchmarks.common import script_args, temp_url
+
+os.environ["TASKS_DEBUG"] = "False"
+os.environ.setdefault("TASKS_DATABASE_URL", "sqlite://")
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from models import tasks as models  # noqa: E402
+
+
+def worker(func, stop: threading.Event, counts: dict, key: str) -> None:
+    """Call `func` until `stop` is set, counting successes and lock errors."""
+    while not stop.is_set():
+        try:
+            func()
+            counts[key] += 1
+        except OperationalError:
+            counts["locked"] += 1
+
+
+def run(profile: str, seconds: float, readers: int, writers: int) -> None:
+    """Run the load on a fresh database using the given pragma profile."""
+    url = temp_url()
+    models.engine = models.build_engine(url, profile, pool_size=readers + writers)
+    models.create_database(force=True)
+    for _ in range(10):
+        models.add_task("seed", date(2030, 1, 1))
+
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(lambda: models.query_tasks(limit=50), stop, counts, "reads"),
+        )
+        for _ in range(readers)
+    ] + [
+        threading.Thread(
+            target=worker,
+            args=(lambda: models.add_task("task", date(2030, 1, 1)), stop, counts, "writes"),
+        )
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    models.engine.dispose()
+
+    print(
+        f"{profile:<12} reads/s {counts['reads'] / seconds:10.0f}  "
+        f"writes/s {counts['writes'] / seconds:8.0f}  locked {counts['locked']}"
+    )
+
+
+if __name__ == "__main__":
+    SECONDS, READERS, WRITERS = script_args(5.0, 8, 2)
+    for name in models.SQLITE_PROFILES:
+        run(name, SECONDS, READERS, WRITERS)
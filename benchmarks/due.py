@@ -0,0 +1,102 @@
+"""Latency of the due tasks and of the reminders scheduler.
+
+Seeds ROWS tasks ending from a year ago to a year ahead, most of the past
+ones done, then times QUERIES runs of the first page (50 tasks) of the tasks
+due within 3 days, as models.scheduler.due_tasks() queries it:
+    done_end_date  the (list_id, done, end_date) index, the default
+    end_date       the (list_id, end_date) index
+    scan           no index, a scan of the table
+and prints the p50 and p99 latencies. The cache is disabled. Then times the
+load of a Scheduler and a poll() after CHANGES edits of end dates.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/due.py [ROWS] [QUERIES] [CHANGES]
+"""
+
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args, temp_database
+
+temp_database(unset=["TASKS_CACHE_SIZE", "TASKS_WRITE_BEHIND_DELAY"])
+
+from models import tasks as models  # noqa: E402
+from models import scheduler  # noqa: E402
+
+WITHIN = timedelta(days=3)
+INDEXES = {
+    "done_end_date": "INDEXED BY ix_tasks_list_id_done_end_date",
+    "end_date": "INDEXED BY ix_tasks_list_id_end_date",
+    "scan": "NOT INDEXED",
+}
+
+
+def seed(rows: int) -> None:
+    """Fill the database with tasks, 90% of the past ones and 10% of the
+    next ones done."""
+    rng = random.Random(0)
+    today = date.today()
+    for start in range(0, rows, 10_000):
+        tasks = []
+        for i in range(start, min(start + 10_000, rows)):
+            days = rng.randint(-365, 365)
+            done = rng.random() < (0.9 if days < 0 else 0.1)
+            end_date = today + timedelta(days=days)
+            tasks.append(models.Task(None, f"Task {i}", end_date, done, uuid.uuid4()))
+        models.add_tasks(tasks)
+
+
+def due_sql(hint: str) -> str:
+    """The SQL of the first page of due_tasks(), with an index hint."""
+    stmt, _ = models._query_stmt(
+        done=False, end_to=date.today() + WITHIN, order_by="end_date", limit=50
+    )
+    sql = str(stmt.compile(models.get_engine(), compile_kwargs={"literal_binds": True}))
+    return sql.replace("FROM tasks", f"FROM tasks {hint}", 1)
+
+
+def percentiles(sql: str, count: int) -> tuple[float, float]:
+    """The p50 and p99 latencies of a statement, in milliseconds."""
+    times = []
+    with models.get_engine().connect() as connection:
+        for _ in range(count):
+            start = time.perf_counter()
+            connection.exec_driver_sql(sql).fetchall()
+            times.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(times, n=100)
+    return cuts[49], cuts[98]
+
+
+if __name__ == "__main__":
+    ROWS, COUNT, CHANGES = script_args(1_000_000, 200, 100)
+    models.create_database(force=True)
+    seed(ROWS)
+
+    for name, hint in INDEXES.items():
+        p50, p99 = percentiles(due_sql(hint), COUNT)
+        print(f"due within 3d  {name:<14} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+    reminders = scheduler.Scheduler(lead=WITHIN)
+    start = time.perf_counter()
+    reminders.catch_up()
+    print(
+        f"scheduler load  {len(reminders.pending)} tasks in "
+        f"{time.perf_counter() - start:.2f} s"
+    )
+    start = time.perf_counter()
+    events = reminders.poll()
+    print(f"first poll      {len(events)} events in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(1)
+    for task_id in rng.sample(range(1, ROWS + 1), CHANGES):
+        task = models.Task(*models.get_task(task_id))
+        task.end_date = date.today() + timedelta(days=rng.randint(1, 3))
+        models.edit_task(task_id, task)
+    start = time.perf_counter()
+    events = reminders.poll()
+    print(
+        f"poll after {CHANGES} edits  {len(events)} events in "
+        f"{(time.perf_counter() - start) * 1000:.1f} ms"
+    )
@@ -0,0 +1,44 @@
+"""Benchmark the bulk CSV import against the per-row add_task path.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/import_csv.py [ROWS]
+"""
+
+import time
+import uuid
+from benchmarks.common import script_args, temp_database
+
+temp_database()
+
+from models import tasks as models  # noqa: E402
+from services import csv_manager as services  # noqa: E402
+
+
+def make_csv(rows: int) -> str:
+    """Build a CSV export with `rows` random tasks."""
+    lines = ["id,task,end_date,done,guid"]
+    for i in range(rows):
+        lines.append(f"{i},Task {i},2030-01-01,{i % 2 == 0},{uuid.uuid4()}")
+    return "\n".join(lines) + "\n"
+
+
+def per_row(content: str) -> None:
+    """The previous import path: one add_task call (one transaction) per row."""
+    for line in content.splitlines()[1:]:
+        models.add_task(*line.split(",")[1:])
+
+
+def bench(name: str, func, content: str, rows: int) -> None:
+    """Time `func` on a fresh database and print rows/sec."""
+    models.create_database(force=True)
+    start = time.perf_counter()
+    func(content)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {rows:>8} rows  {elapsed:8.3f} s  {rows / elapsed:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    (ROWS,) = script_args(10_000)
+    CONTENT = make_csv(ROWS)
+    bench("per-row", per_row, CONTENT, ROWS)
+    bench("bulk", services.import_tasks, CONTENT, ROWS)
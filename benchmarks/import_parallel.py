@@ -0,0 +1,87 @@
+"""Benchmark the parallel CSV import of large files.
+
+Writes a CSV file of ROWS tasks, then times, on a fresh database:
+    - import_tasks() on the whole decoded file,
+    - import_file() with one process and with WORKERS processes,
+and, without the database, the parsing and validation alone. Prints the
+rows/sec, and the peak memory of the main process, of each.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/import_parallel.py [ROWS] [WORKERS]
+"""
+
+import os
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.common import script_args, temp_database
+
+DIRECTORY = temp_database()
+
+from models import tasks as models  # noqa: E402
+from services import csv_manager as services  # noqa: E402
+
+PATH = os.path.join(DIRECTORY, "tasks.csv")
+
+
+def make_csv(rows: int) -> None:
+    """Write a CSV export with `rows` random tasks to PATH."""
+    with open(PATH, "w", encoding="utf-8") as f:
+        f.write("id,task,end_date,done,guid\n")
+        for i in range(rows):
+            f.write(f"{i},Task {i},2030-01-01,{i % 2 == 0},{uuid.uuid4()}\n")
+
+
+def import_file(workers: int) -> None:
+    """The import_file() path, with `workers` processes."""
+    services.import_file(PATH, workers)
+
+
+def import_content(_: int) -> None:
+    """The import_tasks() path, the whole file decoded in memory."""
+    with open(PATH, encoding="utf-8", newline="") as f:
+        services.import_tasks(f.read())
+
+
+def parse_only(workers: int) -> None:
+    """Split, parse and validate the file, without inserting the rows."""
+    ranges = services._split_ranges(PATH, services.BLOCK_SIZE)
+    if workers == 1:
+        for r in ranges:
+            services._parse_range(PATH, *r)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        for _ in services._parse_ranges(pool, PATH, ranges, workers * 2):
+            pass
+
+
+def bench(name: str, func, argument: int, rows: int) -> None:
+    """Time `func` on a fresh database and print rows/sec, then run it again
+    under tracemalloc for its peak memory."""
+    models.create_database(force=True)
+    start = time.perf_counter()
+    func(argument)
+    elapsed = time.perf_counter() - start
+
+    models.create_database(force=True)
+    tracemalloc.start()
+    func(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{name:<24} {rows / elapsed:10.0f} rows/s  "
+        f"peak {peak / 2**20:7.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    ROWS, WORKERS = script_args(500_000, os.cpu_count())
+    make_csv(ROWS)
+    print(f"{os.path.getsize(PATH) / 2**20:.1f} MiB, {WORKERS} workers")
+
+    bench("import_tasks", import_content, 0, ROWS)
+    bench("import_file 1 process", import_file, 1, ROWS)
+    bench(f"import_file {WORKERS} processes", import_file, WORKERS, ROWS)
+    bench("parse 1 process", parse_only, 1, ROWS)
+    bench(f"parse {WORKERS} processes", parse_only, WORKERS, ROWS)
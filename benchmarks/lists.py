@@ -0,0 +1,108 @@
+"""Latency of a small list of tasks next to a large one.
+
+Seeds a "big" list of ROWS tasks and a "small" list of 1000 tasks, then
+times QUERIES first pages (50 not done tasks by end date) and additions of
+a task on the small list, while a thread adds batches of 100 tasks to the
+big list, in both modes:
+    shared   both lists in one database, by their list_id
+    sharded  each list in its own database, see models.shards.ShardRouter
+and prints the p50 and p99 latencies. The cache is disabled.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/lists.py [ROWS] [QUERIES] [PROFILE]
+"""
+
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args, temp_database
+
+ROWS, COUNT, PROFILE = script_args(1_000_000, 200, "performance")
+DIRECTORY = temp_database(
+    "shared.db",
+    unset=["TASKS_SHARDS_DIR", "TASKS_CACHE_SIZE", "TASKS_WRITE_BEHIND_DELAY"],
+)
+os.environ["TASKS_SQLITE_PROFILE"] = PROFILE
+
+from models import tasks as models  # noqa: E402
+from models import shards  # noqa: E402
+
+
+def make_tasks(count: int, rng: random.Random) -> list[models.Task]:
+    """Build tasks ending within a year, a third of them done."""
+    return [
+        models.Task(
+            None,
+            f"Task {rng.random():.6f}",
+            date.today() + timedelta(days=rng.randint(0, 365)),
+            rng.random() < 0.3,
+            uuid.uuid4(),
+        )
+        for _ in range(count)
+    ]
+
+
+def seed(rows: int) -> None:
+    """Fill the big and the small lists of the current mode."""
+    rng = random.Random(0)
+    with models.use_list("big"):
+        for start in range(0, rows, 10_000):
+            models.add_tasks(make_tasks(min(10_000, rows - start), rng))
+    with models.use_list("small"):
+        models.add_tasks(make_tasks(1000, rng))
+
+
+def percentiles(times: list[float]) -> tuple[float, float]:
+    """The p50 and p99 of latencies, in milliseconds."""
+    cuts = statistics.quantiles([t * 1000 for t in times], n=100)
+    return cuts[49], cuts[98]
+
+
+def measure(count: int) -> dict:
+    """Time the small list while a thread writes to the big one."""
+    stop = threading.Event()
+
+    def write_big() -> None:
+        rng = random.Random(1)
+        with models.use_list("big"):
+            while not stop.is_set():
+                models.add_tasks(make_tasks(100, rng))
+
+    writer = threading.Thread(target=write_big)
+    writer.start()
+    times = {"list": [], "add": []}
+    try:
+        with models.use_list("small"):
+            for i in range(count):
+                start = time.perf_counter()
+                models.query_tasks(done=False, order_by="end_date", limit=50)
+                times["list"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                models.add_task(f"Small {i}", date.today())
+                times["add"].append(time.perf_counter() - start)
+    finally:
+        stop.set()
+        writer.join()
+    return {name: percentiles(values) for name, values in times.items()}
+
+
+if __name__ == "__main__":
+    profile = os.environ["TASKS_SQLITE_PROFILE"]
+
+    models.create_database(force=True)
+    seed(ROWS)
+    results = {"shared": measure(COUNT)}
+
+    models.engine.dispose()
+    models.engine = None
+    shards.router = shards.ShardRouter(os.path.join(DIRECTORY, "shards"), profile)
+    seed(ROWS)
+    results["sharded"] = measure(COUNT)
+
+    for mode, timings in results.items():
+        for name, (p50, p99) in timings.items():
+            print(f"small {name:<4} {mode:<8} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
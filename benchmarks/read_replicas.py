@@ -0,0 +1,159 @@
+"""Read throughput with read replicas, under a mixed load.
+
+Seeds ROWS tasks, then for DURATION seconds READERS threads get a task or
+the first page of the not done tasks, while WRITERS threads edit a task of
+their own and read it back at once. Runs with the reads sent to:
+    primary   the primary database only
+    ro        a read-only connection on the primary (mode=ro)
+    1 replica, 2 replicas
+              copies of the primary, refreshed every LAG seconds by a thread
+              with the SQLite backup API, a stand-in for the replication
+and prints the reads and writes per second, and the writes a writer did not
+read back (the read pin, see models.replicas.pin_reads(), keeps them at 0).
+The cache is disabled.
+
+The SQLite profile (see TASKS_SQLITE_PROFILE) decides what the replicas
+save: with "default", a write locks the primary against its readers, with
+"performance" (WAL), it does not.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/read_replicas.py \
+        [ROWS] [READERS] [WRITERS] [DURATION] [PROFILE]
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args, temp_database
+
+ROWS, READERS, WRITERS, DURATION, PROFILE = script_args(100_000, 8, 2, 5.0, "default")
+DIRECTORY = temp_database(
+    "primary.db",
+    unset=[
+        "TASKS_READ_URLS",
+        "TASKS_SHARDS_DIR",
+        "TASKS_CACHE_SIZE",
+        "TASKS_WRITE_BEHIND_DELAY",
+    ],
+)
+PRIMARY = os.path.join(DIRECTORY, "primary.db")
+os.environ["TASKS_SQLITE_PROFILE"] = PROFILE
+os.environ["TASKS_READ_PIN"] = "1000"
+
+from models import tasks as models  # noqa: E402
+from models import replicas  # noqa: E402
+
+LAG = 0.2  # seconds between two refreshes of the replicas
+
+
+def seed(rows: int) -> None:
+    """Fill the primary database."""
+    rng = random.Random(0)
+    for start in range(0, rows, 10_000):
+        models.add_tasks(
+            [
+                models.Task(
+                    None,
+                    f"Task {i}",
+                    date.today() + timedelta(days=rng.randint(-30, 365)),
+                    rng.random() < 0.3,
+                    uuid.uuid4(),
+                )
+                for i in range(start, min(start + 10_000, rows))
+            ]
+        )
+
+
+def replicate(paths: list[str], stop: threading.Event) -> None:
+    """Copy the primary to the replicas every LAG seconds."""
+    source = sqlite3.connect(PRIMARY, timeout=30)
+    targets = [sqlite3.connect(path, timeout=30) for path in paths]
+    while not stop.wait(LAG):
+        for target in targets:
+            source.backup(target)
+    for connection in [source, *targets]:
+        connection.close()
+
+
+def mixed_load(readers: int, writers: int, duration: float, rows: int) -> dict:
+    """Run the readers and the writers, and count their operations."""
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "stale": 0}
+    lock = threading.Lock()
+
+    def read(seed: int) -> None:
+        rng = random.Random(seed)
+        done = 0
+        while not stop.is_set():
+            if rng.random() < 0.8:
+                models.get_task(rng.randint(1, rows))
+            else:
+                models.query_tasks(done=False, order_by="end_date", limit=50)
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def write(seed: int) -> None:
+        own, done, stale = seed + 1, 0, 0
+        while not stop.is_set():
+            text = f"Edited by {seed} at {done}"
+            models.edit_task(own, models.Task(None, text, date(2030, 1, 1), False))
+            if models.get_task(own).task != text:
+                stale += 1
+            done += 1
+        with lock:
+            counts["writes"] += done
+            counts["stale"] += stale
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        name: value if name == "stale" else value / duration
+        for name, value in counts.items()
+    }
+
+
+if __name__ == "__main__":
+    profile = os.environ["TASKS_SQLITE_PROFILE"]
+
+    models.create_database(force=True)
+    seed(ROWS)
+    models.engine.dispose()
+    copies = [os.path.join(DIRECTORY, f"replica{i}.db") for i in range(2)]
+    with sqlite3.connect(PRIMARY) as source:
+        for path in copies:
+            with sqlite3.connect(path) as target:
+                source.backup(target)
+
+    modes = {
+        "primary": [],
+        "ro": [f"sqlite:///file:{PRIMARY}?mode=ro&uri=true"],
+        "1 replica": [f"sqlite:///{copies[0]}"],
+        "2 replicas": [f"sqlite:///{path}" for path in copies],
+    }
+    for mode, urls in modes.items():
+        replicas.read_engines = [models.build_engine(url, profile) for url in urls]
+        stop = threading.Event()
+        copier = threading.Thread(target=replicate, args=(copies[: len(urls)], stop))
+        if "replica" in mode:
+            copier.start()
+        result = mixed_load(READERS, WRITERS, DURATION, ROWS)
+        stop.set()
+        if copier.is_alive():
+            copier.join()
+        for read_engine in replicas.read_engines:
+            read_engine.dispose()
+        print(
+            f"{mode:<11} reads {result['reads']:8.0f}/s  "
+            f"writes {result['writes']:7.0f}/s  not read back {result['stale']}"
+        )
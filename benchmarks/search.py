@@ -0,0 +1,117 @@
+"""Latency of the full-text search of the tasks.
+
+Seeds ROWS tasks of three to eight words drawn from a synthetic vocabulary,
+where a few words are common and most are rare, then times QUERIES runs of
+each kind of query with:
+    fts       the FTS5 index of SQLite (models.search, the default)
+    inverted  the in-memory inverted index used without FTS5
+    like      the former `todo --contains`, a LIKE '%...%' scan
+and prints the p50 and p99 latencies. The cache is disabled, and the time to
+build the inverted index is printed apart.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/search.py [ROWS] [QUERIES]
+"""
+
+import itertools
+import random
+import statistics
+import time
+import uuid
+from datetime import date
+from benchmarks.common import script_args, temp_database
+
+temp_database(unset=["TASKS_CACHE_SIZE"])
+
+from models import tasks as models  # noqa: E402
+from models import search  # noqa: E402
+
+VOCABULARY = 50_000
+
+
+def word(rank: int) -> str:
+    """The word of a rank of the vocabulary, the lower the more common."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    text = ""
+    rank += 26 * 27  # at least three letters
+    while rank:
+        rank, letter = divmod(rank, 26)
+        text += letters[letter]
+    return text
+
+
+def seed(rows: int) -> None:
+    """Fill the database with tasks, the words following a Zipf-like law."""
+    rng = random.Random(0)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY + 1)))
+    words = [word(rank) for rank in range(VOCABULARY)]
+    for start in range(0, rows, 10_000):
+        models.add_tasks(
+            [
+                models.Task(
+                    None,
+                    " ".join(
+                        rng.choices(words, cum_weights=weights, k=rng.randint(3, 8))
+                    ),
+                    date(2030, 1, 1),
+                    False,
+                    uuid.uuid4(),
+                )
+                for _ in range(min(10_000, rows - start))
+            ]
+        )
+
+
+QUERIES = {
+    "rare word": lambda rng: word(rng.randrange(10_000, VOCABULARY)),
+    "two words": lambda rng: " ".join(
+        [word(rng.randrange(100)), word(rng.randrange(100, 2000))]
+    ),
+    "prefix": lambda rng: word(rng.randrange(1000, VOCABULARY))[:3],
+    "common word": lambda rng: word(rng.randrange(3)),
+}
+
+
+def fts(query: str) -> list:
+    """Search with the FTS5 index."""
+    search._has_index = True
+    return search.search_tasks(query)
+
+
+def inverted(query: str) -> list:
+    """Search with the in-memory inverted index."""
+    search._has_index = False
+    return search.search_tasks(query)
+
+
+def like(query: str) -> list:
+    """Search with a LIKE scan, as `todo --contains`."""
+    return models.query_tasks(contains=query, limit=20)[0]
+
+
+def percentiles(run, queries: list[str]) -> tuple[float, float]:
+    """The p50 and p99 latencies of a search, in milliseconds."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        times.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(times, n=100)
+    return cuts[49], cuts[98]
+
+
+if __name__ == "__main__":
+    ROWS, COUNT = script_args(1_000_000, 200)
+    models.create_database(force=True)
+    seed(ROWS)
+
+    start = time.perf_counter()
+    search.get_index().catch_up()
+    print(f"inverted index built in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(1)
+    for kind, make in QUERIES.items():
+        queries = [make(rng) for _ in range(COUNT)]
+        for name, run in (("fts", fts), ("inverted", inverted), ("like", like)):
+            p50, p99 = percentiles(run, queries)
+            print(f"{kind:<12} {name:<9} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
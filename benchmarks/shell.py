@@ -0,0 +1,90 @@
+"""Latency of the commands in the shell, against the same commands run alone.
+
+Seeds ROWS tasks, then runs each command COUNT times in this process:
+    shell    as typed in `tasks shell`: todo and get answer from the index
+             of the tasks in memory (models.task_index), caught up after
+             every command
+    queries  with the same warm engine, but every command querying the
+             database, as a command run alone does once started
+and prints the p50 and p99 latencies. The cache is disabled. A command run
+alone also pays the start of a new interpreter, see cli_startup.py.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/shell.py [ROWS] [COUNT]
+"""
+
+import contextlib
+import io
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args, temp_database
+
+temp_database(unset=["TASKS_CACHE_SIZE", "TASKS_WRITE_BEHIND_DELAY", "TASKS_READ_URLS"])
+
+from models import tasks as models  # noqa: E402
+from models import task_index  # noqa: E402
+from views.cli import cli  # noqa: E402
+
+COMMANDS = {
+    "todo --limit 20": lambda rng, rows: ["todo", "--limit", "20"],
+    "todo --sort end_date --limit 20": lambda rng, rows: [
+        "todo", "--sort", "end_date", "--undone", "--limit", "20"
+    ],
+    "get": lambda rng, rows: ["get", "-t", str(rng.randint(1, rows))],
+    "add": lambda rng, rows: ["add", "-t", "New task", "-d", "01/01/2100"],
+    "done": lambda rng, rows: ["done", str(rng.randint(1, rows))],
+    "edit": lambda rng, rows: [
+        "edit", str(rng.randint(1, rows)), "-t", "Edited", "-d", "01/01/2100"
+    ],
+}
+
+
+def seed(rows: int) -> None:
+    """Fill the database with tasks."""
+    rng = random.Random(0)
+    for start in range(0, rows, 10_000):
+        models.add_tasks(
+            [
+                models.Task(
+                    None,
+                    f"Task {i}",
+                    date.today() + timedelta(days=rng.randint(0, 365)),
+                    rng.random() < 0.3,
+                    uuid.uuid4(),
+                )
+                for i in range(start, min(start + 10_000, rows))
+            ]
+        )
+
+
+def percentiles(args: list, shell: bool) -> tuple[float, float]:
+    """The p50 and p99 latencies of commands, in milliseconds."""
+    times = []
+    for command in args:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.main(command, standalone_mode=False, obj={"shell": shell})
+            if shell:
+                task_index.get_index().catch_up()
+        times.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(times, n=100)
+    return cuts[49], cuts[98]
+
+
+if __name__ == "__main__":
+    ROWS, COUNT = script_args(100_000, 200)
+    models.create_database(force=True)
+    seed(ROWS)
+
+    start = time.perf_counter()
+    task_index.get_index().catch_up()
+    print(f"index of {ROWS} tasks loaded in {time.perf_counter() - start:.2f} s")
+    for name, make in COMMANDS.items():
+        for mode, shell in (("shell", True), ("queries", False)):
+            rng = random.Random(1)
+            args = [make(rng, ROWS) for _ in range(COUNT)]
+            p50, p99 = percentiles(args, shell)
+            print(f"{name:<32} {mode:<8} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
@@ -0,0 +1,71 @@
+"""Export and import time of a snapshot against a CSV file.
+
+Seeds ROWS tasks in a temporary SQLite database, exports them to a CSV file
+and to a snapshot, then imports each file into an emptied database, and
+prints the time and file size of each format. The round trips are tested in
+tests/test_snapshot.py.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/snapshot.py [ROWS]
+"""
+
+import os
+import time
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args, temp_database
+
+DIRECTORY = temp_database()
+
+from models import tasks as models  # noqa: E402
+from services import csv_manager, snapshot_manager  # noqa: E402
+
+
+def export_csv(path: str) -> None:
+    """Export every task to a CSV file."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.writelines(csv_manager.export_tasks([])[0])
+
+
+def import_csv(path: str) -> None:
+    """Import a CSV file."""
+    with open(path, encoding="utf-8", newline="") as f:
+        csv_manager.import_tasks(f.read())
+
+
+FORMATS = {
+    "csv": (export_csv, import_csv),
+    "snapshot": (snapshot_manager.export_snapshot, snapshot_manager.import_snapshot),
+}
+
+
+if __name__ == "__main__":
+    (ROWS,) = script_args(100_000)
+    models.create_database(force=True)
+    start_date = date(2030, 1, 1)
+    models.add_tasks(
+        [
+            models.Task(
+                None, f"Tâche {i}", start_date + timedelta(days=i % 365), i % 3 == 0,
+                uuid.uuid4(),
+            )
+            for i in range(ROWS)
+        ]
+    )
+
+    for name, (export, load) in FORMATS.items():
+        path = os.path.join(DIRECTORY, f"tasks.{name}")
+        start = time.perf_counter()
+        export(path)
+        exported = time.perf_counter() - start
+
+        with models.engine.begin() as connection:
+            connection.execute(models.tasks_table.delete())
+        start = time.perf_counter()
+        load(path)
+        imported = time.perf_counter() - start
+
+        print(
+            f"{name:<9} export {exported:6.2f} s  import {imported:6.2f} s  "
+            f"size {os.path.getsize(path) / 2**20:6.1f} MiB"
+        )
@@ -0,0 +1,366 @@
+"""Benchmark suite of the model, services and web layers.
+
+`run` seeds a temporary SQLite database with each of the SIZES (synthetic
+tasks, always the same for a size), times every case below on it and writes
+the results as JSON. The read-only cases run first, so they always see the
+seeded tasks only. A case is a public function of models.tasks or
+services.csv_manager, or a page or API route driven through the Flask test
+client. The read cache is disabled, so the database is timed.
+
+Each case is called in samples of `number` calls, `number` being calibrated
+so a sample takes about 20 ms, and the median of REPEAT samples is kept.
+The setup and teardown of a call, like removing the tasks it added so the
+size stays the same, are not timed.
+
+`compare` compares two result files and lists the cases whose time changed
+by more than the threshold; it exits with 1 if some case is slower. It
+compares the best sample by default, which is the least sensitive to the
+noise of the other processes of the machine.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/suite.py run [--sizes 1000,100000] \
+        [--repeat 5] [--only PATTERN] [--output results.json]
+    PYTHONPATH=src:. python benchmarks/suite.py compare BASELINE CURRENT \
+        [--threshold 0.2] [--stat min|median]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from benchmarks.common import temp_database
+
+temp_database(unset=["TASKS_CACHE_SIZE", "TASKS_METRICS"])
+
+import sqlalchemy  # noqa: E402
+from models import tasks as models  # noqa: E402
+from models import sync  # noqa: E402
+from models import search  # noqa: E402
+from models import task_batch  # noqa: E402
+from services import csv_manager as services  # noqa: E402
+from views.web import create_app  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+BATCH = 500  # tasks per call of the bulk cases
+SAMPLE_TIME = 0.02  # seconds per sample, for the calibration
+
+
+def make_tasks(count: int, rng: random.Random) -> list[models.Task]:
+    """Build synthetic tasks, the same ones for the same random generator."""
+    start = date(2020, 1, 1)
+    return [
+        models.Task(
+            None,
+            f"Task {rng.randrange(10**6)} {rng.choice(WORDS)} {rng.choice(WORDS)}",
+            start + timedelta(days=rng.randrange(6000)),
+            rng.random() < 0.3,
+            uuid.UUID(int=rng.getrandbits(128), version=4),
+        )
+        for _ in range(count)
+    ]
+
+
+WORDS = ["buy", "call", "write", "fix", "read", "clean", "book", "pay", "send", "plan"]
+
+
+def seed(size: int) -> None:
+    """Recreate the database with `size` tasks."""
+    models.create_database(force=True)
+    rng = random.Random(size)
+    for start in range(0, size, 10_000):
+        models.add_tasks(make_tasks(min(10_000, size - start), rng))
+
+
+@dataclass
+class Case:
+    """A benchmarked call.
+
+    Attributes:
+        name (str): The name of the case.
+        run (Callable): The timed call, it takes the value given by setup.
+        setup (Callable): Prepares a call, not timed.
+        teardown (Callable): Cleans up after a call, takes the result of run,
+            not timed.
+    """
+
+    name: str
+    run: Callable
+    setup: Callable = None
+    teardown: Callable = None
+
+    def call(self) -> float:
+        """Call the case once.
+        Returns:
+            float: The time of the call, in seconds."""
+        argument = self.setup() if self.setup else None
+        start = time.perf_counter()
+        result = self.run(argument) if self.setup else self.run()
+        elapsed = time.perf_counter() - start
+        if self.teardown:
+            self.teardown(result)
+        return elapsed
+
+    def measure(self, repeat: int) -> dict:
+        """Time the case: calibrate the number of calls per sample, then take
+        `repeat` samples.
+        Returns:
+            dict: The median and the min time of a call, in seconds, and the
+                number of calls per sample."""
+        number, elapsed = 1, self.call()
+        while elapsed * number < SAMPLE_TIME and number < 1000:
+            number *= 10 if elapsed * number * 10 < SAMPLE_TIME else 2
+        samples = [
+            sum(self.call() for _ in range(number)) / number for _ in range(repeat)
+        ]
+        return {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "number": number,
+            "repeat": repeat,
+        }
+
+
+def consume(iterator) -> int:
+    """Exhaust an iterator, the export functions are lazy."""
+    count = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+def remove_ids(result) -> None:
+    """Remove the tasks added by a call, from their ids."""
+    models.remove_tasks(result if isinstance(result, list) else [result])
+
+
+def remove_guids(guids: list) -> None:
+    """Remove the tasks added by a call, from their uuids."""
+    guids = [uuid.UUID(str(guid)) for guid in guids]
+    stmt = sqlalchemy.select(models.tasks_table.c.id).where(
+        models.tasks_table.c.uuid.in_(guids)
+    )
+    with models.engine.begin() as connection:
+        task_ids = list(connection.execute(stmt).scalars())
+    models.remove_tasks(task_ids)
+
+
+def add_guids(tasks: list[models.Task]) -> list:
+    """Add tasks, and get their uuids for remove_guids()."""
+    models.add_tasks(tasks)
+    return [task.guid for task in tasks]
+
+
+def cases(size: int) -> list[Case]:
+    """Build the cases for a database of `size` tasks."""
+    rng = random.Random(0)
+    client = create_app().test_client()
+
+    def ids(count: int) -> list[int]:
+        return rng.sample(range(1, size + 1), min(count, size))
+
+    def one_id() -> int:
+        return ids(1)[0]
+
+    def new_ids() -> list[int]:
+        guids = add_guids(make_tasks(BATCH, rng))
+        stmt = sqlalchemy.select(models.tasks_table.c.id).where(
+            models.tasks_table.c.uuid.in_(guids)
+        )
+        with models.engine.begin() as connection:
+            return list(connection.execute(stmt).scalars())
+
+    def csv_batch() -> str:
+        lines = ["id,task,end_date,done,guid"]
+        for task in make_tasks(BATCH, rng):
+            lines.append(f"0,{task.task},{task.end_date},{task.done},{task.guid}")
+        return "\n".join(lines) + "\n"
+
+    def post_task() -> int:
+        body = {"task": "Bench task", "end_date": "2030-01-01"}
+        return client.post("/api/tasks", json=body).get_json()["id"]
+
+    edited = models.Task(None, "Edited task", date(2031, 1, 1), False)
+    readers = [  # run first, on the seeded tasks only
+        Case("models.table_version", models.table_version),
+        Case("models.get_task", models.get_task, setup=one_id),
+        Case("models.get_tasks", models.get_tasks, setup=lambda: ids(BATCH)),
+        Case("models.tasks_list", models.tasks_list),
+        Case("models.query_tasks", lambda: models.query_tasks(limit=50)),
+        Case(
+            "models.query_tasks[undone,end_date]",
+            lambda: models.query_tasks(done=False, order_by="end_date", limit=50),
+        ),
+        Case(
+            "models.query_tasks[contains]",
+            lambda: models.query_tasks(contains="write", limit=50),
+        ),
+        Case("task_batch.iter_tasks", lambda: consume(task_batch.iter_tasks())),
+        Case("sync.last_change", sync.last_change),
+        Case("sync.iter_changes", lambda: consume(sync.iter_changes())),
+        Case("search.search_tasks", lambda: search.search_tasks("write fi")),
+        Case("services.export_tasks", lambda: consume(services.export_tasks()[0])),
+        Case(
+            "services.export_tasks[ids]",
+            lambda task_ids: consume(services.export_tasks(task_ids)[0]),
+            setup=lambda: ids(BATCH),
+        ),
+        Case(
+            "services.export_changes",
+            lambda: consume(services.export_changes()[0]),
+        ),
+        Case("web GET /tasks", lambda: client.get("/tasks")),
+        Case("web GET /tasks?q=", lambda: client.get("/tasks?q=write")),
+        Case("web GET /api/tasks", lambda: client.get("/api/tasks")),
+        Case(
+            "web GET /api/tasks/<id>",
+            lambda task_id: client.get(f"/api/tasks/{task_id}"),
+            setup=one_id,
+        ),
+    ]
+    writers = [
+        Case(
+            "models.add_task",
+            lambda: models.add_task("Bench task", date(2030, 1, 1)),
+            teardown=remove_ids,
+        ),
+        Case(
+            "models.add_tasks",
+            add_guids,
+            setup=lambda: make_tasks(BATCH, rng),
+            teardown=remove_guids,
+        ),
+        Case("models.update_task", lambda i: models.update_task(i, True), setup=one_id),
+        Case(
+            "models.set_done",
+            lambda task_ids: models.set_done(task_ids, False),
+            setup=lambda: ids(BATCH),
+        ),
+        Case("models.toggle_tasks", models.toggle_tasks, setup=lambda: ids(BATCH)),
+        Case("models.edit_task", lambda i: models.edit_task(i, edited), setup=one_id),
+        Case("models.remove_tasks", models.remove_tasks, setup=new_ids),
+        Case(
+            "services.import_tasks",
+            services.import_tasks,
+            setup=csv_batch,
+            teardown=lambda result: remove_guids([row[4] for row in result[0]]),
+        ),
+        Case("web POST /api/tasks", post_task, teardown=remove_ids),
+    ]
+    return readers + writers
+
+
+def environment() -> dict:
+    """Describe the machine and the versions the results were taken on."""
+    return {
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run(sizes: list[int], repeat: int, only: str = None) -> dict:
+    """Seed each size and time the cases on it.
+    Args:
+        sizes (list[int]): The numbers of tasks.
+        repeat (int): The number of samples of each case.
+        only (str): Only the cases whose name contains this text.
+    Returns:
+        dict: The environment and the results, by "case[size]"."""
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        seed(size)
+        seeded = time.perf_counter() - start
+        print(f"seeded {size} tasks in {seeded:.1f} s", file=sys.stderr)
+        for case in cases(size):
+            if only and only not in case.name:
+                continue
+            result = {"case": case.name, "size": size, **case.measure(repeat)}
+            results[f"{case.name}[{size}]"] = result
+            median = result["median"] * 1000
+            print(f"{case.name:<40} {size:>9} {median:11.3f} ms", file=sys.stderr)
+    return {"environment": environment(), "results": results}
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float, stat: str = "min"
+) -> list[str]:
+    """Compare the times of two runs, case by case.
+    Args:
+        baseline (dict): The reference results, see run().
+        current (dict): The new results.
+        threshold (float): The relative change reported, 0.2 for 20%.
+        stat (str): The time compared, "min" or "median".
+    Returns:
+        list[str]: The cases slower by more than the threshold."""
+    regressions = []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        ratio = new[stat] / old[stat]
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = ""
+        print(
+            f"{key:<50} {old[stat] * 1000:11.3f} ms {new[stat] * 1000:11.3f} ms"
+            f" {ratio:6.2f}x {status}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Time the cases.")
+    run_parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(size) for size in text.split(",")],
+        default=SIZES,
+        help="The numbers of tasks, comma separated (default: 1000,10000,100000).",
+    )
+    run_parser.add_argument("--repeat", type=int, default=5, help="Samples per case.")
+    run_parser.add_argument("--only", help="Only the cases containing this text.")
+    run_parser.add_argument("--output", help="The JSON file to write, stdout if not set.")
+    compare_parser = commands.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Relative change (default: 0.2)."
+    )
+    compare_parser.add_argument(
+        "--stat", choices=["min", "median"], default="min", help="The time compared."
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = json.dumps(run(args.sizes, args.repeat, args.only), indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(report + "\n")
+        else:
+            print(report)
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_results = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current_results = json.load(f)
+        slower = compare(baseline_results, current_results, args.threshold, args.stat)
+        print(f"{len(slower)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1 if slower else 0)
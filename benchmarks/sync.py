@@ -0,0 +1,50 @@
+"""Cost of the delta sync.
+
+Seeds ROWS tasks, changes CHANGES of them (edits and removals), then times
+export_changes() since the seed against a full export_tasks(). The delta
+export should scale with CHANGES, not ROWS.
+
+The conflict resolution of merge_changes() is tested in tests/test_sync.py.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/sync.py [ROWS] [CHANGES]
+"""
+
+import time
+import uuid
+from datetime import date
+from benchmarks.common import script_args, temp_database
+
+temp_database()
+
+from models import tasks as models  # noqa: E402
+from models import sync  # noqa: E402
+from services import csv_manager as services  # noqa: E402
+
+if __name__ == "__main__":
+    ROWS, CHANGES = script_args(100_000, 100)
+
+    models.create_database(force=True)
+    models.add_tasks(
+        [
+            models.Task(None, f"Task {i}", date(2030, 1, 1), False, uuid.uuid4())
+            for i in range(ROWS)
+        ]
+    )
+    since = sync.last_change()
+    ids = [task.id for task in models.query_tasks(limit=CHANGES)[0]]
+    models.set_done(ids[: CHANGES // 2], True)
+    models.remove_tasks(ids[CHANGES // 2 :])
+
+    start = time.perf_counter()
+    content, _ = services.export_tasks()
+    full_size = sum(map(len, content))
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    content, _ = services.export_changes(since)
+    delta_size = sum(map(len, content))
+    delta = time.perf_counter() - start
+
+    print(f"full export  {full * 1000:9.1f} ms  {full_size / 2**10:9.1f} KiB")
+    print(f"delta export {delta * 1000:9.1f} ms  {delta_size / 2**10:9.1f} KiB")
@@ -0,0 +1,89 @@
+"""Memory and time of the task representations for large listings.
+
+Builds ROWS synthetic database rows, then compares the dicts of the former
+/tasks view, a list of (slotted) Task objects and a columnar TaskBatch:
+the memory they hold, the time to build them and the time to format every
+row for display.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/task_batch.py [ROWS]
+"""
+
+import os
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from benchmarks.common import script_args
+
+os.environ.setdefault("TASKS_DATABASE_URL", "sqlite://")
+os.environ["TASKS_DEBUG"] = "False"
+
+from models import tasks as models  # noqa: E402
+from models import task_batch  # noqa: E402
+
+HEADER = ["id", "task", "end_date", "done", "guid"]
+
+
+def as_dicts(rows: list) -> list:
+    """The former /tasks representation, one dict per row."""
+    return [dict(zip(HEADER, row)) for row in rows]
+
+
+def as_tasks(rows: list) -> list:
+    """One Task object per row."""
+    return [models.Task(*row) for row in rows]
+
+
+def format_dicts(tasks: list) -> None:
+    """Format every dict for display."""
+    for task in tasks:
+        models.format_task(*task.values())
+
+
+def format_tasks(tasks: list) -> None:
+    """Format every Task for display."""
+    for task in tasks:
+        str(task)
+
+
+def format_batch(batch: task_batch.TaskBatch) -> None:
+    """Format every row of a batch for display."""
+    for _ in batch.lines():
+        pass
+
+
+CASES = {
+    "dicts": (as_dicts, format_dicts),
+    "Task": (as_tasks, format_tasks),
+    "TaskBatch": (task_batch.TaskBatch.from_rows, format_batch),
+}
+
+
+if __name__ == "__main__":
+    (ROWS,) = script_args(1_000_000)
+    start_date = date(2030, 1, 1)
+    rows = [
+        (i, f"Task {i}", start_date + timedelta(days=i % 365), i % 2 == 0, uuid.uuid4())
+        for i in range(ROWS)
+    ]
+
+    for name, (build, display) in CASES.items():
+        tracemalloc.start()
+        held = build(rows)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del held
+
+        start = time.perf_counter()
+        held = build(rows)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        display(held)
+        formatted = time.perf_counter() - start
+        del held
+
+        print(
+            f"{name:<10} {memory / 2**20:8.1f} MiB  build {built:6.2f} s  "
+            f"format {formatted:6.2f} s"
+        )
@@ -0,0 +1,101 @@
+"""Load test of the JSON task API: sync Flask app against the ASGI app.
+
+Each app is started in its own server process on a seeded SQLite database,
+then CONCURRENCY client threads send GET /api/tasks?limit=50 for SECONDS.
+Prints the requests/sec and the p50/p99 latencies of each app.
+Needs uvicorn and aiosqlite (the "async" optional dependencies).
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/web_load.py [SECONDS] [CONCURRENCY]
+"""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date
+from benchmarks.common import script_args, temp_database
+
+temp_database()
+
+from models import tasks as models  # noqa: E402
+
+SERVERS = {
+    "sync": [sys.executable, "-m", "flask", "--app", "views.web", "run"],
+    "async": [sys.executable, "-m", "uvicorn", "views.web.asgi:app"],
+}
+PORT = 5099
+PATH = "/api/tasks?limit=50"
+
+
+def wait_for_port(port: int, timeout: float = 10) -> None:
+    """Wait until a server listens on the port."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"No server on port {port}")
+
+
+def client(stop: threading.Event, latencies: list) -> None:
+    """Send requests on a keep-alive connection until `stop` is set."""
+    connection = http.client.HTTPConnection("127.0.0.1", PORT)
+    while not stop.is_set():
+        start = time.perf_counter()
+        connection.request("GET", PATH)
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def run(name: str, seconds: float, concurrency: int) -> None:
+    """Start the server of `name`, load it and print the results."""
+    with subprocess.Popen(
+        SERVERS[name] + ["--port", str(PORT)],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    ) as server:
+        try:
+            wait_for_port(PORT)
+            stop = threading.Event()
+            latencies = [[] for _ in range(concurrency)]
+            threads = [
+                threading.Thread(target=client, args=(stop, latencies[i]))
+                for i in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+
+    latencies = sorted(sum(latencies, []))
+    print(
+        f"{name:<6} {len(latencies) / seconds:8.0f} req/s  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:7.2f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    SECONDS, CONCURRENCY = script_args(5.0, 64)
+    models.create_database(force=True)
+    models.add_tasks(
+        [
+            models.Task(None, f"Task {i}", date(2030, 1, 1), False, uuid.uuid4())
+            for i in range(1000)
+        ]
+    )
+    for NAME in SERVERS:
+        run(NAME, SECONDS, CONCURRENCY)
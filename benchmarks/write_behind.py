@@ -0,0 +1,92 @@
+"""Throughput of the status changes and edits with and without write-behind.
+
+THREADS threads send OPS changes in total, like bursts of clicks in the web
+UI: toggles of tasks picked among HOT ones, and every 10 changes an edit of
+a task of the thread, read back at once.
+The changes are first committed one by one, then through write-behind
+buffers of a few delays. Prints the changes/sec, the transactions committed,
+and checks that every thread reads its own writes.
+
+The SQLite profile (see TASKS_SQLITE_PROFILE) sets the cost of a commit:
+"default" syncs every commit to the disk, "performance" does not in WAL mode.
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/write_behind.py [OPS] [THREADS] [PROFILE]
+"""
+
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from benchmarks.common import script_args, temp_database
+
+OPS, THREADS, PROFILE = script_args(2000, 4, "default")
+temp_database(unset=["TASKS_CACHE_SIZE"])
+os.environ["TASKS_SQLITE_PROFILE"] = PROFILE
+
+from models import tasks as models  # noqa: E402
+from models import write_behind  # noqa: E402
+from models import sync  # noqa: E402
+
+HOT = 50
+BUFFERS = {  # name: (delay in seconds, max changes)
+    "direct": None,
+    "write-behind 2 ms": (0.002, 100),
+    "write-behind 10 ms": (0.010, 100),
+    "write-behind 50 ms": (0.050, 500),
+}
+
+
+def clicks(count: int, seed: int, ids: list[int], errors: list) -> None:
+    """Toggle tasks, and edit the task of the thread then check a read sees
+    the edit (the other threads do not edit it)."""
+    rng = random.Random(seed)
+    own = ids[seed % len(ids)]
+    for i in range(count):
+        if i % 10 == 9:
+            text = f"Edited by {seed} at {i}"
+            models.edit_task(own, models.Task(None, text, date(2030, 1, 1), False))
+            if models.get_task(own).task != text:
+                errors.append(own)
+        else:
+            models.toggle_tasks([rng.choice(ids)])
+
+
+def run(ops: int, threads: int, ids: list[int]) -> tuple[float, int]:
+    """Send the changes from the threads.
+    Returns:
+        tuple: The changes per second, and the transactions committed."""
+    start_version = sync.last_change()
+    errors = []
+    workers = [
+        threading.Thread(target=clicks, args=(ops // threads, seed, ids, errors))
+        for seed in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    write_behind.flush_writes()
+    elapsed = time.perf_counter() - start
+    assert not errors, f"{len(errors)} reads missed their own write"
+    return ops / elapsed, sync.last_change() - start_version
+
+
+if __name__ == "__main__":
+    models.create_database(force=True)
+    models.add_tasks(
+        [
+            models.Task(None, f"Task {i}", date(2030, 1, 1), False, uuid.uuid4())
+            for i in range(HOT)
+        ]
+    )
+    hot_ids = [task.id for task in models.query_tasks(limit=HOT)[0]]
+
+    print(f"SQLite profile: {os.environ['TASKS_SQLITE_PROFILE']}")
+    for name, settings in BUFFERS.items():
+        write_behind.set_write_buffer(write_behind.WriteBuffer(*settings) if settings else None)
+        rate, commits = run(OPS, THREADS, hot_ids)
+        print(f"{name:<20} {rate:10.0f} changes/s  {commits:6} commits")
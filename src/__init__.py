@@ -1,7 +1,52 @@
 """This file contains the configuration for the application."""
 import os
 
+def _getint(name: str) -> int | None:
+    """Get an integer environment variable, None if it is not set."""
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+_read_pin = _getint("TASKS_READ_PIN")
+
 config = {
     "DATABASE_URL" : os.getenv("TASKS_DATABASE_URL", ""),
+    # The list of tasks used when none is given (CLI --list, web list parameter)
+    "LIST" : os.getenv("TASKS_LIST", "default"),
+    # Sharded mode: each list in its own SQLite database in this directory,
+    # DATABASE_URL is then ignored
+    "SHARDS_DIR" : os.getenv("TASKS_SHARDS_DIR", ""),
+    # Read replicas of the database, comma separated URLs: the reads go to them,
+    # except for READ_PIN milliseconds after a write of the same request
+    "READ_URLS" : [url for url in os.getenv("TASKS_READ_URLS", "").split(",") if url],
+    "READ_PIN" : 1000 if _read_pin is None else _read_pin,
     "DEBUG" : os.getenv("TASKS_DEBUG", "False") == "True",
+    # Connection pool, SQLAlchemy defaults are used for unset values
+    "POOL_SIZE" : _getint("TASKS_POOL_SIZE"),
+    "MAX_OVERFLOW" : _getint("TASKS_MAX_OVERFLOW"),
+    "POOL_RECYCLE" : _getint("TASKS_POOL_RECYCLE"),
+    # SQLite pragmas applied on connect: "default" or "performance"
+    "SQLITE_PROFILE" : os.getenv("TASKS_SQLITE_PROFILE", "default"),
+    # Read cache of the tasks, disabled when the size is not set
+    "CACHE_SIZE" : _getint("TASKS_CACHE_SIZE"),
+    "CACHE_TTL" : _getint("TASKS_CACHE_TTL") or 60,
+    # Rendered rows and lists of the /tasks page, 0 disables it
+    "RENDER_CACHE_SIZE" : (
+        _getint("TASKS_RENDER_CACHE_SIZE")
+        if os.getenv("TASKS_RENDER_CACHE_SIZE")
+        else 20000
+    ),
+    # Processes parsing large CSV imports, 1 parses them in the writer
+    "IMPORT_WORKERS" : _getint("TASKS_IMPORT_WORKERS") or 1,
+    # Background imports and exports of the webapp: threads, and how long (in
+    # seconds) a finished job and its file are kept
+    "JOB_WORKERS" : _getint("TASKS_JOB_WORKERS") or 2,
+    "JOB_TTL" : _getint("TASKS_JOB_TTL") or 3600,
+    # Write-behind of the status changes and edits: the milliseconds a change may
+    # wait to be committed with the next ones (0 commits each one at once), and
+    # the number of changes committed together at most
+    "WRITE_BEHIND_DELAY" : _getint("TASKS_WRITE_BEHIND_DELAY") or 0,
+    "WRITE_BEHIND_MAX_OPS" : _getint("TASKS_WRITE_BEHIND_MAX_OPS") or 100,
+    # Count and time the SQL statements and the web requests, see /metrics
+    "METRICS" : os.getenv("TASKS_METRICS", "False") == "True",
 }
@@ -0,0 +1,280 @@
+"""Async version of the tasks database functions, on SQLAlchemy's asyncio engine.
+
+The functions mirror the ones of models.tasks, share its tables, statements
+and read cache, and need an async driver (aiosqlite for SQLite). They work on
+the current list of tasks, see models.tasks.current_list().
+"""
+
+import threading
+from datetime import date, datetime
+import uuid
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from src import config
+from models import tasks as models
+from models import shards
+from models.tasks import Task, tasks_table, version_table, CHUNK_SIZE
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_url(url: str) -> sqlalchemy.URL:
+    """Get the URL of the async driver of a database URL.
+    Args:
+        url (str): The database URL.
+    Returns:
+        sqlalchemy.URL: The URL, with the async driver of its backend.
+    """
+    url = sqlalchemy.make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def _build_engine(url: str) -> AsyncEngine:
+    """Create the async engine of a database URL, with the SQLite profile."""
+    new_engine = create_async_engine(async_url(url), echo=config["DEBUG"])
+    models.apply_sqlite_profile(new_engine.sync_engine, config["SQLITE_PROFILE"])
+    return new_engine
+
+
+engine = _build_engine(config["DATABASE_URL"]) if shards.router is None else None
+_shard_engines: dict[str, AsyncEngine] = {}  # in sharded mode, by list
+_shard_lock = threading.Lock()
+
+
+def get_engine() -> AsyncEngine:
+    """Get the async engine of the current list, see models.tasks.get_engine().
+    In sharded mode, the database of the list is created on its first use.
+    Returns:
+        AsyncEngine: The engine."""
+    if shards.router is None:
+        return engine
+    list_id = models.current_list()
+    with _shard_lock:
+        if list_id not in _shard_engines:
+            url = shards.router.engine(list_id).url
+            _shard_engines[list_id] = _build_engine(url.render_as_string(False))
+        return _shard_engines[list_id]
+
+
+async def dispose() -> None:
+    """Close the connections of every engine."""
+    for async_engine in [engine, *_shard_engines.values()]:
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+async def _touch(connection: AsyncConnection) -> int:
+    """Bump the version of the current list, first thing in a write transaction,
+    see models.tasks._touch()."""
+    version = (await connection.execute(models._bump_version())).scalar()
+    if version is None:
+        version = 1
+        await connection.execute(models._new_version())
+    models._write_seq.set(version)
+    return version
+
+
+async def _cached(key: tuple, load) -> object:
+    """Async version of models.tasks._cached().
+    Args:
+        key (tuple): The cache key.
+        load (callable): The coroutine function reading the value from the database.
+    Returns:
+        object: The value.
+    """
+    if models.cache is None:
+        return await load()
+    value = models.cache.get(key)
+    if value is None:
+        generation = models._generation()
+        value = await load()
+        if value is not None:
+            models._store(key, value, generation)
+    return value
+
+
+async def table_version() -> tuple[int, datetime]:
+    """Get the version of the tasks of the current list, see
+    models.tasks.table_version()."""
+    stmt = sqlalchemy.select(version_table.c.version, version_table.c.modified).where(
+        models._in_list(version_table)
+    )
+    async with get_engine().begin() as connection:
+        row = (await connection.execute(stmt)).first()
+    return tuple(row) if row is not None else (0, models.NEVER)
+
+
+async def add_task(
+    task: str, end_date: date, done: bool = False, guid: uuid.UUID = None
+) -> int:
+    """Add a task to the database, see models.tasks.add_task()."""
+    obj = Task(None, task, end_date, done, uuid.uuid4() if guid is None else guid)
+    stmt = tasks_table.insert().values(
+        task=obj.task, end_date=obj.end_date, done=obj.done, uuid=obj.guid
+    )
+    async with get_engine().begin() as connection:
+        await _touch(connection)
+        result = await connection.execute(stmt)
+    models._invalidate()
+    return result.inserted_primary_key[0]
+
+
+async def _execute(stmt, task_id: int) -> bool:
+    """Run an UPDATE statement on a task.
+    Args:
+        stmt: The statement, filtered on the task.
+        task_id (int): The id of the task.
+    Returns:
+        bool: True if the task was affected, False otherwise.
+    """
+    async with get_engine().begin() as connection:
+        await _touch(connection)
+        result = await connection.execute(stmt)
+        if not result.rowcount:
+            await connection.rollback()  # keeps the version
+    models._invalidate(task_id)
+    return result.rowcount > 0
+
+
+async def remove_task(task_id: int) -> bool:
+    """Remove a task from the database, see models.tasks.remove_task()."""
+    removed, _ = await remove_tasks([task_id])
+    return bool(removed)
+
+
+async def update_task(task_id: int, done: bool) -> bool:
+    """Update the done status of a task, see models.tasks.update_task()."""
+    return await _execute(
+        tasks_table.update().where(tasks_table.c.id == task_id, models._in_list())
+        .values(done=done),
+        task_id,
+    )
+
+
+async def edit_task(task_id: int, task_obj: Task) -> bool:
+    """Edit a task in the database, see models.tasks.edit_task()."""
+    return await _execute(
+        tasks_table.update()
+        .where(tasks_table.c.id == task_id, models._in_list())
+        .values(task=task_obj.task, end_date=task_obj.end_date),
+        task_id,
+    )
+
+
+async def patch_task(task_id: int, fields: dict) -> bool:
+    """Update some fields of a task in one statement, see
+    models.tasks.patch_task()."""
+    if not fields:
+        return await get_task(task_id) is not None
+    return await _execute(
+        tasks_table.update().where(tasks_table.c.id == task_id, models._in_list())
+        .values(**fields),
+        task_id,
+    )
+
+
+async def _execute_by_chunks(stmt, task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Async version of models.tasks._execute_by_chunks()."""
+    task_ids = list(dict.fromkeys(task_ids))
+    affected = set()
+    async with get_engine().begin() as connection:
+        await _touch(connection)
+        for start in range(0, len(task_ids), CHUNK_SIZE):
+            chunk = task_ids[start : start + CHUNK_SIZE]
+            rows = (
+                await connection.execute(
+                    stmt.where(tasks_table.c.id.in_(chunk), models._in_list())
+                    .returning(tasks_table.c.id, tasks_table.c.uuid)
+                )
+            ).all()
+            affected.update(row.id for row in rows)
+            if stmt.is_delete and rows:
+                now = models.utcnow()
+                for tombstone_stmt, params in models._bury(
+                    [(row.uuid, now) for row in rows]
+                ):
+                    await connection.execute(tombstone_stmt, params)
+        if not affected:
+            await connection.rollback()  # keeps the version
+    models._invalidate(*affected)
+    return (
+        [task_id for task_id in task_ids if task_id in affected],
+        [task_id for task_id in task_ids if task_id not in affected],
+    )
+
+
+async def remove_tasks(task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Remove several tasks from the database, see models.tasks.remove_tasks()."""
+    return await _execute_by_chunks(tasks_table.delete(), task_ids)
+
+
+async def set_done(task_ids: list[int], done: bool) -> tuple[list[int], list[int]]:
+    """Update the done status of several tasks, see models.tasks.set_done()."""
+    return await _execute_by_chunks(tasks_table.update().values(done=done), task_ids)
+
+
+async def toggle_tasks(task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Toggle the done status of several tasks, see models.tasks.toggle_tasks()."""
+    return await _execute_by_chunks(
+        tasks_table.update().values(done=sqlalchemy.not_(tasks_table.c.done)),
+        task_ids,
+    )
+
+
+async def get_task(task_id: int) -> tuple:
+    """Get a task from the database, see models.tasks.get_task()."""
+    stmt = models._select_tasks.where(tasks_table.c.id == task_id, models._in_list())
+
+    async def load() -> tuple:
+        async with get_engine().begin() as connection:
+            return (await connection.execute(stmt)).fetchone()
+
+    return await _cached(models._task_key(task_id), load)
+
+
+async def get_tasks(task_ids: list[int]) -> tuple[list, list[int]]:
+    """Get several tasks from the database, see models.tasks.get_tasks()."""
+    task_ids = list(dict.fromkeys(task_ids))
+    rows = {}
+    async with get_engine().begin() as connection:
+        for start in range(0, len(task_ids), CHUNK_SIZE):
+            chunk = task_ids[start : start + CHUNK_SIZE]
+            stmt = models._select_tasks.where(
+                tasks_table.c.id.in_(chunk), models._in_list()
+            )
+            for row in await connection.execute(stmt):
+                rows[row.id] = row
+    return (
+        [rows[task_id] for task_id in task_ids if task_id in rows],
+        [task_id for task_id in task_ids if task_id not in rows],
+    )
+
+
+async def tasks_list() -> list:
+    """Get all tasks from the database, see models.tasks.tasks_list()."""
+    stmt = models._select_tasks.where(models._in_list())
+
+    async def load() -> list:
+        async with get_engine().begin() as connection:
+            return (await connection.execute(stmt)).fetchall()
+
+    return await _cached(models._lists_key("all"), load)
+
+
+async def query_tasks(**filters) -> tuple[list, str]:
+    """Get a filtered, sorted page of tasks, see models.tasks.query_tasks().
+    Takes the same keyword arguments as models.tasks.query_tasks().
+    """
+    stmt, key = models._query_stmt(**filters)
+
+    async def load() -> list:
+        async with get_engine().begin() as connection:
+            return (await connection.execute(stmt)).fetchall()
+
+    return models._page(
+        await _cached(key, load), filters.get("limit"), filters.get("order_by", "id")
+    )
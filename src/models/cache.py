@@ -0,0 +1,127 @@
+"""This module contains the cache backends used for task reads."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """The interface of a cache backend.
+    A shared cache (memcached, redis...) can be plugged in by implementing it.
+
+    Attributes:
+        stats (dict): The hits, misses and evictions counters.
+
+    Methods:
+        get: Get a value, None if it is not cached.
+        set: Cache a value.
+        delete: Remove values from the cache.
+        counter: Get a counter, counters are never evicted.
+        incr: Increment a counter.
+        clear: Remove everything from the cache.
+    """
+
+    def __init__(self) -> None:
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: tuple) -> object:
+        """Get a value from the cache.
+        Args:
+            key (tuple): The key of the value.
+        Returns:
+            object: The value, None if it is not cached.
+        """
+        raise NotImplementedError
+
+    def set(self, key: tuple, value: object) -> None:
+        """Cache a value.
+        Args:
+            key (tuple): The key of the value.
+            value (object): The value, must not be None.
+        """
+        raise NotImplementedError
+
+    def delete(self, *keys: tuple) -> None:
+        """Remove values from the cache.
+        Args:
+            keys (tuple): The keys of the values.
+        """
+        raise NotImplementedError
+
+    def counter(self, key: tuple) -> int:
+        """Get a counter, a missing counter is 0.
+        Args:
+            key (tuple): The key of the counter.
+        Returns:
+            int: The value of the counter.
+        """
+        raise NotImplementedError
+
+    def incr(self, key: tuple) -> int:
+        """Increment a counter, a missing counter starts at 0.
+        Args:
+            key (tuple): The key of the counter.
+        Returns:
+            int: The new value of the counter.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove all values and counters from the cache."""
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """An in-process, thread-safe LRU cache whose values expire after a TTL.
+
+    Attributes:
+        maxsize (int): The maximum number of cached values.
+        ttl (float): The number of seconds a value stays valid.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._values = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> object:
+        with self._lock:
+            item = self._values.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._values[key]
+                self.stats["misses"] += 1
+                return None
+            self._values.move_to_end(key)
+            self.stats["hits"] += 1
+            return item[1]
+
+    def set(self, key: tuple, value: object) -> None:
+        with self._lock:
+            self._values[key] = (time.monotonic() + self.ttl, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def delete(self, *keys: tuple) -> None:
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def counter(self, key: tuple) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: tuple) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._counters.clear()
@@ -0,0 +1,222 @@
+"""Opt-in instrumentation of the SQL statements and of the web requests.
+
+instrument() hooks the events of an engine to count and time every statement,
+in process-wide histograms and in the current Scope: a web request or a CLI
+command, so the statements of one request (an N+1 query loop, for example)
+can be told apart. render() gives the histograms in the Prometheus text
+format, for the /metrics endpoint of the webapp.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from sqlalchemy import event, Engine
+
+# Prometheus default buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 7.5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """A histogram of observations, one series per set of label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        help (str): Its description.
+        labels (tuple[str]): The names of its labels.
+        buckets (tuple): The upper bounds of the buckets, +Inf excluded.
+
+    Methods:
+        observe: Record an observation.
+        render: The histogram in the Prometheus text format.
+    """
+
+    def __init__(
+        self, name: str, help_text: str, labels: tuple = (), buckets: tuple = BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values: bucket counts, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record an observation.
+        Args:
+            value (float): The observed value.
+            label_values (str): The values of the labels, in order."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[label_values] = series
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        """The histogram in the Prometheus text format.
+        Returns:
+            list[str]: The lines."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(value) for key, value in self._series.items()}
+        for label_values, counts in sorted(series.items()):
+            labels = [f'{n}="{_escape(v)}"' for n, v in zip(self.labels, label_values)]
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                le = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {total}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {counts[-1]}")
+            lines.append(f"{self.name}_count{suffix} {total}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+sql_duration = Histogram(
+    "tasks_sql_duration_seconds", "Time of the SQL statements.", ("operation",)
+)
+request_duration = Histogram(
+    "tasks_request_duration_seconds",
+    "Latency of the web requests.",
+    ("method", "route", "status"),
+)
+request_statements = Histogram(
+    "tasks_request_sql_statements",
+    "Number of SQL statements run by a web request.",
+    ("method", "route"),
+    COUNT_BUCKETS,
+)
+HISTOGRAMS = [sql_duration, request_duration, request_statements]
+
+
+class Scope:
+    """The statements run by a unit of work, a web request or a CLI command.
+    A scope is current between start() and stop(), in the current thread or
+    asyncio task.
+
+    Attributes:
+        statements (int): The number of statements.
+        sql_seconds (float): Their total time.
+        queries (dict): With detail, the count and time of each statement text.
+        elapsed (float): The time between start() and stop().
+
+    Methods:
+        start: Make the scope current.
+        stop: Leave the scope.
+    """
+
+    def __init__(self, detail: bool = False) -> None:
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.queries = {} if detail else None
+        self.elapsed = 0.0
+        self._started = None
+        self._token = None
+
+    def start(self) -> "Scope":
+        """Make the scope current.
+        Returns:
+            Scope: The scope."""
+        self._token = _scope.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self) -> None:
+        """Leave the scope, does nothing if it is already stopped."""
+        if self._token is None:
+            return
+        self.elapsed = time.perf_counter() - self._started
+        _scope.reset(self._token)
+        self._token = None
+
+    def __enter__(self) -> "Scope":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def record(self, statement: str, seconds: float) -> None:
+        """Record a statement run in the scope."""
+        self.statements += 1
+        self.sql_seconds += seconds
+        if self.queries is not None:
+            query = self.queries.setdefault(statement, [0, 0.0])
+            query[0] += 1
+            query[1] += seconds
+
+
+_scope: contextvars.ContextVar[Scope | None] = contextvars.ContextVar(
+    "tasks_metrics_scope", default=None
+)
+_instrumented: set[int] = set()
+
+
+def current() -> Scope | None:
+    """Get the current scope.
+    Returns:
+        Scope: The scope, None if there is none."""
+    return _scope.get()
+
+
+def instrument(sync_engine: Engine) -> None:
+    """Count and time the statements run by an engine, once per engine.
+    Args:
+        sync_engine (sqlalchemy.Engine): The engine (the sync_engine of an async engine).
+    """
+    if id(sync_engine) in _instrumented:
+        return
+    _instrumented.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - connection.info["metrics_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        sql_duration.observe(seconds, operation)
+        scope = _scope.get()
+        if scope is not None:
+            scope.record(statement, seconds)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def failed(context) -> None:
+        if context.connection is not None and context.connection.info.get(
+            "metrics_start"
+        ):
+            context.connection.info["metrics_start"].pop()
+
+
+def observe_request(method: str, route: str, status: int, scope: Scope) -> None:
+    """Record a web request in the histograms.
+    Args:
+        method (str): The HTTP method.
+        route (str): The route rule, not the URL, to keep few series.
+        status (int): The status of the response.
+        scope (Scope): The stopped scope of the request."""
+    request_duration.observe(scope.elapsed, method, route, str(status))
+    request_statements.observe(scope.statements, method, route)
+
+
+def render(counters: dict[str, int] = None) -> str:
+    """Render the histograms in the Prometheus text format.
+    Args:
+        counters (dict): Extra counters to expose, by metric name.
+    Returns:
+        str: The metrics."""
+    lines = []
+    for name, value in (counters or {}).items():
+        lines.extend([f"# TYPE {name} counter", f"{name} {value}"])
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,107 @@
+"""Read replicas of the database: with TASKS_READ_URLS, the reads of
+models.tasks go to the replicas in turn, see read_engine(), but for a while
+after a write of the current context, see pin_reads().
+"""
+
+import contextlib
+import contextvars
+import itertools
+import time
+from collections.abc import Iterator
+import sqlalchemy
+from src import config
+from models import tasks as models
+
+
+read_engines = (
+    [
+        models.build_engine(
+            url,
+            config["SQLITE_PROFILE"],
+            pool_size=config["POOL_SIZE"],
+            max_overflow=config["MAX_OVERFLOW"],
+            pool_recycle=config["POOL_RECYCLE"],
+        )
+        for url in config["READ_URLS"]
+    ]
+    if not config["SHARDS_DIR"]
+    else []
+)  # the replicas of the database, not used in sharded mode
+_reads = itertools.count()  # round robin over the replicas
+_pinned_until: contextvars.ContextVar[float] = contextvars.ContextVar(
+    "tasks_pinned_until", default=0.0
+)
+_stuck_engine: contextvars.ContextVar[sqlalchemy.Engine | None] = (
+    contextvars.ContextVar("tasks_stuck_engine", default=None)
+)
+_last_write = 0.0  # time.monotonic() of the last write of this process
+
+
+def read_engine() -> sqlalchemy.Engine:
+    """Get the engine to read the current list from: one of the replicas in
+    turn, or the engine of the list (see models.tasks.get_engine()) if there is
+    none or if the reads are pinned to it after a write, see pin_reads(). In a
+    stick_reads() block, the engine of the block.
+    Returns:
+        sqlalchemy.Engine: The engine."""
+    stuck = _stuck_engine.get()
+    if stuck is not None:
+        return stuck
+    if not read_engines or time.monotonic() < _pinned_until.get():
+        return models.get_engine()
+    return read_engines[next(_reads) % len(read_engines)]
+
+
+@contextlib.contextmanager
+def stick_reads(
+    read_from: sqlalchemy.Engine = None,
+) -> Iterator[sqlalchemy.Engine]:
+    """Send all the reads of the current context to one engine in the block.
+    The replicas are not at the same point: the changes up to a
+    models.sync.last_change() must be read from the replica it was read from,
+    else the ones it has and another one lacks are skipped.
+    Args:
+        read_from (sqlalchemy.Engine): The engine, the next one of
+            read_engine() if not set.
+    Yields:
+        sqlalchemy.Engine: The engine."""
+    read_from = read_from or read_engine()
+    token = _stuck_engine.set(read_from)
+    try:
+        yield read_from
+    finally:
+        _stuck_engine.reset(token)
+
+
+def pin_reads(seconds: float = None) -> contextvars.Token:
+    """Send the reads of the current thread or asyncio task to the primary
+    database for a while, so they see its writes before the replicas do.
+    Args:
+        seconds (float): How long, config["READ_PIN"] if not set, 0 to unpin.
+    Returns:
+        contextvars.Token: The token to give to reset_pin()."""
+    if seconds is None:
+        seconds = config["READ_PIN"] / 1000
+    return _pinned_until.set(time.monotonic() + seconds if seconds > 0 else 0.0)
+
+
+def reset_pin(token: contextvars.Token) -> None:
+    """Restore the read pin before pin_reads().
+    Args:
+        token (contextvars.Token): The token returned by pin_reads()."""
+    _pinned_until.reset(token)
+
+
+def pinned_for() -> float:
+    """Get how long the reads of the current context stay on the primary.
+    Returns:
+        float: The seconds left, 0 if the reads go to the replicas."""
+    return max(0.0, _pinned_until.get() - time.monotonic())
+
+
+def _wrote() -> None:
+    """Record a write of the current context: pin its reads to the primary."""
+    global _last_write
+    _last_write = time.monotonic()
+    if read_engines:
+        pin_reads()
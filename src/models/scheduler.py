@@ -0,0 +1,216 @@
+"""The due tasks, and the reminders of the tasks getting due or overdue.
+
+due_tasks() answers from the (list_id, done, end_date) index of the tasks table: a
+seek to the not done tasks, then the k first of them by end date, without
+scanning the table.
+
+A Scheduler keeps a heap of the next reminder of every not done task: "due"
+when its end date enters the lead time, "overdue" the day after its end date.
+It is loaded once from the same index, then caught up with the changes of the
+tasks (see models.sync.iter_changes()) when the version of the tasks table
+changes, like the inverted index of models.search: an added, edited or undone
+task is scheduled, a done or removed one is dropped. Dropped reminders stay
+in the heap and are skipped when they come up.
+"""
+
+import heapq
+import itertools
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+import sqlalchemy
+from models import tasks as models
+from models import replicas
+from models import sync
+from models.tasks import tasks_table
+
+DEFAULT_WITHIN = "7d"
+_WITHIN = re.compile(r"(\d+)([dw]?)")
+_DAY = timedelta(days=1)
+
+
+def parse_within(text: str) -> timedelta:
+    """Parse a time span in days or weeks, like "3d", "2w" or "5" (days).
+    Args:
+        text (str): The time span.
+    Returns:
+        timedelta: The time span.
+    Raises:
+        ValueError: If the time span is invalid."""
+    match = _WITHIN.fullmatch(text.strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid time span: {text}, expected like 3d or 2w.")
+    count, unit = match.groups()
+    return timedelta(days=int(count) * (7 if unit == "w" else 1))
+
+
+def due_tasks(
+    within: timedelta,
+    today: date = None,
+    after: str = None,
+    limit: int = None,
+) -> tuple[list, str]:
+    """Get the not done tasks ending within a time span, the overdue ones
+    included, by end date.
+    Args:
+        within (timedelta): The time span from today.
+        today (date): The reference date, defaults to today.
+        after (str): The cursor of the previous page.
+        limit (int): The maximum number of tasks to return.
+    Returns:
+        tuple: The tasks, and the cursor of the next page (None if it is the last one).
+    Raises:
+        ValueError: If the cursor is invalid."""
+    return models.query_tasks(
+        done=False,
+        end_to=(today or date.today()) + within,
+        order_by="end_date",
+        after=after,
+        limit=limit,
+    )
+
+
+@dataclass(slots=True)
+class Event:
+    """A reminder of a task.
+
+    Attributes:
+        kind (str): "due" when the task ends within the lead time of the
+            scheduler, "overdue" when its end date is past.
+        task (tuple): The task.
+    """
+
+    kind: str
+    task: tuple
+
+
+class Scheduler:
+    """The reminders of the not done tasks, in a heap by day.
+
+    Attributes:
+        lead (timedelta): How long before its end date a task is due.
+        list_id (str): The list of tasks scheduled, the current one when the
+            scheduler was created.
+        listeners (list): The callables called with each Event fired by poll().
+        pending (dict): For each not done task (by uuid), its end date and the
+            generation of its reminders in the heap.
+        version (int): The version of the tasks table the scheduler is up to
+            date with, the number of the last change applied.
+
+    Methods:
+        catch_up: Apply the changes of the tasks since the last call.
+        poll: Fire the reminders of the day.
+        reset: Empty the scheduler.
+    """
+
+    def __init__(self, lead: timedelta = timedelta(0)) -> None:
+        self.lead = lead
+        self.list_id = models.current_list()
+        self.listeners: list = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Empty the scheduler, it is loaded again by the next catch_up()."""
+        self.pending: dict = {}
+        self._heap: list[tuple] = []  # (day, generation, kind, uuid)
+        self._generations = itertools.count()
+        self.version = None
+
+    def _reminders(self, guid, end_date: date) -> list[tuple]:
+        """Register the end date of a task, and build its reminders."""
+        generation = next(self._generations)
+        self.pending[guid] = (end_date, generation)
+        return [
+            (end_date - self.lead, generation, "due", guid),
+            (end_date + _DAY, generation, "overdue", guid),
+        ]
+
+    def _schedule(self, guid, end_date: date) -> None:
+        """Schedule the reminders of a task, unless they already are."""
+        scheduled = self.pending.get(guid)
+        if scheduled is not None and scheduled[0] == end_date:
+            return
+        for reminder in self._reminders(guid, end_date):
+            heapq.heappush(self._heap, reminder)
+        if len(self._heap) > 4 * len(self.pending) + 1000:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop the reminders of the tasks done, removed or rescheduled."""
+        self._heap = [
+            reminder
+            for reminder in self._heap
+            if self.pending.get(reminder[3], (None, None))[1] == reminder[1]
+        ]
+        heapq.heapify(self._heap)
+
+    def _load(self) -> None:
+        """Load the not done tasks, through the (list_id, done, end_date) index."""
+        stmt = sqlalchemy.select(tasks_table.c.uuid, tasks_table.c.end_date).where(
+            models._in_list(), tasks_table.c.done.is_(False)
+        )
+        with replicas.read_engine().connect() as connection:
+            connection = connection.execution_options(yield_per=models.CHUNK_SIZE)
+            for row in connection.execute(stmt):
+                self._heap.extend(self._reminders(row.uuid, row.end_date))
+        heapq.heapify(self._heap)
+
+    def catch_up(self) -> None:
+        """Apply the changes of the tasks since the last call, if the version of
+        the tasks table changed."""
+        with models.use_list(self.list_id), replicas.stick_reads():
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Apply the changes of the tasks of the list since the last call."""
+        version = sync.last_change()
+        if version == self.version:
+            return
+        if self.version is None:
+            self._load()
+        else:
+            for batch in sync.iter_changes(self.version, version):
+                for change in batch:
+                    if change.deleted or change.done:
+                        self.pending.pop(change.guid, None)
+                    else:
+                        self._schedule(change.guid, change.end_date)
+        self.version = version
+
+    def poll(self, today: date = None) -> list[Event]:
+        """Fire the reminders up to a day, and call the listeners with them.
+        A task already overdue is only reminded as overdue.
+        Args:
+            today (date): The day, defaults to today.
+        Returns:
+            list[Event]: The events fired, by day."""
+        today = today or date.today()
+        with self._lock:
+            self.catch_up()
+            fired = []
+            while self._heap and self._heap[0][0] <= today:
+                _, generation, kind, guid = heapq.heappop(self._heap)
+                end_date, current = self.pending.get(guid, (None, None))
+                if current != generation or (kind == "due" and end_date < today):
+                    continue
+                fired.append((kind, guid))
+        if not fired:
+            return []
+
+        rows = {}
+        guids = [guid for _, guid in fired]
+        with models.use_list(self.list_id):
+            with replicas.read_engine().begin() as connection:
+                for start in range(0, len(guids), models.CHUNK_SIZE):
+                    chunk = guids[start : start + models.CHUNK_SIZE]
+                    stmt = models._select_tasks.where(
+                        models._in_list(), tasks_table.c.uuid.in_(chunk)
+                    )
+                    rows.update((row.uuid, row) for row in connection.execute(stmt))
+        events = [Event(kind, rows[guid]) for kind, guid in fired if guid in rows]
+        for event in events:
+            for listener in self.listeners:
+                listener(event)
+        return events
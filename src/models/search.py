@@ -0,0 +1,234 @@
+"""Full-text search of the task descriptions.
+
+On SQLite with FTS5, the tasks_fts index built by models.tasks.create_database()
+is queried, its triggers keep it in sync with every write. On other databases,
+an inverted index is built in memory from the changes of the tasks (see
+models.sync.iter_changes()) and caught up before each search. Each list of
+tasks (see models.tasks.current_list()) has its own inverted index.
+
+Results are ranked with BM25, every word of the query must match, the last
+one as a prefix.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from bisect import bisect_left
+import sqlalchemy
+from sqlalchemy import inspect
+from models import tasks as models
+from models import replicas
+from models import write_behind
+from models import sync
+from models.tasks import tasks_table
+
+_WORD = re.compile(r"[^\W_]+")
+_fts_table = sqlalchemy.table(
+    models.FTS_TABLE, sqlalchemy.column("rowid"), sqlalchemy.column("rank")
+)
+_has_index = None  # cached result of has_index(), None until the first check
+_checked_generation = None  # models._schema_generation when it was cached
+
+
+def tokenize(text: str) -> list[str]:
+    """Split a text into lowercase words without diacritics, like the
+    "unicode61 remove_diacritics 2" tokenizer of the FTS5 index.
+    Args:
+        text (str): The text.
+    Returns:
+        list[str]: The words."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def has_index(refresh: bool = False) -> bool:
+    """Check if the database has the FTS5 index, the result is cached until
+    the schema is created or checked again, see models.tasks.is_db().
+    Args:
+        refresh (bool): If True, inspect the database again.
+    Returns:
+        bool: True if the FTS5 index exists."""
+    global _has_index, _checked_generation
+    generation = models._schema_generation
+    if refresh or _has_index is None or _checked_generation != generation:
+        _has_index = models.FTS_TABLE in inspect(models.get_engine()).get_table_names()
+        _checked_generation = generation
+    return _has_index
+
+
+def _fts_query(words: list[str]) -> str:
+    """Build the FTS5 MATCH expression of the words of a query."""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+class InvertedIndex:
+    """An in-memory inverted index of the task descriptions, for the databases
+    without FTS5.
+
+    Attributes:
+        postings (dict): For each word, the uuid of the tasks containing it and
+            the number of occurrences.
+        terms (dict): For each task, its words and their number of occurrences.
+        words (list[str]): The sorted vocabulary, for the prefix queries.
+        version (int): The version of the tasks table the index is up to date
+            with, the number of the last change indexed.
+
+    Methods:
+        catch_up: Index the changes of the tasks since the last call.
+        search: Get the uuids of the tasks matching a query, ranked.
+        reset: Empty the index.
+    """
+
+    K1 = 1.2  # BM25 parameters, as in FTS5
+    B = 0.75
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Empty the index, it is rebuilt by the next catch_up()."""
+        self.postings: dict[str, dict] = {}
+        self.terms: dict = {}
+        self.words: list[str] = []
+        self.version = None
+        self._total = 0  # sum of the lengths of the tasks
+        self._sorted = True
+
+    def _remove(self, guid) -> None:
+        """Remove a task from the postings."""
+        terms = self.terms.pop(guid, None)
+        if terms is None:
+            return
+        self._total -= terms.total()
+        for word in terms:
+            del self.postings[word][guid]
+
+    def _add(self, guid, text: str) -> None:
+        """Add a task to the postings."""
+        terms = self.terms[guid] = Counter(tokenize(text))
+        self._total += terms.total()
+        for word, count in terms.items():
+            if word not in self.postings:
+                self.postings[word] = {}
+                self._sorted = False
+            self.postings[word][guid] = count
+
+    def catch_up(self) -> None:
+        """Index the changes of the tasks since the last call, if the version of
+        the tasks table changed."""
+        with replicas.stick_reads():
+            version = sync.last_change()
+            if version == self.version:
+                return
+            changes = sync.iter_changes(self.version, version)
+        first = self.version is None
+        for batch in changes:
+            for change in batch:
+                if not first:
+                    self._remove(change.guid)
+                if not change.deleted:
+                    self._add(change.guid, change.task)
+        if not self._sorted:
+            self.words = sorted(self.postings)
+            self._sorted = True
+        self.version = version
+
+    def _prefixed(self, prefix: str) -> dict:
+        """The postings of every word starting with a prefix, merged."""
+        docs = {}
+        for i in range(bisect_left(self.words, prefix), len(self.words)):
+            if not self.words[i].startswith(prefix):
+                break
+            for guid, count in self.postings.get(self.words[i], {}).items():
+                docs[guid] = docs.get(guid, 0) + count
+        return docs
+
+    def search(self, words: list[str], limit: int) -> list:
+        """Get the uuids of the tasks containing every word, the last one as a
+        prefix, ranked with BM25.
+        Args:
+            words (list[str]): The words of the query, see tokenize().
+            limit (int): The maximum number of results.
+        Returns:
+            list: The uuids of the best tasks, the best first."""
+        with self._lock:
+            self.catch_up()
+            postings = [self.postings.get(word, {}) for word in words[:-1]]
+            postings.append(self._prefixed(words[-1]))
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for docs in postings[1:]:
+                candidates.intersection_update(docs)
+            if not candidates:
+                return []
+
+            count = len(self.terms)
+            average = self._total / count
+            scores = dict.fromkeys(candidates, 0.0)
+            for docs in postings:
+                idf = math.log((count - len(docs) + 0.5) / (len(docs) + 0.5) + 1)
+                for guid in candidates:
+                    tf = docs[guid]
+                    length = self.terms[guid].total()
+                    norm = 1 - self.B + self.B * length / average
+                    scores[guid] += idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+            return sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+
+
+_indexes: dict[str, InvertedIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index() -> InvertedIndex:
+    """Get the inverted index of the current list, created on the first call.
+    Returns:
+        InvertedIndex: The index."""
+    list_id = models.current_list()
+    with _indexes_lock:
+        if list_id not in _indexes:
+            _indexes[list_id] = InvertedIndex()
+        return _indexes[list_id]
+
+
+def search_tasks(query: str, limit: int = 20) -> list:
+    """Search the tasks whose description contains every word of a query, the
+    last one as a prefix ("buy mil" finds "Buy milk").
+    Args:
+        query (str): The words to search.
+        limit (int): The maximum number of tasks.
+    Returns:
+        list: The tasks found, the most relevant first."""
+    words = tokenize(query)
+    if not words:
+        return []
+    write_behind.flush_writes()
+
+    def load() -> list:
+        if has_index():
+            stmt = (
+                models._select_tasks.join_from(
+                    tasks_table, _fts_table, _fts_table.c.rowid == tasks_table.c.id
+                )
+                .where(sqlalchemy.text(f"{models.FTS_TABLE} MATCH :match"))
+                .where(models._in_list())
+                .order_by(_fts_table.c.rank)
+                .limit(limit)
+            )
+            with replicas.read_engine().begin() as connection:
+                return connection.execute(stmt, {"match": _fts_query(words)}).fetchall()
+
+        guids = get_index().search(words, limit)
+        if not guids:
+            return []
+        stmt = models._select_tasks.where(tasks_table.c.uuid.in_(guids))
+        with replicas.read_engine().begin() as connection:
+            rows = connection.execute(stmt).fetchall()
+        rank = {guid: i for i, guid in enumerate(guids)}
+        rows.sort(key=lambda row: rank[row.uuid])
+        return rows
+
+    return models._cached(models._lists_key("search", tuple(words), limit), load)
@@ -0,0 +1,69 @@
+"""Sharding of the lists of tasks: with TASKS_SHARDS_DIR, each list has its own
+SQLite database, see ShardRouter, and models.tasks.get_engine() returns the
+engine of the current list.
+"""
+
+import os
+import threading
+import sqlalchemy
+from src import config
+from models import tasks as models
+from models.tasks import LIST_NAME
+
+
+class ShardRouter:
+    """Routes each list of tasks to its own SQLite database, `<list>.db` in a
+    directory: the lists share no index, no lock and no page cache, so a
+    large list does not slow the listings or block the writes of the others.
+
+    Attributes:
+        directory (str): The directory of the databases.
+        sqlite_profile (str): The SQLITE_PROFILES pragmas of the databases.
+
+    Methods:
+        engine: Get the engine of a list, creating its database on first use.
+        names: Get the lists which have a database.
+    """
+
+    def __init__(self, directory: str, sqlite_profile: str = "default") -> None:
+        self.directory = directory
+        self.sqlite_profile = sqlite_profile
+        self._engines: dict[str, sqlalchemy.Engine] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, list_id: str) -> sqlalchemy.Engine:
+        """Get the engine of a list, its database is created on first use.
+        Args:
+            list_id (str): The name of the list, see models.tasks.check_list().
+        Returns:
+            sqlalchemy.Engine: The engine."""
+        shard = self._engines.get(list_id)
+        if shard is not None:
+            return shard
+        with self._lock:
+            if list_id not in self._engines:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{models.check_list(list_id)}.db")
+                shard = models.build_engine(f"sqlite:///{path}", self.sqlite_profile)
+                models._create_schema(shard)
+                self._engines[list_id] = shard
+            return self._engines[list_id]
+
+    def names(self) -> list[str]:
+        """Get the lists which have a database.
+        Returns:
+            list[str]: The names of the lists."""
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            name[:-3]
+            for name in os.listdir(self.directory)
+            if name.endswith(".db") and LIST_NAME.fullmatch(name[:-3])
+        ]
+
+
+router = (
+    ShardRouter(config["SHARDS_DIR"], config["SQLITE_PROFILE"])
+    if config["SHARDS_DIR"]
+    else None
+)
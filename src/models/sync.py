@@ -0,0 +1,276 @@
+"""The delta sync between instances: the changes of the tasks of a list, read
+by change sequence number (see models.tasks._touch()), and merged by uuid, the
+last write winning.
+"""
+
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+import sqlalchemy
+from models import tasks as models
+from models import replicas
+from models import write_behind
+from models.tasks import CHUNK_SIZE, tasks_table, tombstones_table
+
+
+@dataclass(slots=True)
+class Change:
+    """A change of a task, exchanged by the delta sync between instances.
+
+    Attributes:
+        guid (uuid.UUID): The unique identifier of the task.
+        updated_at (datetime): When the task was changed or removed (UTC).
+        deleted (bool): True if the task was removed.
+        task (str): The task, None if it was removed.
+        end_date (date): The end date of the task, None if it was removed.
+        done (bool): The status of the task.
+
+    Methods:
+        __post_init__: Post-initialization method to convert attributes to the correct type.
+        key: The order of the changes of a task, the greatest one wins.
+    """
+
+    guid: uuid.UUID
+    updated_at: datetime
+    deleted: bool = False
+    task: str = None
+    end_date: date = None
+    done: bool = False
+
+    def __post_init__(self) -> None:
+        """Post-initialization method to convert attributes to the correct type.
+        Raises:
+            ValueError: If a field is invalid, or a task which is not removed has
+                no description or end date."""
+        self.guid = uuid.UUID(self.guid) if isinstance(self.guid, str) else self.guid
+        self.updated_at = models.parse_utc(self.updated_at)
+        self.deleted = (
+            self.deleted == "True" if isinstance(self.deleted, str) else self.deleted
+        )
+        if self.deleted:
+            self.task, self.end_date, self.done = None, None, False
+            return
+        self.end_date = (
+            date.fromisoformat(self.end_date)
+            if isinstance(self.end_date, str)
+            else self.end_date
+        )
+        self.done = self.done == "True" if isinstance(self.done, str) else self.done
+        if self.task is None or self.end_date is None:
+            raise ValueError("A task needs a description and an end date.")
+
+    def key(self) -> tuple:
+        """The order of the changes of a task: the last one wins, a removal wins
+        a tie, then the greatest content, so that every instance keeps the same.
+        Returns:
+            tuple: The key to compare."""
+        return (
+            self.updated_at,
+            self.deleted,
+            self.task or "",
+            self.end_date or date.min,
+            self.done,
+        )
+
+
+def last_change() -> int:
+    """Get the change sequence number of the last change of a task, removals
+    included: the version of the list, see models.tasks._touch().
+    Returns:
+        int: The number of the last change, 0 if there is none."""
+    write_behind.flush_writes()
+    return models.table_version()[0]
+
+
+def iter_changes(
+    since: int = None, until: int = None, batch_size: int = CHUNK_SIZE
+) -> Iterator[list[Change]]:
+    """Iterate over the changes of the tasks, batch by batch: the tasks changed
+    and the tasks removed by the changes numbered in (since, until], see
+    last_change(). The seq indexes make the cost proportional to the number of
+    changes. With read replicas, call it in the stick_reads() block `until`
+    was read in.
+    Args:
+        since (int): Only the changes after this one, all if not set.
+        until (int): Only the changes up to this one, all if not set.
+        batch_size (int): The number of changes per batch.
+    Returns:
+        Iterator[list[Change]]: The batches of changes."""
+    write_behind.flush_writes()
+    table = tasks_table.c
+    tasks_stmt = (
+        sqlalchemy.select(
+            table.uuid, table.updated_at, table.task, table.end_date, table.done
+        )
+        .where(models._in_list())
+        .order_by(table.seq)
+    )
+    tombstones_stmt = (
+        sqlalchemy.select(tombstones_table.c.uuid, tombstones_table.c.deleted_at)
+        .where(models._in_list(tombstones_table))
+        .order_by(tombstones_table.c.seq)
+    )
+    if since is not None:
+        tasks_stmt = tasks_stmt.where(table.seq > since)
+        tombstones_stmt = tombstones_stmt.where(tombstones_table.c.seq > since)
+    if until is not None:
+        tasks_stmt = tasks_stmt.where(table.seq <= until)
+        tombstones_stmt = tombstones_stmt.where(tombstones_table.c.seq <= until)
+    read_from = replicas.read_engine()
+    return _read_changes(read_from, tasks_stmt, tombstones_stmt, batch_size)
+
+
+def _read_changes(
+    read_from: sqlalchemy.Engine,
+    tasks_stmt: sqlalchemy.Select,
+    tombstones_stmt: sqlalchemy.Select,
+    batch_size: int,
+) -> Iterator[list[Change]]:
+    """Read the changes selected by iter_changes(), from the engine chosen when
+    it was called, so they can be iterated after its stick_reads() block."""
+    with read_from.connect() as connection:
+        connection = connection.execution_options(yield_per=batch_size)
+        for partition in connection.execute(tasks_stmt).partitions():
+            yield [
+                Change(row.uuid, row.updated_at, False, row.task, row.end_date, row.done)
+                for row in partition
+            ]
+        for partition in connection.execute(tombstones_stmt).partitions():
+            yield [Change(row.uuid, row.deleted_at, True) for row in partition]
+
+
+_merge_update = (
+    tasks_table.update()
+    .where(tasks_table.c.id == sqlalchemy.bindparam("b_id"))
+    .values(
+        task=sqlalchemy.bindparam("b_task"),
+        end_date=sqlalchemy.bindparam("b_end_date"),
+        done=sqlalchemy.bindparam("b_done"),
+        updated_at=sqlalchemy.bindparam("b_updated_at"),
+    )
+)
+
+
+def merge_changes(changes: list[Change]) -> list[str]:
+    """Apply the changes of another instance, in a single transaction.
+    Changes are merged by uuid: for each task, the greatest Change.key() wins
+    between the local version and the received ones (the last write wins), so
+    instances exchanging their changes converge to the same tasks. The changes
+    go to the current list, the ones of a task of another list are skipped.
+    The merged tasks keep the time of their change, which decides the next
+    conflicts, but get a change sequence number of this instance, so they are
+    sent on to the instances syncing with this one.
+    Args:
+        changes (list[Change]): The changes to apply.
+    Returns:
+        list[str]: For each change, "added", "updated" or "deleted", or
+            "skipped" if the local version (or another change) is newer."""
+    write_behind.flush_writes()
+    outcomes = ["skipped"] * len(changes)
+    affected = []
+    list_id = models.current_list()
+    with models.get_engine().begin() as connection:
+        models._touch(connection)
+        for start in range(0, len(changes), CHUNK_SIZE):
+            winners = {}  # the index of the greatest change of each task
+            for i in range(start, min(start + CHUNK_SIZE, len(changes))):
+                guid = changes[i].guid
+                if guid not in winners or changes[i].key() > changes[winners[guid]].key():
+                    winners[guid] = i
+
+            current = {}  # the local version of each task
+            task_ids = {}
+            foreign = set()  # the tasks of another list
+            stmt = sqlalchemy.select(
+                tasks_table.c.id,
+                tasks_table.c.uuid,
+                tasks_table.c.updated_at,
+                tasks_table.c.task,
+                tasks_table.c.end_date,
+                tasks_table.c.done,
+                tasks_table.c.list_id,
+            ).where(tasks_table.c.uuid.in_(list(winners)))
+            for row in connection.execute(stmt):
+                if row.list_id != list_id:
+                    foreign.add(row.uuid)
+                    continue
+                task_ids[row.uuid] = row.id
+                current[row.uuid] = Change(
+                    row.uuid,
+                    row.updated_at or datetime.min,
+                    False,
+                    row.task,
+                    row.end_date,
+                    row.done,
+                )
+            stmt = tombstones_table.select().where(
+                tombstones_table.c.uuid.in_(list(winners)),
+                models._in_list(tombstones_table),
+            )
+            for row in connection.execute(stmt):
+                tombstone = Change(row.uuid, row.deleted_at, True)
+                if row.uuid not in current or tombstone.key() > current[row.uuid].key():
+                    current[row.uuid] = tombstone
+
+            inserts, updates, removed, revived = [], [], [], []
+            for guid, i in winners.items():
+                change = changes[i]
+                if guid in foreign or (
+                    guid in current and change.key() <= current[guid].key()
+                ):
+                    continue
+                if change.deleted:
+                    removed.append((guid, change.updated_at))
+                    outcomes[i] = "deleted"
+                    continue
+                revived.append(guid)
+                if guid in task_ids:
+                    updates.append(
+                        {
+                            "b_id": task_ids[guid],
+                            "b_task": change.task,
+                            "b_end_date": change.end_date,
+                            "b_done": change.done,
+                            "b_updated_at": change.updated_at,
+                        }
+                    )
+                    outcomes[i] = "updated"
+                else:
+                    inserts.append(
+                        {
+                            "task": change.task,
+                            "end_date": change.end_date,
+                            "done": change.done,
+                            "uuid": guid,
+                            "updated_at": change.updated_at,
+                        }
+                    )
+                    outcomes[i] = "added"
+
+            deleted_ids = [task_ids[guid] for guid, _ in removed if guid in task_ids]
+            if deleted_ids:
+                connection.execute(
+                    tasks_table.delete().where(tasks_table.c.id.in_(deleted_ids))
+                )
+            if removed:
+                for stmt, params in models._bury(removed):
+                    connection.execute(stmt, params)
+            if revived:
+                connection.execute(
+                    tombstones_table.delete().where(
+                        tombstones_table.c.uuid.in_(revived),
+                        models._in_list(tombstones_table),
+                    )
+                )
+            if updates:
+                connection.execute(_merge_update, updates)
+            if inserts:
+                connection.execute(tasks_table.insert(), inserts)
+            affected.extend(deleted_ids)
+            affected.extend(row["b_id"] for row in updates)
+        if all(outcome == "skipped" for outcome in outcomes):
+            connection.rollback()  # keeps the version
+    if any(outcome != "skipped" for outcome in outcomes):
+        models._invalidate(*affected)
+    return outcomes
@@ -0,0 +1,155 @@
+"""Columnar batches of tasks, for the listings too large for a list of Task
+objects: the CSV and snapshot exports, the /tasks page and the CLI listings.
+"""
+
+import uuid
+from array import array
+from collections.abc import Iterable, Iterator
+from datetime import date
+from models import tasks as models
+from models import replicas
+from models import write_behind
+from models.tasks import CHUNK_SIZE, Task, tasks_table
+
+
+class TaskBatch:
+    """A compact, columnar batch of tasks, for large listings.
+    Ids, end dates (as ordinals) and done flags are stored in arrays, guids in
+    a single bytes buffer. Task objects and display strings are only built when
+    a row is accessed.
+
+    Attributes:
+        ids (array): The ids of the tasks.
+        tasks (list[str]): The descriptions of the tasks.
+        end_dates (array): The end dates of the tasks, as date ordinals.
+        done (array): The status of the tasks, 1 if done.
+        guids (bytearray): The unique identifiers of the tasks, 16 bytes each.
+
+    Methods:
+        from_rows: Build a batch from database rows.
+        append: Add a database row to the batch.
+        extend: Add the rows of another batch to the batch.
+        rows: Iterate over the rows, with the values as written in CSV files.
+        lines: Iterate over the string representations of the tasks.
+    """
+
+    __slots__ = ("ids", "tasks", "end_dates", "done", "guids")
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.tasks = []
+        self.end_dates = array("l")
+        self.done = array("B")
+        self.guids = bytearray()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "TaskBatch":
+        """Build a batch from database rows.
+        Args:
+            rows (Iterable[tuple]): The (id, task, end_date, done, uuid) rows.
+        Returns:
+            TaskBatch: The batch.
+        """
+        batch = cls()
+        for row in rows:
+            batch.append(row)
+        return batch
+
+    def append(self, row: tuple) -> None:
+        """Add a database row to the batch.
+        Args:
+            row (tuple): The (id, task, end_date, done, uuid) row.
+        """
+        task_id, task, end_date, done, guid = row
+        self.ids.append(task_id)
+        self.tasks.append(task)
+        self.end_dates.append(end_date.toordinal())
+        self.done.append(bool(done))
+        self.guids += guid.bytes
+
+    def extend(self, other: "TaskBatch") -> None:
+        """Add the rows of another batch to the batch.
+        Args:
+            other (TaskBatch): The batch to add.
+        """
+        self.ids.extend(other.ids)
+        self.tasks.extend(other.tasks)
+        self.end_dates.extend(other.end_dates)
+        self.done.extend(other.done)
+        self.guids += other.guids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _guid(self, index: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(self.guids[index * 16 : index * 16 + 16]))
+
+    def __getitem__(self, index: int) -> Task:
+        """Build the Task of a row.
+        Args:
+            index (int): The index of the row in the batch.
+        Returns:
+            Task: The task.
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError("TaskBatch index out of range")
+        index %= len(self)
+        return Task(
+            self.ids[index],
+            self.tasks[index],
+            date.fromordinal(self.end_dates[index]),
+            bool(self.done[index]),
+            self._guid(index),
+        )
+
+    def __iter__(self) -> Iterator[Task]:
+        return (self[index] for index in range(len(self)))
+
+    def rows(self) -> Iterator[tuple]:
+        """Iterate over the rows, with the values as written in CSV files.
+        Yields:
+            tuple: The (id, task, end_date, done, guid) row.
+        """
+        for index, task_id in enumerate(self.ids):
+            yield (
+                task_id,
+                self.tasks[index],
+                date.fromordinal(self.end_dates[index]).isoformat(),
+                "True" if self.done[index] else "False",
+                self._guid(index),
+            )
+
+    def lines(self) -> Iterator[str]:
+        """Iterate over the string representations of the tasks, see Task.__str__.
+        Yields:
+            str: The string representation of the next task.
+        """
+        dates = {}  # the same end dates come back a lot, format each one once
+        for index, task_id in enumerate(self.ids):
+            ordinal = self.end_dates[index]
+            if ordinal not in dates:
+                end_date = date.fromordinal(ordinal)
+                dates[ordinal] = f"{end_date.day:02}/{end_date.month:02}/{end_date.year}"
+            guid = self.guids[index * 16 : index * 16 + 16].hex()
+            yield (
+                f"{task_id}. {'[X]' if self.done[index] else '[ ]'} \t"
+                f"📅 {dates[ordinal]} \t"
+                f"📝 {self.tasks[index]} \t"
+                f"🔑 {guid[:8]}-{guid[8:12]}-{guid[12:16]}-{guid[16:20]}-{guid[20:]}"
+            )
+
+
+def iter_tasks(batch_size: int = CHUNK_SIZE) -> Iterator[TaskBatch]:
+    """Iterate over all tasks from the database, batch by batch.
+    Rows are read with a server-side cursor, so only one batch is held in memory.
+    Args:
+        batch_size (int): The number of tasks per batch.
+    Yields:
+        TaskBatch: The next batch of tasks.
+    """
+    write_behind.flush_writes()
+    stmt = models._select_tasks.where(models._in_list()).order_by(tasks_table.c.id)
+    with replicas.read_engine().connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(stmt)
+        for partition in result.partitions():
+            yield TaskBatch.from_rows(partition)
@@ -0,0 +1,225 @@
+"""An in-memory copy of the tasks of a list, for the interactive shell.
+
+The tasks are loaded once, then caught up with the changes of the tasks (see
+models.sync.iter_changes()) when the version of the tasks table changes,
+like the inverted index of models.search: the added and edited tasks are
+read back by uuid, the removed ones dropped, so a write costs a query of the
+tasks changed and not a new listing. The listings of query_tasks() and
+get_task() are then answered without SQL, but for the version check, run on
+a connection the index keeps open.
+
+The ids and the (end date, id) of the tasks are also kept in sorted lists,
+so a page of tasks is a binary search to its first task, then a walk to
+its last one.
+"""
+
+import itertools
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+import sqlalchemy
+from models import tasks as models
+from models import replicas
+from models import write_behind
+from models import sync
+from models.tasks import tasks_table, version_table
+
+_KEYS = {
+    "id": lambda row: (row.id,),
+    "end_date": lambda row: (row.end_date, row.id),
+}  # the sort keys of the listings, the id of the task last
+_version_stmt = sqlalchemy.select(version_table.c.version).where(
+    version_table.c.list_id == sqlalchemy.bindparam("list_id")
+)
+
+
+class TaskIndex:
+    """The tasks of a list, in memory.
+
+    Attributes:
+        list_id (str): The list of tasks, the current one when the index was
+            created.
+        tasks (dict): The tasks (rows of the tasks table) by id.
+        ids (dict): The id of each task, by uuid.
+        version (int): The version of the tasks table the index is up to date
+            with, the number of the last change applied.
+
+    Methods:
+        catch_up: Apply the changes of the tasks since the last call.
+        query_tasks: Get a filtered, sorted page of tasks.
+        get_task: Get a task.
+        reset: Empty the index.
+    """
+
+    def __init__(self) -> None:
+        self.list_id = models.current_list()
+        self._lock = threading.Lock()
+        self._connection = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Empty the index, it is loaded again by the next catch_up()."""
+        self.tasks: dict = {}
+        self.ids: dict = {}
+        self._sorted: dict[str, list] = {name: [] for name in _KEYS}
+        self.version = None
+
+    def _load(self) -> None:
+        """Load all the tasks of the list."""
+        stmt = models._select_tasks.where(models._in_list()).order_by(tasks_table.c.id)
+        with replicas.read_engine().connect() as connection:
+            connection = connection.execution_options(yield_per=models.CHUNK_SIZE)
+            for row in connection.execute(stmt):
+                self.tasks[row.id] = row
+                self.ids[row.uuid] = row.id
+        for name, key in _KEYS.items():
+            self._sorted[name] = sorted(map(key, self.tasks.values()))
+
+    def _remove(self, task_id: int) -> None:
+        """Remove a task, if it is in the index."""
+        row = self.tasks.pop(task_id, None)
+        if row is None:
+            return
+        del self.ids[row.uuid]
+        for name, key in _KEYS.items():
+            keys = self._sorted[name]
+            del keys[bisect_left(keys, key(row))]
+
+    def _set(self, row) -> None:
+        """Add or replace a task."""
+        self._remove(row.id)
+        self.tasks[row.id] = row
+        self.ids[row.uuid] = row.id
+        for name, key in _KEYS.items():
+            insort(self._sorted[name], key(row))
+
+    def _reload(self, guids: list) -> None:
+        """Read back the changed tasks, by uuid."""
+        with replicas.read_engine().begin() as connection:
+            for start in range(0, len(guids), models.CHUNK_SIZE):
+                stmt = models._select_tasks.where(
+                    models._in_list(),
+                    tasks_table.c.uuid.in_(guids[start : start + models.CHUNK_SIZE]),
+                )
+                for row in connection.execute(stmt):
+                    self._set(row)
+
+    def _version(self) -> int:
+        """Get the version of the list on the primary database, on the
+        connection kept open, which saves the checkout of a connection."""
+        write_behind.flush_writes()
+        if self._connection is None:
+            self._connection = models.get_engine().connect()
+            self._connection = self._connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+        try:
+            params = {"list_id": self.list_id}
+            return self._connection.execute(_version_stmt, params).scalar() or 0
+        except sqlalchemy.exc.DBAPIError:
+            self._connection.close()
+            self._connection = None
+            raise
+
+    def catch_up(self) -> None:
+        """Apply the changes of the tasks since the last call, if the version of
+        the tasks table changed."""
+        with self._lock, models.use_list(self.list_id):
+            version = self._version()
+            if version == self.version:
+                return
+            with replicas.stick_reads():
+                self._catch_up(version)
+
+    def _catch_up(self, version: int) -> None:
+        """Apply the changes of the tasks of the list since the last call.
+        Args:
+            version (int): The version of the list on the primary database."""
+        if replicas.read_engines:  # the replicas may be behind the primary
+            version, _ = models.table_version()
+        if self.version is None:
+            self._load()
+        else:
+            deleted = {}  # the last change of each task
+            for batch in sync.iter_changes(self.version, version):
+                for change in batch:
+                    deleted[change.guid] = change.deleted
+            for guid in [guid for guid, gone in deleted.items() if gone]:
+                self._remove(self.ids.get(guid))
+            self._reload([guid for guid, gone in deleted.items() if not gone])
+        self.version = version
+
+    def get_task(self, task_id: int) -> tuple:
+        """Get a task, see models.tasks.get_task().
+        Args:
+            task_id (int): The id of the task.
+        Returns:
+            tuple: The task, None if it does not exist."""
+        self.catch_up()
+        return self.tasks.get(task_id)
+
+    def query_tasks(
+        self,
+        done: bool = None,
+        overdue: bool = False,
+        contains: str = None,
+        order_by: str = "id",
+        after: str = None,
+        limit: int = None,
+        today: date = None,
+    ) -> tuple[list, str]:
+        """Get a filtered, sorted page of tasks, see models.tasks.query_tasks().
+        Args:
+            done (bool): Only the done (True) or not done (False) tasks.
+            overdue (bool): Only the not done tasks whose end date is before today.
+            contains (str): Only the tasks whose description contains this
+                text, ignoring the case.
+            order_by (str): The column to sort by, "id" or "end_date".
+            after (str): The cursor of the previous page.
+            limit (int): The maximum number of tasks to return.
+            today (date): The reference date for overdue tasks, defaults to today.
+        Returns:
+            tuple: The tasks, and the cursor of the next page (None if it is
+                the last one).
+        Raises:
+            ValueError: If order_by, the cursor or the limit is invalid."""
+        if order_by not in _KEYS:
+            raise ValueError(f"Cannot sort tasks by {order_by}.")
+        models._check_limit(limit)
+        start = None
+        if after is not None and order_by == "id":
+            start = (int(after),)
+        elif after is not None:
+            end_date, task_id = after.split(",")
+            start = (date.fromisoformat(end_date), int(task_id))
+        today = today or date.today()
+        contains = contains.casefold() if contains else None
+
+        self.catch_up()
+        keys = self._sorted[order_by]
+        first = bisect_right(keys, start) if start is not None else 0
+        rows = (
+            row
+            for row in (self.tasks[keys[i][-1]] for i in range(first, len(keys)))
+            if (done is None or row.done == done)
+            and (not overdue or (not row.done and row.end_date < today))
+            and (contains is None or contains in row.task.casefold())
+        )
+        if limit is not None:
+            rows = itertools.islice(rows, limit + 1)
+        return models._page(list(rows), limit, order_by)
+
+
+_indexes: dict[str, TaskIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index() -> TaskIndex:
+    """Get the index of the current list, created on the first call.
+    Returns:
+        TaskIndex: The index."""
+    list_id = models.current_list()
+    with _indexes_lock:
+        if list_id not in _indexes:
+            _indexes[list_id] = TaskIndex()
+        return _indexes[list_id]
@@ -1,42 +1,486 @@
 """This module contains the database models."""
 
-from datetime import date
+import contextlib
+import contextvars
+import logging
+import re
+import time
+from datetime import date, datetime, timezone
+from collections.abc import Iterator
 import uuid
-import io
 from dataclasses import dataclass
 import sqlalchemy
 from sqlalchemy import inspect
 from src import config
+from models.cache import CacheBackend, LRUCache
 
-engine = sqlalchemy.create_engine(config["DATABASE_URL"], echo=config["DEBUG"])
+logger = logging.getLogger(__name__)
+
+SQLITE_PROFILES = {
+    "default": {},
+    # WAL lets readers run alongside a writer, NORMAL only fsyncs at checkpoints
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # in KiB
+        "busy_timeout": 5000,  # in ms
+    },
+}
+
+
+def build_engine(
+    url: str, sqlite_profile: str = "default", **pool_options
+) -> sqlalchemy.Engine:
+    """Create an engine, tuned for the database backend.
+    Args:
+        url (str): The database URL.
+        sqlite_profile (str): The name of the SQLITE_PROFILES pragmas to apply on connect.
+        pool_options: The pool_size, max_overflow and pool_recycle, ignored if None.
+    Returns:
+        sqlalchemy.Engine: The engine.
+    """
+    pool_options = {k: v for k, v in pool_options.items() if v is not None}
+    new_engine = sqlalchemy.create_engine(url, echo=config["DEBUG"], **pool_options)
+    apply_sqlite_profile(new_engine, sqlite_profile)
+    return new_engine
+
+
+def apply_sqlite_profile(sync_engine: sqlalchemy.Engine, sqlite_profile: str) -> None:
+    """Apply the pragmas of a SQLITE_PROFILES entry on every new connection.
+    Does nothing if the engine is not a SQLite one.
+    Args:
+        sync_engine (sqlalchemy.Engine): The engine (the sync_engine of an async engine).
+        sqlite_profile (str): The name of the profile.
+    """
+    pragmas = SQLITE_PROFILES[sqlite_profile]
+    if sync_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @sqlalchemy.event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, _) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+
+engine = (
+    build_engine(
+        config["DATABASE_URL"],
+        config["SQLITE_PROFILE"],
+        pool_size=config["POOL_SIZE"],
+        max_overflow=config["MAX_OVERFLOW"],
+        pool_recycle=config["POOL_RECYCLE"],
+    )
+    if not config["SHARDS_DIR"]
+    else None
+)  # in sharded mode, each list has its own engine, see get_engine()
 metadata = sqlalchemy.MetaData()
 
+LIST_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+def check_list(list_id: str) -> str:
+    """Check the name of a list of tasks: 1 to 64 letters, digits, "-" or "_",
+    starting with a letter or a digit, so it is also a valid file name.
+    Args:
+        list_id (str): The name of the list.
+    Returns:
+        str: The name.
+    Raises:
+        ValueError: If the name is invalid."""
+    if not isinstance(list_id, str) or not LIST_NAME.fullmatch(list_id):
+        raise ValueError(f"Invalid list name: {list_id}.")
+    return list_id
+
+
+_list: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "tasks_list", default=check_list(config["LIST"])
+)
+
+
+def current_list() -> str:
+    """Get the list of tasks the functions of this module work on, in the
+    current thread or asyncio task, config["LIST"] if none was set.
+    Returns:
+        str: The name of the list."""
+    return _list.get()
+
+
+def set_list(list_id: str) -> contextvars.Token:
+    """Make a list of tasks the current one, see current_list().
+    Args:
+        list_id (str): The name of the list.
+    Returns:
+        contextvars.Token: The token to give to reset_list().
+    Raises:
+        ValueError: If the name is invalid."""
+    return _list.set(check_list(list_id))
+
+
+def reset_list(token: contextvars.Token) -> None:
+    """Make the list current before set_list() the current one again.
+    Args:
+        token (contextvars.Token): The token returned by set_list()."""
+    _list.reset(token)
+
+
+@contextlib.contextmanager
+def use_list(list_id: str) -> Iterator[None]:
+    """Make a list of tasks the current one in a with block.
+    Args:
+        list_id (str): The name of the list.
+    Raises:
+        ValueError: If the name is invalid."""
+    token = set_list(list_id)
+    try:
+        yield
+    finally:
+        reset_list(token)
+
+
+def get_engine() -> sqlalchemy.Engine:
+    """Get the engine of the current list: the engine of the database, or in
+    sharded mode the one of the database of the list, see
+    models.shards.ShardRouter.
+    Returns:
+        sqlalchemy.Engine: The engine."""
+    if shards.router is None:
+        return engine
+    return shards.router.engine(current_list())
+
+
+CHUNK_SIZE = 500  # rows per bulk statement, keeps IN (...) under SQLite's variable limit
+
+
+_db_exists = None  # cached result of is_db(), None until the first check
+# bumped when the schema is checked again or created: the checks cached by
+# other modules, like search.has_index(), are then made again
+_schema_generation = 0
+
+cache = (
+    LRUCache(config["CACHE_SIZE"], config["CACHE_TTL"]) if config["CACHE_SIZE"] else None
+)
+
+
+def set_cache(backend: CacheBackend | None) -> None:
+    """Set the cache used for task reads.
+    Args:
+        backend (CacheBackend): The cache backend, None to disable the cache.
+    """
+    global cache
+    cache = backend
+
+
+def cache_stats() -> dict:
+    """Get the hits, misses and evictions counters of the cache.
+    Returns:
+        dict: The counters, empty if the cache is disabled.
+    """
+    return dict(cache.stats) if cache is not None else {}
+
+
+def _cached(key: tuple, load) -> object:
+    """Get a value through the cache, loading and caching it on a miss.
+    Args:
+        key (tuple): The cache key.
+        load (callable): The function reading the value from the database.
+    Returns:
+        object: The value.
+    """
+    if cache is None:
+        return load()
+    value = cache.get(key)
+    if value is None:
+        cacheable = _cacheable()
+        generation = _generation()
+        value = load()
+        if value is not None and cacheable:
+            _store(key, value, generation)
+    return value
+
+
+def _generation() -> int:
+    """Get the generation of the cached values of the current list, bumped by
+    every write to the list, see _invalidate()."""
+    return cache.counter(("lists", current_list()))
+
+
+def _store(key: tuple, value: object, generation: int) -> None:
+    """Cache a value read from the database, unless the list was written since
+    `generation`, read before the value: the value may then be older than the
+    write. Checked again after the set, in case the write invalidated the key
+    in between.
+    Args:
+        key (tuple): The cache key.
+        value (object): The value.
+        generation (int): The generation of the list before the read.
+    """
+    if _generation() != generation:
+        return
+    cache.set(key, value)
+    if _generation() != generation:
+        cache.delete(key)
+
+
+def _cacheable() -> bool:
+    """Check if the values read now can be cached: a replica may not have the
+    last writes yet, its reads are not cached until the writes of this process
+    are older than the read pin."""
+    return not replicas.read_engines or replicas.pinned_for() > 0 or (
+        time.monotonic() - replicas._last_write >= config["READ_PIN"] / 1000
+    )
+
 
-def is_db() -> bool:
+def _task_key(task_id: int) -> tuple:
+    """Build the cache key of a task of the current list."""
+    return ("task", current_list(), task_id)
+
+
+def _lists_key(*key: object) -> tuple:
+    """Build the cache key of a listing of the tasks of the current list, it
+    changes after every write to the list."""
+    list_id = current_list()
+    counter = cache.counter(("lists", list_id)) if cache is not None else 0
+    return ("list", list_id, counter, *key)
+
+
+def _invalidate(*task_ids: int) -> None:
+    """Remove the given tasks and all the listings of the current list from
+    the cache. Must be called after the transaction is committed.
+    Args:
+        task_ids (int): The ids of the modified tasks.
+    """
+    replicas._wrote()
+    if cache is not None:
+        cache.incr(("lists", current_list()))  # first, see _store()
+        cache.delete(*(_task_key(task_id) for task_id in task_ids))
+
+
+def is_db(refresh: bool = False) -> bool:
     """Check if the database exists.
+    The database is only inspected on the first call, the result is then cached.
+    create_database() keeps the cache up to date. In sharded mode, the
+    database of a list is created on its first use, so it always exists.
+    Args:
+        refresh (bool): If True, inspect the database again.
     Returns:
         bool: True if the database exists, False otherwise.
     """
-    return inspect(engine).get_table_names() == list(metadata.tables.keys())
+    global _db_exists, _schema_generation
+    if shards.router is not None:
+        return True
+    if refresh or _db_exists is None:
+        _schema_generation += 1
+        inspector = inspect(engine)
+        tables = set(inspector.get_table_names())
+        _db_exists = (
+            set(metadata.tables) <= tables
+            and not _missing_columns(inspector)
+            and not _missing_indexes(inspector)
+            and (FTS_TABLE in tables or not _has_fts5(engine))
+        )
+    return _db_exists
+
+
+def _missing_columns(inspector: sqlalchemy.Inspector) -> list[sqlalchemy.Column]:
+    """Get the columns of the tables missing from the database, the ones added
+    after it was created.
+    Args:
+        inspector (sqlalchemy.Inspector): An inspector of the database.
+    Returns:
+        list: The missing columns, of the existing tables only."""
+    missing = []
+    for table in metadata.tables.values():
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in existing)
+    return missing
+
+
+def _missing_indexes(inspector: sqlalchemy.Inspector) -> list[sqlalchemy.Index]:
+    """Get the indexes of the tables missing from the database, the ones added
+    after it was created.
+    Args:
+        inspector (sqlalchemy.Inspector): An inspector of the database.
+    Returns:
+        list: The missing indexes, of the existing tables only."""
+    missing = []
+    for table in metadata.tables.values():
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+_OBSOLETE_INDEXES = {
+    "ix_tasks_end_date",
+    "ix_tasks_done",
+    "ix_tasks_updated_at",
+    "ix_tasks_done_end_date",
+    "ix_tasks_tombstones_deleted_at",
+    "ix_tasks_list_id_updated_at",
+    "ix_tasks_tombstones_list_id_deleted_at",
+}  # replaced by the indexes starting with the list, and by the seq ones
+
+
+def _add_columns(connection: sqlalchemy.Connection) -> None:
+    """Add the missing columns and indexes to the tables, see _missing_columns()
+    and _missing_indexes(). create_all() only creates the missing tables.
+    The rows of a database without lists go to the list of config["LIST"].
+    Args:
+        connection (sqlalchemy.Connection): The connection of the migration.
+    """
+    columns = _missing_columns(inspect(connection))
+    for column in columns:
+        column_type = column.type.compile(connection.dialect)
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}"
+            )
+        )
+        if column.name == "list_id":
+            connection.execute(column.table.update().values(list_id=config["LIST"]))
+    if tasks_table.c.updated_at in columns:
+        connection.execute(tasks_table.update().values(updated_at=utcnow()))
+    if tasks_table.c.seq in columns:  # the changes before are all at 0
+        connection.execute(
+            tasks_table.update().values(seq=0, updated_at=tasks_table.c.updated_at)
+        )
+    if tombstones_table.c.seq in columns:
+        connection.execute(tombstones_table.update().values(seq=0))
+    inspector = inspect(connection)
+    for table in metadata.tables.values():
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+        if not inspector.has_table(table.name):
+            continue
+        for index in inspector.get_indexes(table.name):
+            if index["name"] not in _OBSOLETE_INDEXES:
+                continue
+            stmt = f"DROP INDEX {index['name']}"
+            if connection.dialect.name == "mysql":
+                stmt += f" ON {table.name}"
+            connection.execute(sqlalchemy.text(stmt))
+
+
+FTS_TABLE = "tasks_fts"  # full-text index of the descriptions, on SQLite
+
+
+def _has_fts5(bind: sqlalchemy.Engine | sqlalchemy.Connection) -> bool:
+    """Check if the database is SQLite with the FTS5 extension.
+    Args:
+        bind: The engine or connection of the database.
+    Returns:
+        bool: True if a full-text index can be created."""
+    if bind.dialect.name != "sqlite":
+        return False
+    if isinstance(bind, sqlalchemy.Engine):
+        with bind.connect() as connection:
+            return _has_fts5(connection)
+    options = bind.exec_driver_sql("PRAGMA compile_options").scalars()
+    return "ENABLE_FTS5" in set(options)
+
+
+def _create_fts(connection: sqlalchemy.Connection) -> None:
+    """Create the FTS5 index of the task descriptions, and the triggers keeping
+    it in sync with the tasks table, whatever writes to it. The index only
+    stores the terms, the descriptions stay in the tasks table.
+    Args:
+        connection (sqlalchemy.Connection): The connection of the migration.
+    """
+    if FTS_TABLE in inspect(connection).get_table_names():
+        return
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(task, content='tasks', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    connection.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+    )
+    delete = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, task) "
+        "VALUES ('delete', old.id, old.task);"
+    )
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, task) VALUES (new.id, new.task);"
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN {insert} END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN {delete} END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER tasks_fts_update AFTER UPDATE OF task ON tasks "
+        f"BEGIN {delete} {insert} END"
+    )
+
+
+def _create_schema(target: sqlalchemy.Engine, force: bool = False) -> None:
+    """Create the missing tables, columns and indexes of a database.
+    Args:
+        target (sqlalchemy.Engine): The engine of the database.
+        force (bool): If True, drop the tables first."""
+    if force:
+        metadata.drop_all(target)
+    metadata.create_all(target)
+    with target.begin() as connection:
+        _add_columns(connection)
+        if _has_fts5(connection):
+            if force:
+                connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            _create_fts(connection)
 
 
 def create_database(force: bool = False) -> bool:
     """Create the database
+    In sharded mode, the database of the current list, which is created on
+    its first use: only force recreates it.
     Args:
         force (bool): If True, recreate the database.
 
     Returns:
         bool: True if the database was created successfully, False otherwise.
     """
-    if is_db():
-        if force:
-            metadata.drop_all(engine)
-        else:
+    global _db_exists, _schema_generation
+    if shards.router is not None:
+        target = shards.router.engine(current_list())
+        if not force:
             return False
-    metadata.create_all(engine)
+        write_behind.flush_writes()
+        _create_schema(target, force=True)
+    else:
+        if is_db(refresh=True):
+            if not force:
+                return False
+            write_behind.flush_writes()
+        _db_exists = None
+        _create_schema(engine, force)
+        _db_exists = True
+    _schema_generation += 1
+    if cache is not None:
+        cache.clear()
+    return True
+
+
+def format_task(
+    task_id: int, task: str, end_date: date, done: bool, guid: uuid.UUID
+) -> str:
+    """Format a task for display, see Task.__str__.
+    Returns:
+        str: The string representation of the task.
+    """
+    return (
+        f"{task_id}. {'[X]' if done else '[ ]'} \t"
+        f"📅 {end_date.day:02}/{end_date.month:02}/{end_date.year} \t"
+        f"📝 {task} \t"
+        f"🔑 {guid}"
+    )
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     """A simple class to represent a task.
 
@@ -78,13 +522,7 @@ class Task:
         Returns:
             str: The string representation of the task.
         """
-        text = io.StringIO()
-        text.write(f"{self.id}. ")
-        text.write(f"{'[X]' if self.done else '[ ]'} \t")
-        text.write(f"📅 {self.end_date.strftime('%d/%m/%Y')} \t")
-        text.write(f"📝 {self.task} \t")
-        text.write(f"🔑 {self.guid}")
-        return text.getvalue()
+        return format_task(self.id, self.task, self.end_date, self.done, self.guid)
 
     def check(self) -> None:
         """Mark the task as done if it is not already, if it is, mark it as not done."""
@@ -92,6 +530,40 @@ class Task:
         update_task(self.id, self.done)
 
 
+def utcnow() -> datetime:
+    """The current time in UTC, as stored in the database (naive)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+_write_seq: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "tasks_write_seq", default=0
+)
+
+
+def _change_seq() -> int:
+    """The change sequence number of the rows written by the current
+    transaction: the version of the list it bumped, see _touch()."""
+    return _write_seq.get()
+
+
+def parse_utc(moment: str | datetime) -> datetime:
+    """Convert a time to UTC, as stored in the database (naive).
+    Args:
+        moment (str | datetime): The time, or its ISO format. A time without
+            timezone is in UTC.
+    Returns:
+        datetime: The time in UTC.
+    Raises:
+        ValueError: If the time is invalid."""
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if not isinstance(moment, datetime):
+        raise ValueError("Invalid time.")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
 tasks_table = sqlalchemy.Table(
     "tasks",
     metadata,
@@ -107,30 +579,225 @@ tasks_table = sqlalchemy.Table(
         unique=True,
         default=uuid.uuid4(),  # task unique id for server side
     ),
+    sqlalchemy.Column(
+        "updated_at",
+        sqlalchemy.DateTime,
+        default=utcnow,
+        onupdate=utcnow,  # set by every UPDATE statement which does not set it
+    ),  # time of the last change of the task, the last one wins in the delta sync
+    sqlalchemy.Column(
+        "seq", sqlalchemy.Integer, default=_change_seq, onupdate=_change_seq
+    ),  # change sequence number of the last change, the cursor of the delta sync
+    sqlalchemy.Column(
+        "list_id", sqlalchemy.String, default=current_list
+    ),  # the list of the task, every query is scoped to the current one
+    # every index starts with the list, so a query only reads its list
+    sqlalchemy.Index("ix_tasks_list_id", "list_id", "id"),
+    sqlalchemy.Index("ix_tasks_list_id_end_date", "list_id", "end_date", "id"),
+    sqlalchemy.Index(
+        "ix_tasks_list_id_done_end_date", "list_id", "done", "end_date"
+    ),  # the not done tasks by end date, for the due tasks (see models.scheduler)
+    sqlalchemy.Index("ix_tasks_list_id_seq", "list_id", "seq"),
 )
 
+tombstones_table = sqlalchemy.Table(
+    "tasks_tombstones",
+    metadata,
+    sqlalchemy.Column("uuid", sqlalchemy.Uuid(as_uuid=True), primary_key=True),
+    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("seq", sqlalchemy.Integer, default=_change_seq),
+    sqlalchemy.Column("list_id", sqlalchemy.String, default=current_list),
+    sqlalchemy.Index("ix_tasks_tombstones_list_id_seq", "list_id", "seq"),
+)  # the uuids of the removed tasks, for the delta sync
+
+_select_tasks = sqlalchemy.select(
+    tasks_table.c.id,
+    tasks_table.c.task,
+    tasks_table.c.end_date,
+    tasks_table.c.done,
+    tasks_table.c.uuid,
+)  # the columns of a Task, in order
+
+version_table = sqlalchemy.Table(
+    "tasks_version",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("modified", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("list_id", sqlalchemy.String, index=True, unique=True),
+)  # a row per list, bumped by every write to the tasks of the list
+
+NEVER = datetime(1970, 1, 1)  # the modification date of a list never written
+
+
+def _in_list(table: sqlalchemy.Table = tasks_table) -> sqlalchemy.ColumnElement:
+    """The condition selecting the rows of the current list of a table."""
+    return table.c.list_id == current_list()
+
+
+def _bump_version() -> sqlalchemy.Update:
+    """Build the statement bumping the version of the current list, and
+    returning the new one."""
+    return (
+        version_table.update()
+        .where(_in_list(version_table))
+        .values(version=version_table.c.version + 1, modified=sqlalchemy.func.now())
+        .returning(version_table.c.version)
+    )
+
+
+def _new_version() -> sqlalchemy.Insert:
+    """Build the statement adding the version of the current list, on its
+    first write."""
+    return version_table.insert().values(
+        list_id=current_list(), version=1, modified=sqlalchemy.func.now()
+    )
+
+
+def _touch(connection: sqlalchemy.Connection) -> int:
+    """Bump the version of the current list, first thing in a write transaction.
+    The new version is the change sequence number of the tasks and tombstones
+    the transaction writes (see _change_seq()), the cursor of the delta sync.
+    The version row stays locked until the commit, so the transactions commit
+    in the order of their numbers: once a version is read, every change up to
+    it is committed, whatever the clocks of the writers.
+    Args:
+        connection (sqlalchemy.Connection): The connection of the write.
+    Returns:
+        int: The new version.
+    """
+    version = connection.execute(_bump_version()).scalar()
+    if version is None:
+        version = 1
+        connection.execute(_new_version())
+    _write_seq.set(version)
+    return version
+
+
+def _bury(tombstones: list[tuple[uuid.UUID, datetime]]) -> list[tuple]:
+    """Build the statements recording the tombstones of removed tasks, to run
+    in the transaction of the removal.
+    Args:
+        tombstones (list[tuple]): The uuid of each removed task and the time of
+            its removal.
+    Returns:
+        list[tuple]: The statements and their parameters."""
+    return [
+        (
+            tombstones_table.delete().where(
+                tombstones_table.c.uuid.in_([guid for guid, _ in tombstones])
+            ),
+            None,
+        ),
+        (
+            tombstones_table.insert(),
+            [{"uuid": guid, "deleted_at": when} for guid, when in tombstones],
+        ),
+    ]
+
+
+def table_version() -> tuple[int, datetime]:
+    """Get the version of the tasks of the current list, it changes after every
+    committed write to the list. The changes held by the write-behind buffer
+    are not flushed, see models.write_behind.pending_writes().
+    Returns:
+        tuple: The version number and the date of the last write (UTC), 0 and
+            NEVER if the list was never written.
+    """
+    stmt = sqlalchemy.select(version_table.c.version, version_table.c.modified).where(
+        _in_list(version_table)
+    )
+    with replicas.read_engine().begin() as connection:
+        row = connection.execute(stmt).first()
+    return tuple(row) if row is not None else (0, NEVER)
+
+
+def list_names() -> list[str]:
+    """Get the names of the lists of tasks: the ones written at least once,
+    and the current one.
+    Returns:
+        list[str]: The names, sorted."""
+    if shards.router is not None:
+        names = shards.router.names()
+    else:
+        stmt = sqlalchemy.select(version_table.c.list_id).where(
+            version_table.c.list_id.is_not(None)
+        )
+        with replicas.read_engine().begin() as connection:
+            names = connection.execute(stmt).scalars().all()
+    return sorted({*names, current_list()})
+
 
 def add_task(
     task: str, end_date: date, done: bool = False, guid: uuid.UUID = None
-) -> bool:
+) -> int:
     """Add a task to the database.
     Args:
         task (str): The task to add.
         end_date (date): The end date of the task.
         done (bool): The status of the task.
     Returns:
-        bool: True if the task was added successfully, False otherwise.
+        int: The id of the added task.
     """
     if guid is None:
         guid = uuid.uuid4()
     obj = Task(None, task, end_date, done, guid)
+    write_behind.flush_writes()
 
     stmt = tasks_table.insert().values(
         task=obj.task, end_date=obj.end_date, done=obj.done, uuid=obj.guid
     )
-    with engine.begin() as connection:
-        connection.execute(stmt)
-        return True
+    with get_engine().begin() as connection:
+        _touch(connection)
+        result = connection.execute(stmt)
+    _invalidate()
+    return result.inserted_primary_key[0]
+
+
+def add_tasks(tasks: list[Task]) -> list[bool]:
+    """Add several tasks to the database in a single transaction.
+    Each chunk of tasks is inserted with one executemany. Tasks whose uuid
+    already exists (in the database, in any list, or earlier in `tasks`) are
+    not inserted.
+    Args:
+        tasks (list[Task]): The tasks to add.
+    Returns:
+        list[bool]: For each task, True if it was added, False if its uuid already exists.
+    """
+    write_behind.flush_writes()
+    added = []
+    seen = set()
+    with get_engine().begin() as connection:
+        _touch(connection)
+        for start in range(0, len(tasks), CHUNK_SIZE):
+            chunk = tasks[start : start + CHUNK_SIZE]
+            stmt = sqlalchemy.select(tasks_table.c.uuid).where(
+                tasks_table.c.uuid.in_([obj.guid for obj in chunk])
+            )
+            seen.update(connection.execute(stmt).scalars())
+
+            rows = []
+            for obj in chunk:
+                if obj.guid in seen:
+                    added.append(False)
+                    continue
+                seen.add(obj.guid)
+                added.append(True)
+                rows.append(
+                    {
+                        "task": obj.task,
+                        "end_date": obj.end_date,
+                        "done": obj.done,
+                        "uuid": obj.guid,
+                    }
+                )
+            if rows:
+                connection.execute(tasks_table.insert(), rows)
+        if not any(added):
+            connection.rollback()  # keeps the version
+    if any(added):
+        _invalidate()
+    return added
 
 
 def remove_task(task_id: int) -> bool:
@@ -140,10 +807,8 @@ def remove_task(task_id: int) -> bool:
     Returns:
         bool: True if the task was removed successfully, False otherwise.
     """
-    stmt = tasks_table.delete().where(tasks_table.c.id == task_id)
-    with engine.begin() as connection:
-        result = connection.execute(stmt)
-        return result.rowcount > 0
+    removed, _ = remove_tasks([task_id])
+    return bool(removed)
 
 
 def update_task(task_id: int, done: bool) -> bool:
@@ -154,10 +819,104 @@ def update_task(task_id: int, done: bool) -> bool:
     Returns:
         bool: True if the task was updated successfully, False otherwise.
     """
-    stmt = tasks_table.update().where(tasks_table.c.id == task_id).values(done=done)
-    with engine.begin() as connection:
+    buffered = write_behind._buffer(
+        [task_id], lambda found: write_behind.write_buffer.set_done(found, done)
+    )
+    if buffered is not None:
+        return bool(buffered[0])
+    stmt = (
+        tasks_table.update()
+        .where(tasks_table.c.id == task_id, _in_list())
+        .values(done=done)
+    )
+    with get_engine().begin() as connection:
+        _touch(connection)
         result = connection.execute(stmt)
-        return result.rowcount > 0
+        if not result.rowcount:
+            connection.rollback()  # keeps the version
+    _invalidate(task_id)
+    return result.rowcount > 0
+
+
+def _execute_by_chunks(stmt, task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Run an UPDATE or DELETE statement on several tasks in a single transaction.
+    The statement is executed once per chunk of ids, with an IN (...) clause.
+    The tombstones of deleted tasks are recorded in the same transaction.
+    Args:
+        stmt: The UPDATE or DELETE statement, without WHERE clause.
+        task_ids (list[int]): The ids of the tasks to affect.
+    Returns:
+        tuple: The ids of the affected tasks and the ids not found.
+    """
+    write_behind.flush_writes()
+    task_ids = list(dict.fromkeys(task_ids))
+    affected = set()
+    with get_engine().begin() as connection:
+        _touch(connection)
+        for start in range(0, len(task_ids), CHUNK_SIZE):
+            chunk = task_ids[start : start + CHUNK_SIZE]
+            rows = connection.execute(
+                stmt.where(tasks_table.c.id.in_(chunk), _in_list()).returning(
+                    tasks_table.c.id, tasks_table.c.uuid
+                )
+            ).all()
+            affected.update(row.id for row in rows)
+            if stmt.is_delete and rows:
+                now = utcnow()
+                for tombstone_stmt, params in _bury([(row.uuid, now) for row in rows]):
+                    connection.execute(tombstone_stmt, params)
+        if not affected:
+            connection.rollback()  # keeps the version
+    _invalidate(*affected)
+    return (
+        [task_id for task_id in task_ids if task_id in affected],
+        [task_id for task_id in task_ids if task_id not in affected],
+    )
+
+
+def remove_tasks(task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Remove several tasks from the database.
+    Args:
+        task_ids (list[int]): The ids of the tasks to remove.
+    Returns:
+        tuple: The ids of the removed tasks and the ids not found.
+    """
+    return _execute_by_chunks(tasks_table.delete(), task_ids)
+
+
+def set_done(task_ids: list[int], done: bool) -> tuple[list[int], list[int]]:
+    """Update the done status of several tasks.
+    Args:
+        task_ids (list[int]): The ids of the tasks to update.
+        done (bool): The new status of the tasks.
+    Returns:
+        tuple: The ids of the updated tasks and the ids not found.
+    """
+    buffered = write_behind._buffer(
+        task_ids, lambda found: write_behind.write_buffer.set_done(found, done)
+    )
+    if buffered is not None:
+        return buffered
+    return _execute_by_chunks(tasks_table.update().values(done=done), task_ids)
+
+
+def toggle_tasks(task_ids: list[int]) -> tuple[list[int], list[int]]:
+    """Mark several tasks as done if they are not, as not done otherwise.
+    The status is flipped in the database (SET done = NOT done), without reading it first.
+    Args:
+        task_ids (list[int]): The ids of the tasks to toggle.
+    Returns:
+        tuple: The ids of the toggled tasks and the ids not found.
+    """
+    buffered = write_behind._buffer(
+        task_ids, lambda found: write_behind.write_buffer.toggle(found)
+    )
+    if buffered is not None:
+        return buffered
+    return _execute_by_chunks(
+        tasks_table.update().values(done=sqlalchemy.not_(tasks_table.c.done)),
+        task_ids,
+    )
 
 
 def get_task(task_id: int) -> tuple:
@@ -167,10 +926,54 @@ def get_task(task_id: int) -> tuple:
     Returns:
         tuple: The task if found, None otherwise.
     """
-    stmt = tasks_table.select().where(tasks_table.c.id == task_id)
-    with engine.begin() as connection:
-        result = connection.execute(stmt)
-        return result.fetchone()
+    stmt = _select_tasks.where(tasks_table.c.id == task_id, _in_list())
+
+    def load() -> tuple:
+        with replicas.read_engine().begin() as connection:
+            return connection.execute(stmt).fetchone()
+
+    def read() -> list:
+        row = _cached(_task_key(task_id), load)
+        return [row] if row is not None else []
+
+    rows = write_behind._buffered_read(read)
+    return rows[0] if rows else None
+
+
+def get_tasks(task_ids: list[int]) -> tuple[list, list[int]]:
+    """Get several tasks from the database.
+    Tasks are fetched with chunked IN (...) queries in a single transaction.
+    Args:
+        task_ids (list[int]): The ids of the tasks to get.
+    Returns:
+        tuple: The tasks found, in the order of task_ids, and the ids not found.
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+
+    def read() -> list:
+        rows = {}
+        if cache is not None:
+            for task_id in task_ids:
+                row = cache.get(_task_key(task_id))
+                if row is not None:
+                    rows[task_id] = row
+        to_load = [task_id for task_id in task_ids if task_id not in rows]
+
+        cacheable = cache is not None and _cacheable()
+        generation = _generation() if cacheable else None
+        with replicas.read_engine().begin() as connection:
+            for start in range(0, len(to_load), CHUNK_SIZE):
+                chunk = to_load[start : start + CHUNK_SIZE]
+                stmt = _select_tasks.where(tasks_table.c.id.in_(chunk), _in_list())
+                for row in connection.execute(stmt):
+                    rows[row.id] = row
+                    if cacheable:
+                        _store(_task_key(row.id), row, generation)
+        return [rows[task_id] for task_id in task_ids if task_id in rows]
+
+    found = write_behind._buffered_read(read)
+    found_ids = {row.id for row in found}
+    return found, [task_id for task_id in task_ids if task_id not in found_ids]
 
 
 def tasks_list() -> list:
@@ -178,10 +981,166 @@ def tasks_list() -> list:
     Returns:
         list: The list of tasks.
     """
-    stmt = tasks_table.select()
-    with engine.begin() as connection:
-        result = connection.execute(stmt)
-        return result.fetchall()
+    write_behind.flush_writes()
+    stmt = _select_tasks.where(_in_list())
+
+    def load() -> list:
+        with replicas.read_engine().begin() as connection:
+            return connection.execute(stmt).fetchall()
+
+    return _cached(_lists_key("all"), load)
+
+
+def _cursor(row: tuple, order_by: str) -> str:
+    """Build the pagination cursor pointing after a task.
+    Args:
+        row (tuple): The last task of a page.
+        order_by (str): The column the tasks are sorted by.
+    Returns:
+        str: The cursor, "<id>" or "<end_date>,<id>".
+    """
+    if order_by == "end_date":
+        return f"{row.end_date.isoformat()},{row.id}"
+    return str(row.id)
+
+
+def _query_stmt(
+    done: bool = None,
+    end_from: date = None,
+    end_to: date = None,
+    overdue: bool = False,
+    contains: str = None,
+    order_by: str = "id",
+    descending: bool = False,
+    after: str = None,
+    limit: int = None,
+    today: date = None,
+) -> tuple[sqlalchemy.Select, tuple]:
+    """Build the SELECT statement of query_tasks() and its cache key.
+    Takes the same arguments as query_tasks().
+    Returns:
+        tuple: The statement, and the cache key of its result.
+    Raises:
+        ValueError: If order_by, the cursor or the limit is invalid.
+    """
+    if order_by not in ("id", "end_date"):
+        raise ValueError(f"Cannot sort tasks by {order_by}.")
+    _check_limit(limit)
+
+    table = tasks_table.c
+    stmt = _select_tasks.where(_in_list())
+    if done is not None:
+        stmt = stmt.where(table.done == done)
+    if end_from is not None:
+        stmt = stmt.where(table.end_date >= end_from)
+    if end_to is not None:
+        stmt = stmt.where(table.end_date <= end_to)
+    if overdue:
+        stmt = stmt.where(
+            table.done.is_(False),
+            table.end_date < (today or date.today()),
+        )
+    if contains:
+        stmt = stmt.where(table.task.contains(contains, autoescape=True))
+
+    keys = [table.id] if order_by == "id" else [table.end_date, table.id]
+    if after is not None:
+        if order_by == "id":
+            values = [int(after)]
+        else:
+            end_date, task_id = after.split(",")
+            values = [date.fromisoformat(end_date), int(task_id)]
+        key, value = sqlalchemy.tuple_(*keys), sqlalchemy.tuple_(*values)
+        stmt = stmt.where(key < value if descending else key > value)
+    stmt = stmt.order_by(*(key.desc() if descending else key for key in keys))
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+
+    key = (done, end_from, end_to, overdue, contains, order_by, descending, after)
+    if overdue:
+        key += (today or date.today(),)
+    return stmt, _lists_key("query", limit, *key)
+
+
+def _check_limit(limit: int) -> None:
+    """Check the number of tasks of a page.
+    Args:
+        limit (int): The maximum number of tasks to return, None for all of them.
+    Raises:
+        ValueError: If the limit is lower than 1.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError(f"Invalid limit: {limit}, expected at least 1.")
+
+
+def _page(rows: list, limit: int, order_by: str) -> tuple[list, str]:
+    """Cut the extra row fetched by a query_tasks() statement.
+    Args:
+        rows (list): The rows of the statement, up to limit + 1.
+        limit (int): The maximum number of tasks to return.
+        order_by (str): The column the tasks are sorted by.
+    Returns:
+        tuple: The tasks, and the cursor of the next page (None if it is the last one).
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _cursor(rows[-1], order_by)
+
+
+def query_tasks(
+    done: bool = None,
+    end_from: date = None,
+    end_to: date = None,
+    overdue: bool = False,
+    contains: str = None,
+    order_by: str = "id",
+    descending: bool = False,
+    after: str = None,
+    limit: int = None,
+    today: date = None,
+) -> tuple[list, str]:
+    """Get a filtered, sorted page of tasks from the database.
+    Pagination is keyset based: `after` is the cursor returned with the previous
+    page, so every page costs an index seek instead of an OFFSET scan.
+    The changes of the write-behind buffer are applied to the tasks read when
+    no filter or sort depends on them, they are flushed first otherwise.
+    Args:
+        done (bool): Only the done (True) or not done (False) tasks.
+        end_from (date): Only the tasks ending on or after this date.
+        end_to (date): Only the tasks ending on or before this date.
+        overdue (bool): Only the not done tasks whose end date is before today.
+        contains (str): Only the tasks whose description contains this text.
+        order_by (str): The column to sort by, "id" or "end_date".
+        descending (bool): Sort in descending order.
+        after (str): The cursor of the previous page.
+        limit (int): The maximum number of tasks to return.
+        today (date): The reference date for overdue tasks, defaults to today.
+    Returns:
+        tuple: The tasks, and the cursor of the next page (None if it is the last one).
+    Raises:
+        ValueError: If order_by, the cursor or the limit is invalid.
+    """
+    stmt, key = _query_stmt(
+        done, end_from, end_to, overdue, contains, order_by, descending, after, limit, today
+    )
+
+    def load() -> list:
+        with replicas.read_engine().begin() as connection:
+            return connection.execute(stmt).fetchall()
+
+    if (
+        done is None
+        and end_from is None
+        and end_to is None
+        and not overdue
+        and not contains
+        and order_by == "id"
+    ):
+        rows = write_behind._buffered_read(lambda: _cached(key, load))
+        return _page(rows, limit, order_by)
+    write_behind.flush_writes()
+    return _page(_cached(key, load), limit, order_by)
 
 
 def edit_task(task_id: int, task_obj: Task) -> bool:
@@ -193,11 +1152,53 @@ def edit_task(task_id: int, task_obj: Task) -> bool:
     Returns:
         bool: True if the task was edited successfully, False otherwise.
     """
+
+    def edit(found: list[int]) -> None:
+        if found:
+            write_behind.write_buffer.edit(task_id, task_obj.task, task_obj.end_date)
+
+    buffered = write_behind._buffer([task_id], edit)
+    if buffered is not None:
+        return bool(buffered[0])
     stmt = (
         tasks_table.update()
-        .where(tasks_table.c.id == task_id)
+        .where(tasks_table.c.id == task_id, _in_list())
         .values(task=task_obj.task, end_date=task_obj.end_date)
     )
-    with engine.begin() as connection:
+    with get_engine().begin() as connection:
+        _touch(connection)
+        result = connection.execute(stmt)
+        if not result.rowcount:
+            connection.rollback()  # keeps the version
+    _invalidate(task_id)
+    return result.rowcount > 0
+
+
+def patch_task(task_id: int, fields: dict) -> bool:
+    """Update some fields of a task in one statement, the other ones are kept.
+    Args:
+        task_id (int): The id of the task to update.
+        fields (dict): The new values of some of task, end_date and done.
+    Returns:
+        bool: True if the task exists, False otherwise.
+    """
+    if not fields:
+        return get_task(task_id) is not None
+    write_behind.flush_writes()
+    stmt = (
+        tasks_table.update()
+        .where(tasks_table.c.id == task_id, _in_list())
+        .values(**fields)
+    )
+    with get_engine().begin() as connection:
+        _touch(connection)
         result = connection.execute(stmt)
-        return result.rowcount > 0
+        if not result.rowcount:
+            connection.rollback()  # keeps the version
+    _invalidate(task_id)
+    return result.rowcount > 0
+
+
+# the shards, the replicas and the write-behind buffer work on the tables and
+# the functions above
+from models import replicas, shards, write_behind  # noqa: E402
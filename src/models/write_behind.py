@@ -0,0 +1,360 @@
+"""A write-behind buffer of the status changes and edits of tasks, see
+WriteBuffer: enabled by TASKS_WRITE_BEHIND_DELAY, the writes of models.tasks
+go through it, and its reads apply the changes it holds.
+"""
+
+import atexit
+import logging
+import threading
+from datetime import date, datetime
+import sqlalchemy
+from src import config
+from models import tasks as models
+from models import replicas
+from models.tasks import CHUNK_SIZE, NEVER, tasks_table
+
+logger = logging.getLogger(__name__)
+
+
+_DONE_VALUES = {
+    ("set", True): True,
+    ("set", False): False,
+    ("toggle", True): sqlalchemy.not_(tasks_table.c.done),
+}  # the new status of the buffered status changes
+
+
+class BufferedRow(tuple):
+    """A task row with the changes buffered by the write-behind buffer applied,
+    read like the rows of the database."""
+
+    __slots__ = ()
+
+    id = property(lambda self: self[0])
+    task = property(lambda self: self[1])
+    end_date = property(lambda self: self[2])
+    done = property(lambda self: self[3])
+    uuid = property(lambda self: self[4])
+
+
+_edit_update = (
+    tasks_table.update()
+    .where(tasks_table.c.id == sqlalchemy.bindparam("b_id"))
+    .values(
+        task=sqlalchemy.bindparam("b_task"),
+        end_date=sqlalchemy.bindparam("b_end_date"),
+    )
+)
+
+
+class WriteBuffer:
+    """A write-behind buffer of the status changes and edits of tasks.
+    Instead of one transaction (one fsync) each, the changes are kept in
+    memory and committed together in one transaction, `delay` seconds after
+    the first one or once `max_ops` are buffered. The changes of a task are
+    merged: two toggles cancel out, the last status set or edit wins.
+
+    The buffer is flushed before every other write of this process, and
+    before the reads that filter or sort on the buffered fields. The other
+    reads of the tasks (get_task(), get_tasks(), the listings by id) apply the
+    buffered changes to the rows they read instead, see overlay(), so the
+    process always reads its own writes. Other processes only see the changes
+    once flushed, and a crash loses at most the last `delay` seconds of
+    changes. The changes are kept by list, and committed in one transaction
+    per list. A flush that fails keeps the changes, and is retried after
+    `delay` seconds.
+
+    Attributes:
+        delay (float): The seconds a change may wait before being committed.
+        max_ops (int): The number of changes that triggers a flush.
+        stats (dict): The buffered changes, the flushes, and the changes
+            merged away.
+        generation (int): The number of flushes started, see overlay().
+
+    Methods:
+        toggle: Buffer the toggle of tasks.
+        set_done: Buffer the status of tasks.
+        edit: Buffer the edit of a task.
+        pending: Get the changes buffered for a list.
+        overlay: Apply the buffered changes to rows read from the database.
+        flush: Commit the buffered changes.
+    """
+
+    def __init__(self, delay: float, max_ops: int) -> None:
+        self.delay = delay
+        self.max_ops = max_ops
+        self.stats = {"operations": 0, "flushes": 0, "merged": 0}
+        self._done = {}  # (list, task id): ("set", status) or ("toggle", True)
+        self._edits = {}  # (list, task id): (task, end_date)
+        self._ops = 0  # changes since the last flush
+        self._pending = {}  # list: (changes buffered, date of the last one)
+        self._lock = threading.RLock()
+        self._timer = None
+        self.generation = 0
+
+    def _buffered(self, count: int) -> None:
+        """Count new changes of the current list, then flush or schedule a flush."""
+        self._ops += count
+        self.stats["operations"] += count
+        list_id = models.current_list()
+        changes, _ = self._pending.get(list_id, (0, NEVER))
+        self._pending[list_id] = (changes + count, models.utcnow())
+        if self._ops >= self.max_ops:
+            self.flush()
+        elif self._timer is None:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        """Flush the buffer in `delay` seconds, on a timer thread."""
+        self._timer = threading.Timer(self.delay, self._flush_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_later(self) -> None:
+        """Flush the buffer on the timer thread. An error is logged, the flush
+        is then retried by flush()."""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception(
+                "Could not commit the buffered writes, retrying in %s s", self.delay
+            )
+
+    def _merge_done(self, task_id: int, change: tuple) -> None:
+        """Merge a status change with the buffered one of the task."""
+        key = (models.current_list(), task_id)
+        current = self._done.get(key)
+        if current is not None:
+            self.stats["merged"] += 1
+        if change[0] == "set" or current is None:
+            self._done[key] = change
+        elif current[0] == "set":
+            self._done[key] = ("set", not current[1])
+        else:
+            del self._done[key]  # two toggles cancel out
+
+    def toggle(self, task_ids: list[int]) -> None:
+        """Buffer the toggle of the status of tasks.
+        Args:
+            task_ids (list[int]): The ids of existing tasks."""
+        if not task_ids:
+            return
+        with self._lock:
+            for task_id in task_ids:
+                self._merge_done(task_id, ("toggle", True))
+            self._buffered(len(task_ids))
+
+    def set_done(self, task_ids: list[int], done: bool) -> None:
+        """Buffer the status of tasks.
+        Args:
+            task_ids (list[int]): The ids of existing tasks.
+            done (bool): The new status."""
+        if not task_ids:
+            return
+        with self._lock:
+            for task_id in task_ids:
+                self._merge_done(task_id, ("set", bool(done)))
+            self._buffered(len(task_ids))
+
+    def edit(self, task_id: int, task: str, end_date: date) -> None:
+        """Buffer the edit of a task.
+        Args:
+            task_id (int): The id of an existing task.
+            task (str): The new description.
+            end_date (date): The new end date."""
+        with self._lock:
+            key = (models.current_list(), task_id)
+            if key in self._edits:
+                self.stats["merged"] += 1
+            self._edits[key] = (task, end_date)
+            self._buffered(1)
+
+    def pending(self, list_id: str) -> tuple[int, datetime]:
+        """Get the changes of a list buffered since the buffer was created.
+        Args:
+            list_id (str): The list.
+        Returns:
+            tuple: The number of changes, and the date of the last one (UTC),
+                0 and NEVER if there is none."""
+        with self._lock:
+            return self._pending.get(list_id, (0, NEVER))
+
+    def overlay(self, rows: list, generation: int) -> list | None:
+        """Apply the buffered changes of the current list to rows read from the
+        database.
+        Args:
+            rows (list): The (id, task, end_date, done, uuid) rows.
+            generation (int): The generation of the buffer before the read.
+        Returns:
+            list: The rows, None if a flush started since `generation`: the rows
+                may then miss changes no longer buffered, and must be read again.
+        """
+        with self._lock:
+            if self.generation != generation:
+                return None
+            list_id = models.current_list()
+            return [self._apply(list_id, row) for row in rows]
+
+    def _apply(self, list_id: str, row: tuple) -> tuple:
+        """Apply the buffered changes of a task to its row."""
+        change = self._done.get((list_id, row.id))
+        edit = self._edits.get((list_id, row.id))
+        if change is None and edit is None:
+            return row
+        task, end_date = edit if edit is not None else (row.task, row.end_date)
+        done = row.done
+        if change is not None:
+            done = change[1] if change[0] == "set" else not row.done
+        return BufferedRow((row.id, task, end_date, done, row.uuid))
+
+    def flush(self) -> None:
+        """Commit the buffered changes in one transaction per list. The changes
+        stay buffered, and the readers of this process wait, until they are
+        committed. If a commit fails, the changes not committed stay buffered
+        and the flush is retried after `delay` seconds.
+        Raises:
+            sqlalchemy.exc.SQLAlchemyError: If a commit fails."""
+        if not self._ops:
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._ops:
+                return
+            self.generation += 1
+            lists = {key[0] for key in self._done} | {key[0] for key in self._edits}
+            try:
+                for list_id in lists:
+                    with models.use_list(list_id):
+                        self._commit(list_id)
+            except Exception:
+                self._schedule()
+                raise
+            self._ops = 0
+            self.stats["flushes"] += 1
+
+    def _commit(self, list_id: str) -> None:
+        """Commit the buffered changes of a list, then forget them."""
+        done = {key: change for key, change in self._done.items() if key[0] == list_id}
+        edits = {key: edit for key, edit in self._edits.items() if key[0] == list_id}
+        groups = {change: [] for change in _DONE_VALUES}
+        for (_, task_id), change in done.items():
+            groups[change].append(task_id)
+        with models.get_engine().begin() as connection:
+            models._touch(connection)
+            for change, task_ids in groups.items():
+                for start in range(0, len(task_ids), CHUNK_SIZE):
+                    connection.execute(
+                        tasks_table.update()
+                        .where(
+                            tasks_table.c.id.in_(task_ids[start : start + CHUNK_SIZE]),
+                            models._in_list(),
+                        )
+                        .values(done=_DONE_VALUES[change])
+                    )
+            if edits:
+                connection.execute(
+                    _edit_update.where(models._in_list()),
+                    [
+                        {"b_id": task_id, "b_task": task, "b_end_date": end_date}
+                        for (_, task_id), (task, end_date) in edits.items()
+                    ],
+                )
+        models._invalidate(*(task_id for _, task_id in [*done, *edits]))
+        for key in done:
+            del self._done[key]
+        for key in edits:
+            del self._edits[key]
+
+
+write_buffer = (
+    WriteBuffer(config["WRITE_BEHIND_DELAY"] / 1000, config["WRITE_BEHIND_MAX_OPS"])
+    if config["WRITE_BEHIND_DELAY"]
+    else None
+)
+
+
+def set_write_buffer(buffer: WriteBuffer | None) -> None:
+    """Set the write-behind buffer, the current one is flushed first.
+    Args:
+        buffer (WriteBuffer): The buffer, None to commit every write at once.
+    """
+    global write_buffer
+    flush_writes()
+    write_buffer = buffer
+
+
+def flush_writes() -> None:
+    """Commit the changes buffered by the write-behind buffer, if any.
+    Called before the writes and the reads of models.tasks which cannot apply
+    the buffered changes, see WriteBuffer."""
+    if write_buffer is not None:
+        write_buffer.flush()
+
+
+atexit.register(flush_writes)
+
+
+def _buffered_read(read) -> list:
+    """Read rows of tasks with the changes of the write-behind buffer applied,
+    instead of flushing them first, see WriteBuffer.overlay().
+    Args:
+        read (callable): Reads the (id, task, end_date, done, uuid) rows.
+    Returns:
+        list: The rows."""
+    if write_buffer is None:
+        return read()
+    while True:
+        generation = write_buffer.generation
+        rows = write_buffer.overlay(read(), generation)
+        if rows is not None:
+            return rows
+
+
+def pending_writes() -> tuple[int, datetime]:
+    """Get the changes of the current list held by the write-behind buffer,
+    which models.tasks.table_version() does not count yet.
+    Returns:
+        tuple: The number of changes buffered by this process, and the date of
+            the last one (UTC), 0 and NEVER if there is none."""
+    if write_buffer is None:
+        return 0, NEVER
+    return write_buffer.pending(models.current_list())
+
+
+def _existing(task_ids: list[int]) -> set[int]:
+    """Get which tasks exist, for the writes buffered without running.
+    Args:
+        task_ids (list[int]): The ids of the tasks.
+    Returns:
+        set[int]: The ids of the existing tasks."""
+    found = set()
+    with models.get_engine().begin() as connection:
+        for start in range(0, len(task_ids), CHUNK_SIZE):
+            stmt = sqlalchemy.select(tasks_table.c.id).where(
+                tasks_table.c.id.in_(task_ids[start : start + CHUNK_SIZE]),
+                models._in_list(),
+            )
+            found.update(connection.execute(stmt).scalars())
+    return found
+
+
+def _buffer(task_ids: list[int], write) -> tuple[list[int], list[int]] | None:
+    """Buffer a write of tasks in the write-behind buffer, if it is enabled and
+    the write is small enough to gain from it.
+    Args:
+        task_ids (list[int]): The ids of the tasks to write.
+        write (callable): Buffers the write of the existing tasks.
+    Returns:
+        tuple: The ids of the existing tasks and the ids not found, None if
+            the write must run now."""
+    if write_buffer is None or len(task_ids) > write_buffer.max_ops:
+        return None
+    task_ids = list(dict.fromkeys(task_ids))
+    found = _existing(task_ids)
+    write([task_id for task_id in task_ids if task_id in found])
+    replicas._wrote()
+    return (
+        [task_id for task_id in task_ids if task_id in found],
+        [task_id for task_id in task_ids if task_id not in found],
+    )
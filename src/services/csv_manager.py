@@ -3,66 +3,328 @@
 import csv
 import io
 import dataclasses
-from sqlalchemy.exc import IntegrityError
+import os
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from models import tasks as models
+from models import replicas
+from models import sync
+from models import task_batch
+from src import config
 
+BLOCK_SIZE = 2**20  # bytes of CSV parsed per job by import_file()
 
-def export_tasks(tasks: list[int] = None) -> str:
+
+def _write_csv(batches: Iterator[task_batch.TaskBatch]) -> Iterator[str]:
+    """Format batches of tasks as CSV, one chunk of text per batch.
+    Args:
+        batches (Iterator[task_batch.TaskBatch]): The batches of tasks to write.
+    Yields:
+        str: The CSV header, then the CSV content of each batch."""
+    tasks_fieldsnames = [f.name for f in dataclasses.fields(models.Task)]
+
+    output = io.StringIO()
+    csvwriter = csv.writer(output)
+    csvwriter.writerow(tasks_fieldsnames)
+    for batch in batches:
+        csvwriter.writerows(batch.rows())
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+    if output.tell():
+        yield output.getvalue()
+
+
+def _counted(
+    batches: Iterable[task_batch.TaskBatch], progress: Callable[[int], None]
+) -> Iterator[task_batch.TaskBatch]:
+    """Report the size of each batch to `progress` once it is consumed."""
+    for batch in batches:
+        yield batch
+        progress(len(batch))
+
+
+def export_tasks(
+    tasks: list[int] = None, progress: Callable[[int], None] = None
+) -> tuple[Iterator[str], list[int]]:
     """Export tasks to a CSV file.
+    The CSV content is generated lazily, batch by batch, so it can be streamed
+    to a file or a HTTP response without building the whole file in memory.
     Args:
-        tasks (list[int]): The list of tasks to export.
+        tasks (list[int]): The list of tasks to export. If empty, export all tasks.
+        progress (Callable): Called with the number of tasks of each batch written.
     Returns:
-        str: The CSV content."""
+        tuple: The CSV content as an iterator of chunks, and the tasks not found."""
     tasks_not_found = []
-    if len(tasks) == 0:
-        tasks_list = models.tasks_list()
+    if not tasks:
+        batches = task_batch.iter_tasks()
     else:
-        tasks_list = []
-        for task in tasks:
-            if models.get_task(task) is None:
-                tasks_not_found.append(task)
-            else:
-                tasks_list.append(models.get_task(task))
+        tasks_list, tasks_not_found = models.get_tasks(tasks)
+        batches = [task_batch.TaskBatch.from_rows(tasks_list)]
+    if progress is not None:
+        batches = _counted(batches, progress)
+    return _write_csv(batches), tasks_not_found
 
-    tasks_fieldsnames = [f.name for f in dataclasses.fields(models.Task)]
 
-    output = io.StringIO()
-    csvwriter = csv.DictWriter(output, fieldnames=tasks_fieldsnames)
-    csvwriter.writeheader()
+def _row_to_task(
+    task: str, end_date: str, done: str = False, guid: str = None
+) -> models.Task:
+    """Build a task from the fields of a CSV row, like models.add_task does.
+    Raises:
+        ValueError: If the end date or the guid is invalid."""
+    return models.Task(
+        None, task, end_date, done, uuid.uuid4() if guid is None else guid
+    )
 
-    for task in tasks_list:
-        csvwriter.writerow(dict(zip(tasks_fieldsnames, task)))
 
-    return output.getvalue(), tasks_not_found
+def _validate(rows: Iterable[list]) -> Iterator[tuple]:
+    """Validate CSV rows, header rows are skipped.
+    Args:
+        rows (Iterable[list]): The CSV rows.
+    Yields:
+        tuple: Each row and its task, None if the row is invalid."""
+    header = [f.name for f in dataclasses.fields(models.Task)]
+    for row in rows:
+        if row == header:
+            continue
+        try:
+            yield row, _row_to_task(*row[1:])
+        except (ValueError, TypeError):
+            yield row, None
+
+
+def _insert(
+    validated: Iterable[tuple],
+    added_tasks: list = None,
+    progress: Callable[[int], None] = None,
+) -> tuple:
+    """Insert validated rows in chunks of models.CHUNK_SIZE, one transaction per
+    chunk. This is the only writer of an import.
+    Args:
+        validated (Iterable[tuple]): The rows and their task, see _validate().
+        added_tasks (list): A list to collect the added rows in, if given.
+        progress (Callable): Called with the number of rows of each chunk.
+    Returns:
+        tuple: The number of added tasks, and the skipped rows with the reason,
+            in the order of the file."""
+    added_count = 0
+    skippeds_tasks = []
+    pending = []
+
+    def flush() -> None:
+        nonlocal added_count
+        added = iter(models.add_tasks([task for _, task in pending if task]))
+        for row, task in pending:
+            if task is None:
+                skippeds_tasks.append((row, "Invalid task."))
+            elif next(added):
+                added_count += 1
+                if added_tasks is not None:
+                    added_tasks.append(row)
+            else:
+                skippeds_tasks.append((row, "Task already exists."))
+        if progress is not None:
+            progress(len(pending))
+        pending.clear()
+
+    for row, task in validated:
+        pending.append((row, task))
+        if len(pending) >= models.CHUNK_SIZE:
+            flush()
+    flush()
+
+    return added_count, skippeds_tasks
 
 
 def import_tasks(content: str) -> tuple[list]:
     """Import tasks from a CSV file.
+    Rows are validated then inserted in chunks of models.CHUNK_SIZE, one
+    transaction per chunk. Invalid or already existing rows are skipped.
     Args:
         content (str): The content of the CSV file.
     Returns:
         tuple: A tuple containing the added tasks and the skipped tasks."""
-    reader = csv.reader(io.StringIO(content))
-    tasks = list(reader)
-
-    skippeds_tasks = []
     added_tasks = []
-    for task in tasks:
-        if task == [f.name for f in dataclasses.fields(models.Task)]:
-            continue
-        try:
-            models.add_task(*task[1:])
-            added_tasks.append(task)
-        except (ValueError, IntegrityError) as e:
-            skippeds_tasks.append(
+    _, skippeds_tasks = _insert(_validate(csv.reader(io.StringIO(content))), added_tasks)
+    return added_tasks, skippeds_tasks
+
+
+def _split_ranges(path: str, block_size: int) -> Iterator[tuple[int, int]]:
+    """Split a CSV file into byte ranges of about block_size bytes, each ending
+    at the end of a row. A newline only ends a row if the quotes before it,
+    from the start of the range, are balanced.
+    Args:
+        path (str): The CSV file.
+        block_size (int): The size of the blocks read.
+    Yields:
+        tuple: The start and the end of each range."""
+    start = position = 0
+    quotes = 0  # quotes since the start of the range
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            total = quotes + block.count(b'"')
+            suffix = 0  # quotes after the newline tried
+            end = len(block)
+            while (newline := block.rfind(b"\n", 0, end)) != -1:
+                suffix += block.count(b'"', newline, end)
+                if (total - suffix) % 2 == 0:
+                    break
+                end = newline
+            if newline == -1:
+                quotes = total
+            else:
+                yield start, position + newline + 1
+                start = position + newline + 1
+                quotes = suffix
+            position += len(block)
+    if start < position:
+        yield start, position
+
+
+def _parse_range(path: str, start: int, end: int) -> list[tuple]:
+    """Parse and validate the rows of a byte range of a CSV file, in a worker.
+    Returns:
+        list[tuple]: The rows and their task, see _validate()."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        content = f.read(end - start).decode("utf-8")
+    return list(_validate(csv.reader(io.StringIO(content))))
+
+
+def _parse_ranges(
+    pool: ProcessPoolExecutor, path: str, ranges: Iterator, max_pending: int
+) -> Iterator[tuple]:
+    """Parse byte ranges of a CSV file in a process pool.
+    A range is only submitted when the writer pulls rows and less than
+    max_pending ranges are parsed or waiting, which bounds the memory used.
+    Yields:
+        tuple: The rows and their task, in the order of the file."""
+    pending = deque()
+    try:
+        for start, end in ranges:
+            pending.append(pool.submit(_parse_range, path, start, end))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def import_file(
+    path: str, workers: int = None, progress: Callable[[int], None] = None
+) -> tuple[int, list]:
+    """Import tasks from a CSV file, for very large files.
+    The file is split into ranges of BLOCK_SIZE bytes, parsed and validated in
+    a pool of processes, and the valid rows are inserted by a single writer, as
+    with import_tasks(). At most two ranges per worker are held in memory.
+    Args:
+        path (str): The path of the CSV file.
+        workers (int): The number of processes, config["IMPORT_WORKERS"] if not
+            set. With one process, the ranges are parsed by the writer itself.
+        progress (Callable): Called with the number of rows of each chunk inserted.
+    Returns:
+        tuple: The number of added tasks, and the skipped rows with the reason,
+            in the order of the file."""
+    workers = workers or config["IMPORT_WORKERS"]
+    ranges = _split_ranges(path, BLOCK_SIZE)
+    if workers == 1 or os.path.getsize(path) <= BLOCK_SIZE:
+        rows = (row for r in ranges for row in _parse_range(path, *r))
+        return _insert(rows, progress=progress)
+
+    with ProcessPoolExecutor(workers) as pool:
+        return _insert(_parse_ranges(pool, path, ranges, workers * 2), progress=progress)
+
+
+CHANGES_HEADER = [f.name for f in dataclasses.fields(sync.Change)]
+
+
+def is_changes(header: str) -> bool:
+    """Check if the first line of a CSV file is the header of a changes file.
+    Args:
+        header (str): The first line of the file.
+    Returns:
+        bool: True if the file holds changes, see export_changes()."""
+    return next(csv.reader([header]), None) == CHANGES_HEADER
+
+
+def export_changes(since: int = None) -> tuple[Iterator[str], int]:
+    """Export the changes of the tasks after a change, the removals included, to
+    a CSV file which import_changes() merges into another instance.
+    Args:
+        since (int): Only the changes after this one (see
+            sync.last_change()), all if not set.
+    Returns:
+        tuple: The CSV content as an iterator of chunks, and the number of the
+            last change exported, to use as `since` for the next export."""
+    with replicas.stick_reads():
+        until = sync.last_change()
+        if until <= (since or 0):
+            return iter([",".join(CHANGES_HEADER) + "\r\n"]), since or 0
+        changes = sync.iter_changes(since, until)
+
+    def write() -> Iterator[str]:
+        output = io.StringIO()
+        csvwriter = csv.writer(output)
+        csvwriter.writerow(CHANGES_HEADER)
+        for batch in changes:
+            csvwriter.writerows(
                 (
-                    task,
-                    (
-                        "Task already exists."
-                        if e.__class__ == IntegrityError
-                        else "Invalid task."
-                    ),
+                    change.guid,
+                    change.updated_at.isoformat(),
+                    change.deleted,
+                    change.task,
+                    change.end_date and change.end_date.isoformat(),
+                    change.done,
                 )
+                for change in batch
             )
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+        if output.tell():
+            yield output.getvalue()
 
-    return added_tasks, skippeds_tasks
+    return write(), until
+
+
+def import_changes(content: str) -> tuple[list]:
+    """Merge a CSV file of changes from another instance, see export_changes()
+    and sync.merge_changes(). Changes are merged in chunks of
+    models.CHUNK_SIZE, one transaction per chunk.
+    Args:
+        content (str): The content of the CSV file.
+    Returns:
+        tuple: The applied changes with their outcome ("added", "updated" or
+            "deleted"), and the skipped changes with the reason, in the order of
+            the file."""
+    applied = []
+    skipped = []
+    pending = []
+
+    def flush() -> None:
+        outcomes = iter(sync.merge_changes([c for _, c in pending if c]))
+        for row, change in pending:
+            if change is None:
+                skipped.append((row, "Invalid change."))
+            elif (outcome := next(outcomes)) == "skipped":
+                skipped.append((row, "The local task is up to date."))
+            else:
+                applied.append((row, outcome))
+        pending.clear()
+
+    for row in csv.reader(io.StringIO(content)):
+        if row == CHANGES_HEADER:
+            continue
+        try:
+            pending.append((row, sync.Change(*row)))
+        except (ValueError, TypeError):
+            pending.append((row, None))
+        if len(pending) >= models.CHUNK_SIZE:
+            flush()
+    flush()
+
+    return applied, skipped
@@ -0,0 +1,175 @@
+"""Jobs package for running imports and exports in the background.
+
+Jobs run on a local pool of threads and are kept in an in-memory registry,
+so a request only submits a job and returns; the client then polls the job
+and fetches its result once it is done. The registry is per process:
+with several server processes, a job must be polled on the one that runs it.
+Finished jobs are forgotten, and their files removed, after JOB_TTL seconds.
+"""
+
+import contextvars
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from src import config
+from services import csv_manager
+from services import snapshot_manager
+
+EXTENSIONS = {"csv": ".csv", "snapshot": ".snap"}
+
+
+@dataclass(slots=True)
+class Job:
+    """A background import or export.
+
+    Attributes:
+        id (str): The id of the job.
+        kind (str): "import" or "export".
+        status (str): "pending", "running", "done" or "failed".
+        progress (int): The number of tasks processed so far.
+        result (dict): The report of an import, or the format and the tasks not
+            found of an export, once done.
+        error (str): The error message of a failed job.
+        path (str): The file imported, or exported to.
+        created (float): When the job was submitted.
+        finished (float): When the job ended.
+    """
+
+    kind: str
+    path: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "pending"
+    progress: int = 0
+    result: object = None
+    error: str = None
+    created: float = field(default_factory=time.time)
+    finished: float = None
+
+    def advance(self, count: int) -> None:
+        """Add processed tasks to the progress of the job."""
+        self.progress += count
+
+    def to_json(self) -> dict:
+        """The state of the job, without its result."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+        }
+
+
+_jobs: dict[str, Job] = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(config["JOB_WORKERS"], thread_name_prefix="tasks-job")
+
+
+def _expire() -> None:
+    """Forget the jobs finished more than JOB_TTL seconds ago."""
+    deadline = time.time() - config["JOB_TTL"]
+    with _lock:
+        expired = [j for j in _jobs.values() if j.finished and j.finished < deadline]
+        for job in expired:
+            del _jobs[job.id]
+    for job in expired:
+        if job.kind == "export":
+            _remove(job.path)
+
+
+def _remove(path: str) -> None:
+    """Remove a file, if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _run(job: Job, work) -> None:
+    """Run a job in a worker thread and record its outcome."""
+    job.status = "running"
+    try:
+        job.result = work(job)
+        job.status = "done"
+    except Exception as e:  # pylint: disable=broad-except
+        job.error = str(e) or type(e).__name__
+        job.status = "failed"
+    finally:
+        job.finished = time.time()
+
+
+def _submit(job: Job, work) -> Job:
+    """Register a job and queue it on the worker pool."""
+    _expire()
+    with _lock:
+        _jobs[job.id] = job
+    # run in a copy of the context of the request, so on its list of tasks
+    _executor.submit(contextvars.copy_context().run, _run, job, work)
+    return job
+
+
+def _import(job: Job) -> dict:
+    """Import the file of a job, a CSV file or a snapshot, then remove it."""
+    try:
+        with open(job.path, "rb") as f:
+            head = f.read(len(snapshot_manager.MAGIC))
+        if snapshot_manager.is_snapshot(head):
+            added, skipped = snapshot_manager.import_snapshot(job.path, job.advance)
+            added = len(added)
+        else:
+            added, skipped = csv_manager.import_file(job.path, progress=job.advance)
+    finally:
+        _remove(job.path)
+    return {
+        "added": added,
+        "skipped": [{"row": list(map(str, row)), "error": e} for row, e in skipped],
+    }
+
+
+def submit_import(path: str) -> Job:
+    """Import a file in the background, see csv_manager.import_file().
+    Args:
+        path (str): The file to import, a CSV file or a snapshot. The job takes
+            ownership of the file and removes it once imported.
+    Returns:
+        Job: The submitted job, its result is the number of added tasks and
+            the skipped rows."""
+    return _submit(Job("import", path), _import)
+
+
+def submit_export(tasks: list[int] = None, file_format: str = "csv") -> Job:
+    """Export tasks to a file in the background.
+    Args:
+        tasks (list[int]): The tasks to export. If empty, export all tasks.
+        file_format (str): "csv" or "snapshot".
+    Returns:
+        Job: The submitted job, its result is the file format and the tasks
+            not found, the file is at job.path."""
+    fd, path = tempfile.mkstemp(suffix=EXTENSIONS[file_format])
+    os.close(fd)
+
+    def export(job: Job) -> dict:
+        if file_format == "snapshot":
+            not_found = snapshot_manager.export_snapshot(path, tasks, job.advance)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                content, not_found = csv_manager.export_tasks(tasks, job.advance)
+                f.writelines(content)
+        return {"format": file_format, "not_found": not_found}
+
+    return _submit(Job("export", path), export)
+
+
+def get_job(job_id: str) -> Job | None:
+    """Get a job.
+    Args:
+        job_id (str): The id of the job.
+    Returns:
+        Job: The job, None if it does not exist or expired."""
+    _expire()
+    with _lock:
+        return _jobs.get(job_id)
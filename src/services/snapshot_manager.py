@@ -0,0 +1,234 @@
+"""Snapshot package for exporting and importing tasks in a columnar binary format.
+
+A snapshot stores the tasks column by column, little-endian, each column
+aligned on 8 bytes:
+
+    magic       8 bytes, b"TOUDOUS1"
+    count       uint64, the number of tasks (n)
+    blob_size   uint64, the size of the strings blob
+    ids         int64[n]
+    end_dates   int32[n], date ordinals
+    done        uint8[n]
+    guids       16 bytes[n]
+    offsets     uint64[n + 1], the start of each description in the blob
+    blob        the UTF-8 descriptions, one after the other
+
+Snapshots are written and read through mmap, and importing one needs no
+date, boolean or uuid parsing.
+"""
+
+import itertools
+import mmap
+import struct
+import sys
+import uuid
+from array import array
+from collections.abc import Callable
+from datetime import date
+from models import tasks as models
+from models import task_batch
+
+MAGIC = b"TOUDOUS1"
+HEADER = struct.Struct("<8sQQ")
+COLUMNS = [  # name, typecode, bytes per task
+    ("ids", "q", 8),
+    ("end_dates", "i", 4),
+    ("done", "B", 1),
+    ("guids", "B", 16),
+]
+_MAX_ORDINAL = date.max.toordinal()
+
+
+def _align(size: int) -> int:
+    """Round a size up to a multiple of 8."""
+    return (size + 7) & ~7
+
+
+def _layout(count: int) -> dict:
+    """Compute the offset of each column of a snapshot.
+    Args:
+        count (int): The number of tasks.
+    Returns:
+        dict: The offset of each column, and of the blob."""
+    offsets = {}
+    offset = HEADER.size
+    for name, _, width in COLUMNS:
+        offsets[name] = offset
+        offset += _align(count * width)
+    offsets["offsets"] = offset
+    offsets["blob"] = offset + (count + 1) * 8
+    return offsets
+
+
+def _column(buffer: memoryview, offset: int, typecode: str, count: int):
+    """Read a column of a snapshot without copying it (on little-endian hosts).
+    Args:
+        buffer (memoryview): The snapshot.
+        offset (int): The offset of the column.
+        typecode (str): The array typecode of the column.
+        count (int): The number of values.
+    Returns:
+        The values, as a memoryview or an array."""
+    size = struct.calcsize(typecode)
+    raw = buffer[offset : offset + count * size]
+    if sys.byteorder == "little":
+        return raw.cast(typecode)
+    values = array(typecode, raw)
+    values.byteswap()
+    return values
+
+
+def _to_bytes(values: array) -> bytes:
+    """Get the little-endian bytes of an array."""
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def is_snapshot(content: bytes | memoryview) -> bool:
+    """Check if some content is a snapshot.
+    Args:
+        content (bytes): The start of the content, at least 8 bytes.
+    Returns:
+        bool: True if the content starts like a snapshot."""
+    return bytes(content[: len(MAGIC)]) == MAGIC
+
+
+def export_snapshot(
+    path: str, tasks: list[int] = None, progress: Callable[[int], None] = None
+) -> list[int]:
+    """Export tasks to a snapshot file.
+    Args:
+        path (str): The file to write.
+        tasks (list[int]): The list of tasks to export. If empty, export all tasks.
+        progress (Callable): Called with the number of tasks of each batch read.
+    Returns:
+        list[int]: The tasks not found."""
+    tasks_not_found = []
+    if tasks:
+        found, tasks_not_found = models.get_tasks(tasks)
+        batch = task_batch.TaskBatch.from_rows(found)
+        if progress is not None:
+            progress(len(batch))
+    else:
+        batch = task_batch.TaskBatch()
+        for part in task_batch.iter_tasks():
+            batch.extend(part)
+            if progress is not None:
+                progress(len(part))
+
+    count = len(batch)
+    strings = [task.encode("utf-8") for task in batch.tasks]
+    offsets = array("Q", [0])
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+    layout = _layout(count)
+    size = layout["blob"] + offsets[-1]
+
+    with open(path, "wb+") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as buffer:
+            buffer[: HEADER.size] = HEADER.pack(MAGIC, count, offsets[-1])
+            buffer[layout["ids"] : layout["ids"] + count * 8] = _to_bytes(batch.ids)
+            buffer[layout["end_dates"] : layout["end_dates"] + count * 4] = _to_bytes(
+                array("i", batch.end_dates)
+            )
+            buffer[layout["done"] : layout["done"] + count] = batch.done.tobytes()
+            buffer[layout["guids"] : layout["guids"] + count * 16] = batch.guids
+            buffer[layout["offsets"] : layout["blob"]] = _to_bytes(offsets)
+            buffer[layout["blob"] :] = b"".join(strings)
+
+    return tasks_not_found
+
+
+def _check_columns(end_dates, done, offsets, blob_size: int) -> None:
+    """Check the columns of a snapshot before importing any task.
+    Args:
+        end_dates: The end dates, as date ordinals.
+        done: The status of the tasks.
+        offsets: The start of each description in the blob, and its end.
+        blob_size (int): The size of the blob, from the header.
+    Raises:
+        ValueError: If a column is corrupted."""
+    if offsets[0] != 0 or offsets[-1] != blob_size:
+        raise ValueError("Corrupted tasks snapshot: the offsets do not match the blob.")
+    if any(start > end for start, end in itertools.pairwise(offsets)):
+        raise ValueError("Corrupted tasks snapshot: the offsets are not in order.")
+    if len(end_dates) and (min(end_dates) < 1 or max(end_dates) > _MAX_ORDINAL):
+        raise ValueError("Corrupted tasks snapshot: an end date is out of range.")
+    if len(done) and max(done) > 1:
+        raise ValueError("Corrupted tasks snapshot: a status is not 0 or 1.")
+
+
+def _import_buffer(
+    buffer: memoryview, progress: Callable[[int], None] = None
+) -> tuple[list]:
+    """Import the tasks of a snapshot, see import_snapshot()."""
+    if len(buffer) < HEADER.size or not is_snapshot(buffer):
+        raise ValueError("Not a tasks snapshot.")
+    _, count, blob_size = HEADER.unpack_from(buffer)
+    layout = _layout(count)
+    if len(buffer) < layout["blob"] + blob_size:
+        raise ValueError("Truncated tasks snapshot.")
+
+    ids = _column(buffer, layout["ids"], "q", count)
+    end_dates = _column(buffer, layout["end_dates"], "i", count)
+    done = buffer[layout["done"] : layout["done"] + count]
+    guids = buffer[layout["guids"] : layout["guids"] + count * 16]
+    offsets = _column(buffer, layout["offsets"], "Q", count + 1)
+    blob = buffer[layout["blob"] : layout["blob"] + blob_size]
+
+    added_tasks = []
+    skippeds_tasks = []
+    try:
+        _check_columns(end_dates, done, offsets, blob_size)
+        for start in range(0, count, models.CHUNK_SIZE):
+            rows = [
+                (
+                    ids[i],
+                    str(blob[offsets[i] : offsets[i + 1]], "utf-8"),
+                    date.fromordinal(end_dates[i]),
+                    bool(done[i]),
+                    uuid.UUID(bytes=bytes(guids[i * 16 : i * 16 + 16])),
+                )
+                for i in range(start, min(start + models.CHUNK_SIZE, count))
+            ]
+            added = models.add_tasks([models.Task(None, *row[1:]) for row in rows])
+            for row, row_added in zip(rows, added):
+                if row_added:
+                    added_tasks.append(row)
+                else:
+                    skippeds_tasks.append((row, "Task already exists."))
+            if progress is not None:
+                progress(len(rows))
+    finally:
+        # the mmap can only be closed once every view on it is released
+        for view in (ids, end_dates, done, guids, offsets, blob):
+            if isinstance(view, memoryview):
+                view.release()
+    return added_tasks, skippeds_tasks
+
+
+def import_snapshot(
+    source: str | bytes, progress: Callable[[int], None] = None
+) -> tuple[list]:
+    """Import tasks from a snapshot.
+    Tasks are inserted in chunks of models.CHUNK_SIZE, one transaction per
+    chunk. Already existing tasks are skipped.
+    Args:
+        source (str | bytes): The path of the snapshot file, or its content.
+        progress (Callable): Called with the number of tasks of each chunk.
+    Returns:
+        tuple: A tuple containing the added tasks and the skipped tasks.
+    Raises:
+        ValueError: If the source is not a snapshot, or is truncated or
+            corrupted: nothing is imported then."""
+    if isinstance(source, bytes):
+        with memoryview(source) as buffer:
+            return _import_buffer(buffer, progress)
+
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as buffer:
+                return _import_buffer(buffer, progress)
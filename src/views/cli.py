@@ -1,19 +1,104 @@
 """The main module for the tasks CLI."""
 
+import contextvars
+import cProfile
+import importlib.util
 import inspect
+import io
 import os
+import pstats
+import shlex
+import sys
+import time
 from datetime import date, datetime
-from sqlalchemy.exc import OperationalError
 import click
-from models import tasks as models
-from services import csv_manager as services
+
+
+def lazy_import(name: str):
+    """Import a module lazily, it is only executed on its first attribute access.
+    Keeps SQLAlchemy, the engine and the csv services out of the startup
+    of the commands that do not use them (like --help).
+    Args:
+        name (str): The name of the module.
+    Returns:
+        module: The module.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+sqlalchemy = lazy_import("sqlalchemy")
+models = lazy_import("models.tasks")
+services = lazy_import("services.csv_manager")
+snapshots = lazy_import("services.snapshot_manager")
+search_models = lazy_import("models.search")
+scheduler_models = lazy_import("models.scheduler")
+task_index = lazy_import("models.task_index")
+task_batch = lazy_import("models.task_batch")
+replicas = lazy_import("models.replicas")
+metrics = lazy_import("models.metrics")
 
 EXPORT_PATH = "exports/"
 
 
 @click.group()
-def cli():
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print the time, the SQL statements and the profile of the command.",
+)
+@click.option(
+    "-L",
+    "--list",
+    "list_id",
+    help="The list of tasks to work on, TASKS_LIST (or default) if not given.",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, list_id: str):
     """A simple CLI for managing tasks."""
+    if list_id is not None:
+        try:
+            models.set_list(list_id)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--list") from e
+    if profile:
+        for engine in (models.get_engine(), *replicas.read_engines):
+            metrics.instrument(engine)
+        scope = metrics.Scope(detail=True).start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        ctx.call_on_close(lambda: print_profile(profiler, scope))
+
+
+def print_profile(profiler: cProfile.Profile, scope, top: int = 10) -> None:
+    """Print the summary of a profiled command on stderr: its time, its SQL
+    statements, the slowest first, and the functions taking the most time.
+    Args:
+        profiler (cProfile.Profile): The profiler of the command.
+        scope (metrics.Scope): The scope of the command, with detail.
+        top (int): The number of statements and functions to print."""
+    profiler.disable()
+    scope.stop()
+    click.echo(
+        f"\n{scope.elapsed * 1000:.1f} ms, {scope.statements} SQL statements "
+        f"in {scope.sql_seconds * 1000:.1f} ms",
+        err=True,
+    )
+    queries = sorted(scope.queries.items(), key=lambda q: q[1][1], reverse=True)
+    for statement, (count, seconds) in queries[:top]:
+        statement = " ".join(statement.split())
+        click.echo(
+            f"{count:6} x {seconds * 1000:9.2f} ms  {statement[:100]}", err=True
+        )
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+    click.echo(stream.getvalue(), err=True)
 
 
 @cli.command()
@@ -35,13 +120,173 @@ def init_db():
 
 
 @cli.command()
-def todo():
-    """List all tasks."""
+def lists():
+    """List the lists of tasks, the current one marked with a *."""
+    try:
+        names = models.list_names()
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+        return
+    for name in names:
+        click.echo(f"{'*' if name == models.current_list() else ' '} {name}")
+
+
+@cli.command()
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=1),
+    help="The maximum number of tasks to list.",
+)
+@click.option("-a", "--after", help="The cursor given by the previous page.")
+@click.option(
+    "--done/--undone", default=None, help="List only the done or not done tasks."
+)
+@click.option("-o", "--overdue", is_flag=True, help="List only the overdue tasks.")
+@click.option("-c", "--contains", help="List only the tasks containing this text.")
+@click.option(
+    "-s",
+    "--sort",
+    type=click.Choice(["id", "end_date"]),
+    default="id",
+    show_default=True,
+    help="The column to sort the tasks by.",
+)
+def todo(
+    limit: int, after: str, done: bool, overdue: bool, contains: str, sort: str
+):
+    """List tasks.
+    USAGE: todo [--limit N] [--after CURSOR] [--done|--undone] [--overdue]
+    When --limit is given, the command for the next page is displayed."""
+    index = shell_index()
+    try:
+        tasks, cursor = (index.query_tasks if index else models.query_tasks)(
+            done=done,
+            overdue=overdue,
+            contains=contains,
+            order_by=sort,
+            after=after,
+            limit=limit,
+        )
+    except ValueError:
+        click.echo(f"Invalid cursor: {after} ❌")
+        return
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+        return
+
+    click.echo("Tasks:")
+    for line in task_batch.TaskBatch.from_rows(tasks).lines():
+        click.echo(line)
+    if cursor:
+        click.echo(f"More tasks, next page: --after {cursor}")
+
+
+@cli.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="The maximum number of tasks to list.",
+)
+def search(query: tuple[str], limit: int):
+    """Search tasks by the words of their description, the most relevant first.
+    QUERY is the words to search, the last one can be the start of a word."""
+    try:
+        tasks = search_models.search_tasks(" ".join(query), limit)
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+        return
+
+    if not tasks:
+        click.echo("No task found.")
+        return
+    click.echo("Tasks:")
+    for line in task_batch.TaskBatch.from_rows(tasks).lines():
+        click.echo(line)
+
+
+@cli.command()
+@click.option(
+    "-w",
+    "--within",
+    type=lambda within: scheduler_models.parse_within(within),
+    default="7d",
+    show_default=True,
+    help="The time span from today, in days (3d) or weeks (2w).",
+)
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=1),
+    help="The maximum number of tasks to list.",
+)
+@click.option("-a", "--after", help="The cursor given by the previous page.")
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running, and print a reminder when a task ends within the time"
+    " span and when it gets overdue.",
+)
+@click.option(
+    "--every",
+    type=click.IntRange(min=1),
+    default=60,
+    show_default=True,
+    help="With --watch, the seconds between two checks.",
+)
+def due(within, limit: int, after: str, watch: bool, every: int):
+    """List the not done tasks ending within a time span, the overdue ones first.
+    USAGE: due [--within 3d] [--limit N] [--after CURSOR] [--watch [--every SECONDS]]"""
+    if watch:
+        watch_due(within, every)
+        return
+    today = date.today()
+    try:
+        tasks, cursor = scheduler_models.due_tasks(within, today, after, limit)
+    except ValueError:
+        click.echo(f"Invalid cursor: {after} ❌")
+        return
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+        return
+
+    overdue = [task for task in tasks if task.end_date < today]
+    upcoming = tasks[len(overdue) :]
+    if overdue:
+        click.echo("Overdue:")
+        for line in task_batch.TaskBatch.from_rows(overdue).lines():
+            click.echo(line)
+    click.echo(f"Due by {(today + within).strftime('%d/%m/%Y')}:")
+    for line in task_batch.TaskBatch.from_rows(upcoming).lines():
+        click.echo(line)
+    if cursor:
+        click.echo(f"More tasks, next page: --after {cursor}")
+
+
+def watch_due(within, every: int) -> None:
+    """Print the reminders of the tasks until interrupted, see due --watch.
+    Args:
+        within (timedelta): How long before its end date a task is reminded.
+        every (int): The seconds between two checks."""
+    scheduler = scheduler_models.Scheduler(lead=within)
+    scheduler.listeners.append(
+        lambda event: click.echo(
+            click.style(f"{event.kind.capitalize()}: ", fg="red", bold=True)
+            + str(models.Task(*event.task))
+        )
+    )
+    click.echo("Watching the due tasks, Ctrl+C to stop.")
     try:
-        click.echo("Tasks:")
-        for task in models.tasks_list():
-            click.echo(models.Task(*task))
-    except OperationalError:
+        while True:
+            scheduler.poll()
+            time.sleep(every)
+    except KeyboardInterrupt:
+        pass
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -50,14 +295,15 @@ def todo():
 def get(task: int):
     """Get a specific task by ID.
     TASK is the ID of the task to get."""
+    index = shell_index()
     try:
-        task_obj = models.get_task(task)
+        task_obj = index.get_task(task) if index else models.get_task(task)
         if task_obj:
             click.echo(models.Task(*task_obj))
         else:
             click.echo(f"Task {task} not found ! ❌")
             click.echo("For knowing the task_id, use 'todo' command.")
-    except OperationalError:
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -85,7 +331,7 @@ def add(task: str, end_date: datetime):
             click.echo("Task added ! ✅")
             click.echo(f"Task: {task}, End date: {end_date.strftime('%d/%m/%Y')}")
 
-    except OperationalError:
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -99,19 +345,12 @@ def remove(task_id: int):
     If the task does not exist, an error message will be displayed.
     For knowing the task_id, use the list command."""
     try:
-        if len(task_id) > 1:
-            for task in task_id:
-                if models.remove_task(task):
-                    click.echo(f"Task {task} removed ! ✅")
-                else:
-                    click.echo(f"Task {task} not found ! ❌")
-            return
-        task_id = task_id[0]
-        if models.remove_task(task_id):
-            click.echo(f"Task {task_id} removed ! ✅")
-        else:
-            click.echo(f"Task {task_id} not found ! ❌")
-    except OperationalError:
+        removed, missing = models.remove_tasks(task_id)
+        for task in removed:
+            click.echo(f"Task {task} removed ! ✅")
+        for task in missing:
+            click.echo(f"Task {task} not found ! ❌")
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -148,7 +387,7 @@ def edit(task_id: int, task: str, end_date: datetime):
                 click.echo(f"Task {task_id} not found ! ❌")
         except TypeError:
             click.echo(f"Task {task_id} not found ! ❌")
-    except OperationalError:
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -161,22 +400,12 @@ def done(task_id: int):
     If the task does not exist, an error message will be displayed.
     For knowing the task_id, use the list command."""
     try:
-        if len(task_id) > 1:
-            for task in task_id:
-                task = models.Task(*models.get_task(task))
-                if task:
-                    task.check()
-                    click.echo(f"Task {task_id} updated ! ✅")
-                else:
-                    click.echo(f"Task {task_id} not found ! ❌")
-            return
-        task_id = task_id[0]
-        try:
-            models.Task(*models.get_task(task_id)).check()
-            click.echo(f"Task {task_id} updated ! ✅")
-        except TypeError:
-            click.echo(f"Task {task_id} not found ! ❌")
-    except OperationalError:
+        updated, missing = models.toggle_tasks(task_id)
+        for task in updated:
+            click.echo(f"Task {task} updated ! ✅")
+        for task in missing:
+            click.echo(f"Task {task} not found ! ❌")
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
@@ -189,25 +418,45 @@ def done(task_id: int):
     default="tasks.csv",
     prompt=True,
 )
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["csv", "snapshot", "changes"]),
+    default="csv",
+    show_default=True,
+    help="The format of the file, snapshot is a compact binary format, changes"
+    " the CSV of the changes (removals included) to sync another instance.",
+)
+@click.option(
+    "--since",
+    type=click.IntRange(min=0),
+    help="With --format changes, only the changes after this one, as printed"
+    " by the previous export.",
+)
 @click.argument(
     "tasks",
     type=int,
     nargs=-1,
     required=False,
 )
-def texport(file: str, tasks: list[int]):
+def texport(file: str, file_format: str, since: int, tasks: list[int]):
     """Export tasks to a file.
-    USAGE: texport [--file FILE] [TASKS...]
+    USAGE: texport [--file FILE] [--format csv|snapshot|changes] [--since N] [TASKS...]
     FILE is the file to export to.
     TASKS are the tasks to export. If not specified, all tasks will be exported."""
-    if not tasks:
+    if file_format == "changes":
+        tasks = []
+    elif not tasks:
         click.echo("No tasks specified. Exporting all tasks.")
         click.echo(
             "If you want to export only specific tasks, use 'texport FILE TASK_ID [TASK_ID...]'"
         )
     try:
-        if file != "tasks.csv" and not file.endswith(".csv"):
-            file += ".csv"
+        extension = ".snap" if file_format == "snapshot" else ".csv"
+        if file_format == "snapshot" and file.endswith(".csv"):
+            file = file.removesuffix(".csv")
+        if not file.endswith(extension):
+            file += extension
 
         if os.path.isfile(f"{EXPORT_PATH}//{file}"):
             click.echo("File already exists. Do you want to overwrite it? (y/n)")
@@ -216,39 +465,98 @@ def texport(file: str, tasks: list[int]):
 
         file = f"{EXPORT_PATH}{file}"
 
-        try:
-            with open(file, "w", newline="", encoding="utf-8") as f:
-                export = services.export_tasks(tasks)
-                f.write(export[0])
-        except FileNotFoundError:
-            click.echo("Directory {EXPORT_PATH} does not exist. Creating it...")
+        if not os.path.isdir(EXPORT_PATH):
+            click.echo(f"Directory {EXPORT_PATH} does not exist. Creating it...")
             os.mkdir(EXPORT_PATH)
+
+        if file_format == "snapshot":
+            not_found = snapshots.export_snapshot(file, tasks)
+        elif file_format == "changes":
             with open(file, "w", newline="", encoding="utf-8") as f:
-                export = services.export_tasks(tasks)
-                f.write(export[0])
+                export, until = services.export_changes(since)
+                f.writelines(export)
+            click.echo(f"Changes exported to {file} ! ✅")
+            click.echo(f"Next changes: --since {until}")
+            return
+        else:
+            with open(file, "w", newline="", encoding="utf-8") as f:
+                export, not_found = services.export_tasks(tasks)
+                f.writelines(export)
         click.echo(f"Tasks exported to {file} ! ✅")
-        click.echo(f"Tasks not found: {export[1]}")
+        click.echo(f"Tasks not found: {not_found}")
 
-    except OperationalError:
+    except sqlalchemy.exc.OperationalError:
         error_db()
 
 
 @cli.command()
-@click.argument("file", type=click.File("r"))
-def timport(file: click.File):
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["auto", "csv", "snapshot", "changes"]),
+    default="auto",
+    show_default=True,
+    help="The format of the file, auto detects snapshots and changes.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Parse a large CSV file in JOBS processes, only the number of imported"
+    " tasks is printed.",
+)
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+def timport(file: str, file_format: str, jobs: int):
     """Import tasks from a file.
-    USAGE: timport FILE
+    USAGE: timport [--format auto|csv|snapshot|changes] [--jobs JOBS] FILE
     FILE is the file to import from."""
+    added = 0
     try:
-        valid, invalid = services.import_tasks(file.read())
-        services.import_tasks(file.read())
+        if file_format == "auto":
+            with open(file, "rb") as f:
+                is_snapshot = snapshots.is_snapshot(f.read(len(snapshots.MAGIC)))
+            if is_snapshot:
+                file_format = "snapshot"
+            else:
+                with open(file, encoding="utf-8", newline="") as f:
+                    is_changes = services.is_changes(f.readline())
+                file_format = "changes" if is_changes else "csv"
+
+        if file_format == "changes":
+            with open(file, encoding="utf-8", newline="") as f:
+                applied, skipped = services.import_changes(f.read())
+            click.echo(f"{len(applied)} changes merged from {file} ! ✅")
+            for row, outcome in applied:
+                click.echo(f"Task {row[0]} {outcome}.")
+            for row, reason in skipped:
+                click.echo(
+                    f"Task {row[0] if row else ''} - "
+                    + click.style("Skipped: ", fg="red")
+                    + click.style(reason, fg="yellow")
+                )
+            return
+
+        if file_format == "snapshot":
+            try:
+                valid, invalid = snapshots.import_snapshot(file)
+            except ValueError as e:
+                click.echo(f"{e} ❌")
+                return
+        elif jobs:
+            added, invalid = services.import_file(file, jobs)
+            valid = []
+            if added:
+                click.echo(f"{added} tasks imported from {file} ! ✅")
+        else:
+            with open(file, encoding="utf-8", newline="") as f:
+                valid, invalid = services.import_tasks(f.read())
         if valid:
-            click.echo(f"Tasks imported from {file.name} ! ✅")
+            click.echo(f"Tasks imported from {file} ! ✅")
             click.echo("Tasks importeds:")
             for task in valid:
                 click.echo(models.Task(*task))
         if invalid:
-            if not valid:
+            if not valid and not added:
                 click.echo("No tasks imported. ❌")
             click.echo("Invalid tasks:")
             for task in invalid:
@@ -258,8 +566,82 @@ def timport(file: click.File):
                     + click.style(task[1], fg="yellow")
                 )
 
-    except OperationalError:
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+
+
+def shell_index():
+    """Get the in-memory index of the tasks of the current list when the
+    command runs in the shell, see the shell command.
+    Returns:
+        TaskIndex: The index, None outside of the shell."""
+    obj = click.get_current_context().obj
+    return task_index.get_index() if obj and obj.get("shell") else None
+
+
+@cli.command()
+def shell():
+    """Run commands in an interactive shell, like `todo --limit 10`.
+    The shell keeps the database engine and its connections, and an
+    in-memory index of the tasks: todo and get answer from it, and it is
+    caught up with the tasks changed after each command.
+    Type `help` for the commands, `exit` or Ctrl-D to quit."""
+    try:
+        import readline  # noqa: F401, line editing and history of input()
+    except ImportError:
+        pass
+    try:
+        task_index.get_index().catch_up()
+    except sqlalchemy.exc.OperationalError:
+        error_db()
+        return
+
+    while True:
+        try:
+            line = input("tasks> ")
+        except EOFError:
+            click.echo()
+            return
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            click.echo(f"Invalid command: {e} ❌")
+            continue
+        if not args:
+            continue
+        if args[0] in ("exit", "quit"):
+            return
+        if args[0] == "shell":
+            click.echo("Already in the shell.")
+            continue
+        if args == ["help"]:
+            args = ["--help"]
+        # in a copy of the context, so --list only applies to its line
+        contextvars.copy_context().run(run_in_shell, args)
+
+
+def run_in_shell(args: list[str]) -> None:
+    """Run a command of the shell, then catch up the index of its list.
+    An error of the command is displayed, and the shell keeps running.
+    Args:
+        args (list[str]): The arguments of the command."""
+    try:
+        cli.main(args, prog_name="tasks", standalone_mode=False, obj={"shell": True})
+        task_index.get_index().catch_up()
+    except click.ClickException as e:
+        e.show()
+    except click.Abort:
+        click.echo("Aborted!")
+    except sqlalchemy.exc.OperationalError:
         error_db()
+    except Exception as e:
+        click.echo(
+            f"{click.style('ERROR: ', fg='red', bold=True)}{type(e).__name__}: {e}",
+            err=True,
+        )
 
 
 def error_db():
@@ -1,11 +1,13 @@
-"""This module is the entry point of the web application."""
-from flask import Flask
-from views.web.app import ui
+"""This module is the entry point of the web application.
 
-def create_app() -> None:
-    """Create the webapp."""
+create_app() is loaded on first use, so the ASGI app (views.web.asgi) can be
+imported without Flask.
+"""
 
-    app = Flask(__name__)
 
-    app.register_blueprint(ui)
-    return app
+def __getattr__(name: str):
+    if name == "create_app":
+        from views.web.factory import create_app
+
+        return create_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,389 @@
+"""JSON API for the tasks of the webapp.
+
+GET responses carry an ETag and a Last-Modified header derived from the
+version of the tasks table, so clients and proxies can revalidate them
+with a cheap 304 Not Modified.
+"""
+
+from datetime import date, datetime
+from flask import Blueprint, Response, abort, jsonify, request, send_file, url_for
+from models import tasks as model
+from models import replicas
+from models import write_behind
+from models import sync
+from models import search
+from models import scheduler
+from services import job_manager as jobs
+from views.web.app import save_upload
+from views.web.common import PAGE_SIZE, query_filters, task_fields, task_to_json
+
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+
+def conditional(build, day: date = None) -> Response:
+    """Answer a GET request, or a 304 if the client has the current version.
+    The version is checked before `build` runs, so a 304 costs no task query.
+    It counts the changes held by the write-behind buffer, which are not
+    flushed for it.
+    Args:
+        build (callable): The function building the response.
+        day (date): The day the response depends on, if it changes with the
+            day even without writes.
+    Returns:
+        Response: The response, with its ETag and Last-Modified headers."""
+    version, modified = model.table_version()
+    etag = f"tasks-{model.current_list()}-{version}"
+    pending, buffered_at = write_behind.pending_writes()
+    if pending:
+        etag += f"-{pending}"
+        modified = max(modified, buffered_at)
+    if day is not None:
+        etag += f"-{day.isoformat()}"
+        modified = max(modified, datetime.combine(day, datetime.min.time()))
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match
+        and request.if_modified_since
+        and request.if_modified_since.replace(tzinfo=None)
+        >= modified.replace(microsecond=0)
+    ):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.last_modified = modified
+    return response
+
+
+def json_body(*fields: str) -> dict:
+    """Get the JSON body of the request, abort with a 400 if a field is missing.
+    Args:
+        fields (str): The required fields.
+    Returns:
+        dict: The JSON body."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or any(field not in body for field in fields):
+        abort(400, f"A JSON object with {', '.join(fields)} is required.")
+    return body
+
+
+def json_task(*fields: str) -> dict:
+    """Get the task fields of the JSON body, see task_fields(), abort with a 400
+    if one is missing or invalid.
+    Args:
+        fields (str): The required fields.
+    Returns:
+        dict: The fields found."""
+    try:
+        return task_fields(json_body(*fields))
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def json_ids() -> list[int]:
+    """Get the "ids" list of the JSON body, abort with a 400 if it is invalid.
+    Returns:
+        list[int]: The ids."""
+    ids = json_body("ids")["ids"]
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        abort(400, "ids must be a list of integers.")
+    return ids
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+@api.errorhandler(409)
+def error(err: Exception) -> Response:
+    """Handle the API errors with a JSON body.
+    Returns:
+        Response: The error as JSON."""
+    return jsonify(error=err.description), err.code
+
+
+@api.errorhandler(500)
+def internal_error(err: Exception) -> Response:
+    """Handle the unexpected errors of the API with a JSON body.
+    Returns:
+        Response: The error as JSON."""
+    return jsonify(error="Internal server error."), 500
+
+
+@api.route("/tasks")
+def tasks_list() -> Response:
+    """List the tasks, paginated.
+    Takes the same query parameters as the /tasks page.
+    Returns:
+        Response: The tasks and the cursor of the next page."""
+
+    def build() -> Response:
+        try:
+            tasks, cursor = model.query_tasks(**query_filters(request.args))
+        except ValueError:
+            abort(400, "Invalid sort, limit or cursor.")
+        return jsonify(tasks=list(map(task_to_json, tasks)), next=cursor)
+
+    return conditional(build)
+
+
+@api.route("/tasks/search")
+def tasks_search() -> Response:
+    """Search the tasks with the words of the `q` query parameter, at most
+    `limit` of them, the most relevant first.
+    Returns:
+        Response: The tasks found."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        abort(400, "The q parameter is required.")
+    limit = request.args.get("limit", str(PAGE_SIZE))
+    if not limit.isdigit() or int(limit) < 1:
+        abort(400, "Invalid limit.")
+
+    def build() -> Response:
+        tasks = search.search_tasks(query, int(limit))
+        return jsonify(tasks=list(map(task_to_json, tasks)))
+
+    return conditional(build)
+
+
+@api.route("/tasks/due")
+def tasks_due() -> Response:
+    """List the not done tasks ending within the time span of the `within`
+    query parameter (like 3d or 2w, default 7d), the overdue ones first,
+    paginated with `limit` and `after`.
+    Returns:
+        Response: The tasks, each one with an overdue flag, the last end date
+            listed and the cursor of the next page."""
+    today = date.today()
+    try:
+        within = scheduler.parse_within(
+            request.args.get("within", scheduler.DEFAULT_WITHIN)
+        )
+    except ValueError as e:
+        abort(400, str(e))
+
+    def build() -> Response:
+        try:
+            tasks, cursor = scheduler.due_tasks(
+                within,
+                today,
+                request.args.get("after"),
+                request.args.get("limit", PAGE_SIZE, type=int),
+            )
+        except ValueError:
+            abort(400, "Invalid limit or cursor.")
+        return jsonify(
+            tasks=[
+                {**task_to_json(task), "overdue": task.end_date < today}
+                for task in tasks
+            ],
+            due_by=(today + within).isoformat(),
+            next=cursor,
+        )
+
+    return conditional(build, today)
+
+
+@api.route("/tasks/<int:task_id>")
+def task_get(task_id: int) -> Response:
+    """Get a task.
+    Returns:
+        Response: The task."""
+
+    def build() -> Response:
+        task = model.get_task(task_id)
+        if task is None:
+            abort(404, f"Task {task_id} not found.")
+        return jsonify(task_to_json(task))
+
+    return conditional(build)
+
+
+@api.route("/tasks", methods=["POST"])
+def task_add() -> Response:
+    """Add a task from a JSON object with task, end_date and optionally done.
+    Returns:
+        Response: The added task, with a 201 status."""
+    fields = json_task("task", "end_date")
+    task_id = model.add_task(
+        fields["task"], fields["end_date"], fields.get("done", False)
+    )
+    return jsonify(task_to_json(model.get_task(task_id))), 201
+
+
+@api.route("/tasks/<int:task_id>", methods=["PATCH"])
+def task_update(task_id: int) -> Response:
+    """Update a task from a JSON object with task, end_date and/or done.
+    Returns:
+        Response: The updated task."""
+    if not model.patch_task(task_id, json_task()):
+        abort(404, f"Task {task_id} not found.")
+    return jsonify(task_to_json(model.get_task(task_id)))
+
+
+@api.route("/tasks/<int:task_id>", methods=["DELETE"])
+def task_remove(task_id: int) -> Response:
+    """Remove a task.
+    Returns:
+        Response: An empty 204 response."""
+    if not model.remove_task(task_id):
+        abort(404, f"Task {task_id} not found.")
+    return Response(status=204)
+
+
+@api.route("/tasks/batch/get", methods=["POST"])
+def tasks_get() -> Response:
+    """Get several tasks from a JSON object with ids.
+    Returns:
+        Response: The tasks found and the ids not found."""
+    found, missing = model.get_tasks(json_ids())
+    return jsonify(tasks=list(map(task_to_json, found)), not_found=missing)
+
+
+@api.route("/tasks/batch/delete", methods=["POST"])
+def tasks_remove() -> Response:
+    """Remove several tasks from a JSON object with ids.
+    Returns:
+        Response: The ids removed and the ids not found."""
+    removed, missing = model.remove_tasks(json_ids())
+    return jsonify(removed=removed, not_found=missing)
+
+
+@api.route("/tasks/batch/done", methods=["POST"])
+def tasks_done() -> Response:
+    """Set the status of several tasks from a JSON object with ids and done.
+    If done is missing, the status of each task is toggled.
+    Returns:
+        Response: The ids updated and the ids not found."""
+    ids = json_ids()
+    done = request.get_json().get("done")
+    if done is None:
+        updated, missing = model.toggle_tasks(ids)
+    else:
+        updated, missing = model.set_done(ids, json_task()["done"])
+    return jsonify(updated=updated, not_found=missing)
+
+
+def job_accepted(job: jobs.Job) -> Response:
+    """Answer the submission of a job.
+    Returns:
+        Response: The job, with a 202 status and its URL as Location."""
+    response = jsonify(job.to_json())
+    response.status_code = 202
+    response.headers["Location"] = url_for("api.job_get", job_id=job.id)
+    return response
+
+
+@api.route("/jobs/import", methods=["POST"])
+def job_import() -> Response:
+    """Import a CSV file or a snapshot, sent as the "file" of a form, in the
+    background.
+    Returns:
+        Response: The import job, with a 202 status."""
+    file = request.files.get("file")
+    if not file:
+        abort(400, "A file is required.")
+    return job_accepted(jobs.submit_import(save_upload(file)))
+
+
+@api.route("/jobs/export", methods=["POST"])
+def job_export() -> Response:
+    """Export tasks in the background, from an optional JSON object with ids
+    (all tasks if missing) and format ("csv" or "snapshot").
+    Returns:
+        Response: The export job, with a 202 status."""
+    body = request.get_json(silent=True) or {}
+    ids = body.get("ids") or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        abort(400, "ids must be a list of integers.")
+    file_format = body.get("format", "csv")
+    if file_format not in jobs.EXTENSIONS:
+        abort(400, f"format must be one of {', '.join(jobs.EXTENSIONS)}.")
+    return job_accepted(jobs.submit_export(ids, file_format))
+
+
+@api.route("/jobs/<string:job_id>")
+def job_get(job_id: str) -> Response:
+    """Get the status and the progress of a job.
+    Returns:
+        Response: The job, with the URL of its result once done."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        abort(404, f"Job {job_id} not found.")
+    state = job.to_json()
+    if job.status == "done":
+        state["result"] = url_for("api.job_result", job_id=job.id)
+    return jsonify(state)
+
+
+@api.route("/jobs/<string:job_id>/result")
+def job_result(job_id: str) -> Response:
+    """Get the result of a finished job: the report of an import, the file of
+    an export.
+    Returns:
+        Response: The result, a 409 if the job is not done."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        abort(404, f"Job {job_id} not found.")
+    if job.status != "done":
+        abort(409, f"Job {job_id} is {job.status}.")
+    if job.kind == "import":
+        return jsonify(job.result)
+    return send_file(
+        job.path,
+        as_attachment=True,
+        download_name=f"tasks{jobs.EXTENSIONS[job.result['format']]}",
+    )
+
+
+def change_to_json(change: sync.Change) -> dict:
+    """Convert a change of a task to a JSON object.
+    Args:
+        change (sync.Change): The change.
+    Returns:
+        dict: The change as a JSON object."""
+    return {
+        "guid": str(change.guid),
+        "updated_at": change.updated_at.isoformat(),
+        "deleted": change.deleted,
+        "task": change.task,
+        "end_date": change.end_date and change.end_date.isoformat(),
+        "done": change.done,
+    }
+
+
+@api.route("/changes")
+def changes_get() -> Response:
+    """Get the changes of the tasks, removals included, to sync another instance.
+    Takes an optional since query parameter, the until of the previous call.
+    Returns:
+        Response: The changes, and the number of the last one as until."""
+    since = request.args.get("since")
+    if since is not None and not since.isdigit():
+        abort(400, "Invalid since.")
+    since = int(since) if since else None
+    changes = []
+    with replicas.stick_reads():
+        until = sync.last_change()
+        if until > (since or 0):
+            for batch in sync.iter_changes(since, until):
+                changes.extend(map(change_to_json, batch))
+        else:
+            until = since or 0
+    return jsonify(changes=changes, until=until)
+
+
+@api.route("/changes", methods=["POST"])
+def changes_merge() -> Response:
+    """Merge the changes of another instance, from a JSON object with changes,
+    see models.sync.merge_changes().
+    Returns:
+        Response: The outcome of each change: "added", "updated", "deleted" or
+            "skipped"."""
+    changes = json_body("changes")["changes"]
+    if not isinstance(changes, list) or not all(isinstance(c, dict) for c in changes):
+        abort(400, "changes must be a list of objects.")
+    try:
+        changes = [sync.Change(**change) for change in changes]
+    except (TypeError, ValueError):
+        abort(400, "Invalid change.")
+    return jsonify(outcomes=sync.merge_changes(changes))
@@ -1,14 +1,107 @@
 """Main module for tasks flask webapp."""
 
+import os
+import shutil
+import tempfile
 from datetime import date
-import dataclasses
-from flask import render_template, redirect, request, Response, Blueprint, abort, flash
+from flask import (
+    current_app,
+    render_template,
+    redirect,
+    request,
+    Response,
+    Blueprint,
+    abort,
+    flash,
+    url_for,
+)
+from markupsafe import Markup
+from werkzeug.datastructures import FileStorage
+from src import config
 from models import tasks as model
-from services import csv_manager as services
+from models import write_behind
+from models import task_batch
+from models import search
+from models import scheduler
+from models.cache import LRUCache
+from services import job_manager as jobs
+from views.web.common import PAGE_SIZE, query_filters
 
 
 ui = Blueprint("ui", __name__, url_prefix="/")
 
+# Rendered fragments of /tasks: the keys change with the content, the TTL only
+# frees the memory of the fragments no longer used
+fragments = (
+    LRUCache(config["RENDER_CACHE_SIZE"], 3600) if config["RENDER_CACHE_SIZE"] else None
+)
+
+
+def render_rows(
+    tasks: task_batch.TaskBatch, today: date, task_edit: int = None
+) -> Markup:
+    """Render the rows of the tasks list, each one through the fragments cache.
+    A row is keyed by what it shows, so a change only renders the rows of
+    the tasks changed.
+    Args:
+        tasks (TaskBatch): The tasks.
+        today (date): The day, the past end dates are highlighted.
+        task_edit (int): The task whose row is an edit form, never cached.
+    Returns:
+        Markup: The HTML of the rows."""
+    template = current_app.jinja_env.get_template("partials/task_row.html")
+    parts = []
+    for task in tasks:
+        editing = task.id == task_edit
+        past = task.end_date < today
+        key = ("row", task.id, task.task, task.end_date, task.done, past)
+        html = fragments.get(key) if fragments is not None and not editing else None
+        if html is None:
+            html = template.render(task=task, today=today, editing=editing)
+            if fragments is not None and not editing:
+                fragments.set(key, html)
+        parts.append(html)
+    return Markup("".join(parts))
+
+
+def render_list(load, today: date, task_edit: int = None) -> tuple[Markup, str]:
+    """Render the tasks list of a request, through the fragments cache.
+    The list is keyed by the list of tasks and its version, buffered writes
+    included, so any write invalidates it, by the day and by the page and its
+    query parameters.
+    Args:
+        load (callable): Returns the tasks of the list and the cursor of the
+            next page.
+        today (date): The day.
+        task_edit (int): The task being edited.
+    Returns:
+        tuple: The HTML of the rows and the cursor of the next page."""
+
+    def render() -> tuple[Markup, str]:
+        tasks_page, cursor = load()
+        batch = task_batch.TaskBatch.from_rows(tasks_page)
+        return render_rows(batch, today, task_edit), cursor
+
+    if fragments is None:
+        return render()
+    version, _ = model.table_version()
+    pending, _ = write_behind.pending_writes()
+    args = tuple(sorted(request.args.items(multi=True)))
+    list_id = model.current_list()
+    key = ("list", list_id, version, pending, today, task_edit, request.path, args)
+    rendered = fragments.get(key)
+    if rendered is None:
+        rendered = render()
+        fragments.set(key, rendered)
+    return rendered
+
+
+@ui.context_processor
+def lists() -> dict:
+    """The current list of tasks and the names of the lists, for the list
+    switcher of the pages."""
+    return {"current_list": model.current_list(), "list_names": model.list_names}
+
 
 @ui.route("/")
 def index() -> Response:
@@ -23,6 +116,10 @@ def index() -> Response:
 @ui.route("/tasks/add", methods=["POST"])
 def tasks(task_id: int = None, action: str = None) -> Response:
     """The tasks page of the webapp
+    The list is paginated and can be filtered with the query parameters
+    `done` (1 or 0), `overdue` (1), `contains`, `sort` (id or end_date),
+    `limit`, and `after` (the cursor of the next page). With `q`, the tasks
+    matching a full-text search are listed instead, the most relevant first.
     Args:
         task_id (int, optional): The ID of the task. Defaults to None.
         action (str, optional): The action to perform on the task. Defaults to None.
@@ -34,7 +131,7 @@ def tasks(task_id: int = None, action: str = None) -> Response:
 
     if task_id and action:
         if action == "done":
-            model.update_task(task_id, not model.get_task(task_id)[3])
+            model.toggle_tasks([task_id])
             return redirect("/tasks")
         if action == "remove":
             model.remove_task(task_id)
@@ -48,20 +145,77 @@ def tasks(task_id: int = None, action: str = None) -> Response:
             )
             return redirect("/tasks")
 
-    tasks_header = [f.name for f in dataclasses.fields(model.Task)]
+    today = date.today()
+    query = request.args.get("q", "").strip()
+    if query:
+        rows, _ = render_list(
+            lambda: (search.search_tasks(query, PAGE_SIZE), None), today, task_id
+        )
+        return render_template("tasks.html", rows=rows, today=today, query=query)
 
-    tasks_map = list(
-        map(
-            lambda x: dict(zip(tasks_header, x)),
-            model.tasks_list(),
+    try:
+        rows, cursor = render_list(
+            lambda: model.query_tasks(**query_filters(request.args), today=today),
+            today,
+            task_id,
         )
+    except ValueError:
+        return redirect("/tasks")
+
+    return render_template(
+        "tasks.html",
+        rows=rows,
+        today=today,
+        first_page=(
+            url_for("ui.tasks", **{**request.args, "after": None})
+            if "after" in request.args
+            else None
+        ),
+        next_page=(
+            url_for("ui.tasks", **{**request.args, "after": cursor})
+            if cursor
+            else None
+        ),
     )
 
+
+@ui.route("/tasks/due")
+def tasks_due() -> Response:
+    """The not done tasks ending within the time span of the `within` query
+    parameter (like 3d or 2w, default 7d), the overdue ones first, paginated
+    with `limit` and `after` as the tasks page.
+    Returns:
+        Response: The tasks page."""
+    if not model.is_db():
+        return redirect("/")
+
+    today = date.today()
+    try:
+        within = scheduler.parse_within(
+            request.args.get("within", scheduler.DEFAULT_WITHIN)
+        )
+        rows, cursor = render_list(
+            lambda: scheduler.due_tasks(
+                within,
+                today,
+                request.args.get("after"),
+                request.args.get("limit", PAGE_SIZE, type=int),
+            ),
+            today,
+        )
+    except ValueError:
+        return redirect(url_for("ui.tasks_due"))
+
     return render_template(
         "tasks.html",
-        tasks=tasks_map,
-        today=date.today(),
-        task_edit=task_id,
+        rows=rows,
+        today=today,
+        due_by=today + within,
+        next_page=(
+            url_for("ui.tasks_due", **{**request.args, "after": cursor})
+            if cursor
+            else None
+        ),
     )
 
 
@@ -71,7 +225,7 @@ def tasks_edit() -> Response:
     Returns:
         Response: A redirect to the tasks page.
     """
-    task_id = request.form["task_id"]
+    task_id = int(request.form["task_id"])
 
     task_obj = model.Task(
         request.form["task_id"],
@@ -92,16 +246,17 @@ def tasks_action() -> Response:
 
 
 @ui.route("/tasks/download", methods=["POST"])
+@ui.route("/tasks/snapshot", methods=["POST"])
 def tasks_download() -> Response:
-    """Download the tasks list.
+    """Export the selected tasks, as CSV or as a snapshot, in the background.
     Returns:
-        Response: The CSV file containing the tasks.
+        Response: A redirect to the page of the export job.
     """
-    return Response(
-        services.export_tasks(list(map(int, request.form.getlist("tasks"))))[0],
-        mimetype="text/csv",
-        headers={"Content-disposition": "attachment; filename=tasks.csv"},
+    job = jobs.submit_export(
+        list(map(int, request.form.getlist("tasks"))),
+        "snapshot" if request.path.endswith("/snapshot") else "csv",
     )
+    return redirect(url_for("ui.tasks_job", job_id=job.id))
 
 
 @ui.route("/tasks/delete", methods=["POST"])
@@ -110,22 +265,44 @@ def tasks_delete() -> Response:
     Returns:
         Response: A redirect to the tasks page.
     """
-    for task in request.form.getlist("tasks"):
-        model.remove_task(int(task))
+    model.remove_tasks(list(map(int, request.form.getlist("tasks"))))
     return redirect("/tasks")
 
 
 @ui.route("/tasks/import", methods=["POST"])
 def tasks_import() -> Response:
-    """Import tasks from a CSV file.
+    """Import tasks from a CSV file or a snapshot in the background.
     Returns:
-        Response: A redirect to the tasks page.
+        Response: A redirect to the page of the import job.
     """
-    content = request.files["file"].read().decode("utf-8")
-    services.import_tasks(content)
-    abort(401)
+    file = request.files.get("file")
+    if not file:
+        return redirect("/tasks")
+    job = jobs.submit_import(save_upload(file))
+    return redirect(url_for("ui.tasks_job", job_id=job.id))
 
-    return redirect("/tasks")
+
+@ui.route("/tasks/jobs/<string:job_id>")
+def tasks_job(job_id: str) -> Response:
+    """The page of an import or export job, polling it until it is done.
+    Returns:
+        Response: The job page."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        abort(404)
+    return render_template("job.html", job=job)
+
+
+def save_upload(file: FileStorage) -> str:
+    """Save an uploaded file to a temporary file, without reading it in memory.
+    Args:
+        file (FileStorage): The uploaded file.
+    Returns:
+        str: The path of the temporary file."""
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(file.stream, f)
+    return path
 
 
 @ui.route("/init")
@@ -139,6 +316,8 @@ def init_db() -> Response:
 @ui.errorhandler(500)
 def internal_error(error: Exception) -> Response:
     """Handle 500 errors.
+    The cached database check is refreshed, in case the database was removed.
     Returns:
         Response: A 500 error page."""
+    model.is_db(refresh=True)
     return redirect("/tasks")
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""ASGI entry point serving the JSON task API on the async data layer.
+
+It answers the same /api/tasks routes as views.web.api without blocking a
+thread per request. Run it with an ASGI server, for example:
+    uvicorn views.web.asgi:app
+The list of tasks of a request is the one of its X-Tasks-List header or of its
+`list` query parameter, config["LIST"] by default.
+"""
+
+import json
+import logging
+import re
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import parse_qs
+from models import async_tasks as model
+from models.tasks import check_list, current_list, use_list
+from views.web.common import query_filters, task_fields, task_to_json
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """An error answered with a JSON body.
+
+    Attributes:
+        status (int): The HTTP status.
+        description (str): The error message.
+    """
+
+    def __init__(self, status: int, description: str) -> None:
+        super().__init__(description)
+        self.status = status
+        self.description = description
+
+
+class Request:
+    """The parts of an ASGI HTTP request used by the routes.
+
+    Attributes:
+        method (str): The HTTP method.
+        args (dict): The query parameters, one value per name.
+        headers (dict): The headers, with lowercase names.
+        body (bytes): The body.
+    """
+
+    def __init__(self, scope: dict, body: bytes) -> None:
+        self.method = scope["method"]
+        self.args = {
+            k: v[0] for k, v in parse_qs(scope["query_string"].decode()).items()
+        }
+        self.headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        self.body = body
+
+    def json(self, *fields: str) -> dict:
+        """Get the JSON body, see views.web.api.json_body()."""
+        try:
+            body = json.loads(self.body or b"null")
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or any(field not in body for field in fields):
+            raise HTTPError(400, f"A JSON object with {', '.join(fields)} is required.")
+        return body
+
+    def task(self, *fields: str) -> dict:
+        """Get the task fields of the JSON body, see views.web.api.json_task()."""
+        try:
+            return task_fields(self.json(*fields))
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from e
+
+    def ids(self) -> list[int]:
+        """Get the "ids" list of the JSON body, see views.web.api.json_ids()."""
+        ids = self.json("ids")["ids"]
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise HTTPError(400, "ids must be a list of integers.")
+        return ids
+
+
+async def conditional(request: Request, build) -> tuple:
+    """Answer a GET request, or a 304, see views.web.api.conditional()."""
+    version, modified = await model.table_version()
+    modified = modified.replace(microsecond=0)
+    etag = f'"tasks-{current_list()}-{version}"'
+    headers = {
+        "etag": etag,
+        "last-modified": format_datetime(
+            modified.replace(tzinfo=timezone.utc), usegmt=True
+        ),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match:
+        not_modified = etag in if_none_match or if_none_match.strip() == "*"
+    elif if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+            not_modified = since >= modified
+        except (TypeError, ValueError):
+            not_modified = False
+    else:
+        not_modified = False
+
+    if not_modified:
+        return 304, None, headers
+    status, body = await build()
+    return status, body, headers
+
+
+async def tasks_list(request: Request) -> tuple:
+    """List the tasks, paginated, see views.web.api.tasks_list()."""
+
+    async def build() -> tuple:
+        try:
+            tasks, cursor = await model.query_tasks(**query_filters(request.args))
+        except ValueError as e:
+            raise HTTPError(400, "Invalid sort, limit or cursor.") from e
+        return 200, {"tasks": list(map(task_to_json, tasks)), "next": cursor}
+
+    return await conditional(request, build)
+
+
+async def task_add(request: Request) -> tuple:
+    """Add a task, see views.web.api.task_add()."""
+    fields = request.task("task", "end_date")
+    task_id = await model.add_task(
+        fields["task"], fields["end_date"], fields.get("done", False)
+    )
+    return 201, task_to_json(await model.get_task(task_id))
+
+
+async def task_get(request: Request, task_id: int) -> tuple:
+    """Get a task, see views.web.api.task_get()."""
+
+    async def build() -> tuple:
+        task = await model.get_task(task_id)
+        if task is None:
+            raise HTTPError(404, f"Task {task_id} not found.")
+        return 200, task_to_json(task)
+
+    return await conditional(request, build)
+
+
+async def task_update(request: Request, task_id: int) -> tuple:
+    """Update a task, see views.web.api.task_update()."""
+    if not await model.patch_task(task_id, request.task()):
+        raise HTTPError(404, f"Task {task_id} not found.")
+    return 200, task_to_json(await model.get_task(task_id))
+
+
+async def task_remove(_: Request, task_id: int) -> tuple:
+    """Remove a task, see views.web.api.task_remove()."""
+    if not await model.remove_task(task_id):
+        raise HTTPError(404, f"Task {task_id} not found.")
+    return 204, None
+
+
+async def tasks_get(request: Request) -> tuple:
+    """Get several tasks, see views.web.api.tasks_get()."""
+    found, missing = await model.get_tasks(request.ids())
+    return 200, {"tasks": list(map(task_to_json, found)), "not_found": missing}
+
+
+async def tasks_remove(request: Request) -> tuple:
+    """Remove several tasks, see views.web.api.tasks_remove()."""
+    removed, missing = await model.remove_tasks(request.ids())
+    return 200, {"removed": removed, "not_found": missing}
+
+
+async def tasks_done(request: Request) -> tuple:
+    """Set or toggle the status of several tasks, see views.web.api.tasks_done()."""
+    ids = request.ids()
+    done = request.json().get("done")
+    if done is None:
+        updated, missing = await model.toggle_tasks(ids)
+    else:
+        updated, missing = await model.set_done(ids, request.task()["done"])
+    return 200, {"updated": updated, "not_found": missing}
+
+
+ROUTES = [
+    ("GET", re.compile(r"/api/tasks"), tasks_list),
+    ("POST", re.compile(r"/api/tasks"), task_add),
+    ("GET", re.compile(r"/api/tasks/(\d+)"), task_get),
+    ("PATCH", re.compile(r"/api/tasks/(\d+)"), task_update),
+    ("DELETE", re.compile(r"/api/tasks/(\d+)"), task_remove),
+    ("POST", re.compile(r"/api/tasks/batch/get"), tasks_get),
+    ("POST", re.compile(r"/api/tasks/batch/delete"), tasks_remove),
+    ("POST", re.compile(r"/api/tasks/batch/done"), tasks_done),
+]
+
+
+async def dispatch(request: Request, path: str) -> tuple:
+    """Call the route matching the request.
+    Returns:
+        tuple: The status, the JSON body and the extra headers."""
+    path_found = False
+    for method, pattern, route in ROUTES:
+        match = pattern.fullmatch(path)
+        if match is None:
+            continue
+        path_found = True
+        if method == request.method or (method, request.method) == ("GET", "HEAD"):
+            result = await route(request, *map(int, match.groups()))
+            return result if len(result) == 3 else (*result, {})
+    if path_found:
+        raise HTTPError(405, "Method not allowed.")
+    raise HTTPError(404, "Not found.")
+
+
+async def app(scope: dict, receive, send) -> None:
+    """The ASGI application: the JSON API over HTTP, no websocket.
+    Raises:
+        ValueError: If the scope type is not supported by the ASGI server."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await model.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "websocket":  # refuse the handshake, answered with a 403
+        await receive()
+        await send({"type": "websocket.close"})
+        return
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}.")
+
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    request = Request(scope, body)
+    try:
+        list_id = (
+            request.headers.get("x-tasks-list")
+            or request.args.get("list")
+            or current_list()
+        )
+        try:
+            check_list(list_id)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from e
+        with use_list(list_id):
+            status, content, headers = await dispatch(request, scope["path"])
+    except HTTPError as e:
+        status, content, headers = e.status, {"error": e.description}, {}
+    except Exception:  # answer in JSON, like the 500 handler of views.web.api
+        logger.exception("Error on %s %s", request.method, scope["path"])
+        status, content, headers = 500, {"error": "Internal server error."}, {}
+
+    payload = b"" if content is None else json.dumps(content).encode()
+    headers = {**headers, "content-length": str(len(payload))}
+    if content is not None:
+        headers["content-type"] = "application/json"
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+    if scope["method"] == "HEAD":
+        payload = b""
+    await send({"type": "http.response.body", "body": payload})
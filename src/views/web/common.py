@@ -0,0 +1,68 @@
+"""Helpers shared by the Flask webapp and the ASGI API, free of Flask so the
+ASGI app does not load it."""
+
+from collections.abc import Mapping
+from datetime import date
+from models.tasks import Task
+
+PAGE_SIZE = 50  # tasks per page on /tasks
+
+
+def task_to_json(task: tuple) -> dict:
+    """Convert a task row to a JSON object.
+    Args:
+        task (tuple): The task row.
+    Returns:
+        dict: The task as a JSON object."""
+    task = Task(*task)
+    return {
+        "id": task.id,
+        "task": task.task,
+        "end_date": task.end_date.isoformat(),
+        "done": task.done,
+        "guid": str(task.guid),
+    }
+
+
+def query_filters(args: Mapping[str, str]) -> dict:
+    """Map the query parameters of a listing of tasks (done, overdue, contains,
+    sort, after and limit) to the arguments of models.tasks.query_tasks().
+    Args:
+        args (Mapping[str, str]): The query parameters.
+    Returns:
+        dict: The keyword arguments of query_tasks().
+    Raises:
+        ValueError: If the limit is not an integer."""
+    return {
+        "done": {"1": True, "0": False}.get(args.get("done")),
+        "overdue": args.get("overdue") == "1",
+        "contains": args.get("contains"),
+        "order_by": args.get("sort", "id"),
+        "after": args.get("after"),
+        "limit": int(args.get("limit", PAGE_SIZE)),
+    }
+
+
+def task_fields(body: dict) -> dict:
+    """Check the task, end_date and done fields of a JSON body, the ones it has.
+    Args:
+        body (dict): The JSON body.
+    Returns:
+        dict: The fields found, end_date as a date.
+    Raises:
+        ValueError: If a field has the wrong type or value."""
+    fields = {}
+    if "task" in body:
+        if not isinstance(body["task"], str) or not body["task"].strip():
+            raise ValueError("task must be a non-empty string.")
+        fields["task"] = body["task"]
+    if "end_date" in body:
+        try:
+            fields["end_date"] = date.fromisoformat(body["end_date"])
+        except (TypeError, ValueError):
+            raise ValueError("end_date must be an ISO date, like 2030-12-31.") from None
+    if "done" in body:
+        if not isinstance(body["done"], bool):
+            raise ValueError("done must be true or false.")
+        fields["done"] = body["done"]
+    return fields
@@ -0,0 +1,142 @@
+"""Factory of the Flask webapp, see create_app()."""
+
+import math
+import time
+import sqlalchemy
+from flask import Flask, Response, abort, g, request
+from src import config
+from models import metrics
+from models import tasks as model
+from models import replicas
+from models import shards
+from views.web import app as pages
+from views.web.app import ui
+from views.web.api import api
+
+def create_app() -> None:
+    """Create the webapp."""
+
+    app = Flask(__name__)
+
+    app.register_blueprint(ui)
+    app.register_blueprint(api)
+    install_lists(app)
+    if replicas.read_engines:
+        install_read_pin(app)
+    model.is_db()  # check the schema once at startup, the result is cached
+    if config["METRICS"]:
+        install_metrics(app)
+    return app
+
+
+def install_lists(app: Flask) -> None:
+    """Make the list of tasks of each request the current one, see
+    models.tasks.current_list(): the one of the X-Tasks-List header, of the
+    `list` query parameter (remembered in a cookie), or of the cookie.
+    Args:
+        app (Flask): The webapp."""
+
+    @app.before_request
+    def set_list() -> None:
+        list_id = (
+            request.headers.get("X-Tasks-List")
+            or request.args.get("list")
+            or request.cookies.get("tasks_list")
+            or config["LIST"]
+        )
+        try:
+            g.list_token = model.set_list(list_id)
+        except ValueError as e:
+            abort(400, str(e))
+
+    @app.after_request
+    def remember_list(response: Response) -> Response:
+        if "list" in request.args and "list_token" in g:
+            response.set_cookie("tasks_list", model.current_list(), samesite="Lax")
+        response.vary.update(("Cookie", "X-Tasks-List"))
+        return response
+
+    @app.teardown_request
+    def reset_list(_) -> None:
+        token = g.pop("list_token", None)
+        if token is not None:
+            model.reset_list(token)
+
+
+def install_read_pin(app: Flask) -> None:
+    """Keep the reads of a client on the primary database for a while after
+    its writes, see models.replicas.pin_reads(): the end of the pin is kept in a
+    cookie, so the page a form redirects to shows the change.
+    Args:
+        app (Flask): The webapp."""
+
+    @app.before_request
+    def restore_pin() -> None:
+        try:
+            until = float(request.cookies.get("tasks_pinned_until", 0))
+        except ValueError:
+            until = 0
+        g.pin_token = replicas.pin_reads(until - time.time())
+
+    @app.after_request
+    def remember_pin(response: Response) -> Response:
+        left = replicas.pinned_for()
+        if left > 0:
+            response.set_cookie(
+                "tasks_pinned_until",
+                str(time.time() + left),
+                max_age=math.ceil(left),
+                samesite="Lax",
+            )
+        return response
+
+    @app.teardown_request
+    def reset_pin(_) -> None:
+        token = g.pop("pin_token", None)
+        if token is not None:
+            replicas.reset_pin(token)
+
+
+def install_metrics(app: Flask) -> None:
+    """Record the latency and the SQL statements of every request, and serve
+    them in the Prometheus text format on /metrics.
+    Args:
+        app (Flask): The webapp."""
+    # in sharded mode, the engines of the lists are created later: hook them all
+    metrics.instrument(model.engine if shards.router is None else sqlalchemy.Engine)
+    for read_engine in replicas.read_engines:
+        metrics.instrument(read_engine)
+
+    @app.before_request
+    def start_scope() -> None:
+        g.metrics_scope = metrics.Scope().start()
+
+    @app.after_request
+    def observe(response: Response) -> Response:
+        scope = g.pop("metrics_scope", None)
+        if scope is not None:
+            scope.stop()
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.observe_request(request.method, route, response.status_code, scope)
+        return response
+
+    @app.teardown_request
+    def stop_scope(_) -> None:
+        scope = g.pop("metrics_scope", None)
+        if scope is not None:
+            scope.stop()
+
+    @app.route("/metrics")
+    def metrics_endpoint() -> Response:
+        counters = {
+            f"tasks_cache_{name}_total": value
+            for name, value in model.cache_stats().items()
+        }
+        if pages.fragments is not None:
+            counters.update(
+                (f"tasks_render_cache_{name}_total", value)
+                for name, value in pages.fragments.stats.items()
+            )
+        return Response(
+            metrics.render(counters), mimetype="text/plain; version=0.0.4"
+        )
@@ -0,0 +1,27 @@
+"""Test configuration: the tests run on a temporary SQLite database, without
+the optional cache, write-behind buffer, replicas or shards."""
+
+import os
+import tempfile
+
+os.environ["TASKS_DATABASE_URL"] = (
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+)
+os.environ["TASKS_DEBUG"] = "False"
+for name in (
+    "TASKS_CACHE_SIZE",
+    "TASKS_WRITE_BEHIND_DELAY",
+    "TASKS_READ_URLS",
+    "TASKS_SHARDS_DIR",
+    "TASKS_LIST",
+):
+    os.environ.pop(name, None)
+
+import pytest  # noqa: E402
+from models import tasks as models  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database() -> None:
+    """Recreate the database before each test."""
+    models.create_database(force=True)
@@ -0,0 +1,76 @@
+"""Read cache of the tasks, see models.tasks._cached()."""
+
+from datetime import date
+import pytest
+from models import tasks as models
+from models.cache import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    models.set_cache(LRUCache(1000, 60))
+    yield models.cache
+    models.set_cache(None)
+
+
+def cached_tasks() -> list:
+    """Read all the tasks of the first page, through the cache."""
+    return [(task.task, task.done) for task in models.query_tasks()[0]]
+
+
+def test_reads_are_cached(cache):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    models.get_task(task_id)
+    cached_tasks()
+    hits = cache.stats["hits"]
+    models.get_task(task_id)
+    cached_tasks()
+    assert cache.stats["hits"] == hits + 2
+
+
+def test_update_invalidates_the_task_and_the_listings():
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    assert not models.get_task(task_id).done and cached_tasks() == [("Task", False)]
+    models.update_task(task_id, True)
+    assert models.get_task(task_id).done
+    assert cached_tasks() == [("Task", True)]
+    models.edit_task(task_id, models.Task(None, "Edited", date(2030, 1, 2)))
+    assert models.get_task(task_id).task == "Edited"
+    models.patch_task(task_id, {"done": False})
+    assert cached_tasks() == [("Edited", False)]
+
+
+def test_remove_invalidates_the_task_and_the_listings():
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    assert models.get_task(task_id) and cached_tasks()
+    models.remove_task(task_id)
+    assert models.get_task(task_id) is None
+    assert cached_tasks() == []
+
+
+def test_batch_writes_invalidate_their_tasks():
+    ids = [models.add_task(f"Task {i}", date(2030, 1, 1)) for i in range(3)]
+    assert len(models.get_tasks(ids)[0]) == 3 and len(cached_tasks()) == 3
+    models.set_done(ids[:2], True)
+    assert [task.done for task in models.get_tasks(ids)[0]] == [True, True, False]
+    models.toggle_tasks(ids)
+    assert [task.done for task in models.get_tasks(ids)[0]] == [False, False, True]
+    models.remove_tasks(ids[1:])
+    assert models.get_tasks(ids) == ([models.get_task(ids[0])], ids[1:])
+    assert cached_tasks() == [("Task 0", False)]
+    models.add_tasks([models.Task(None, "New", date(2030, 1, 1))])
+    assert cached_tasks() == [("Task 0", False), ("New", False)]
+
+
+def test_a_read_older_than_a_write_is_not_cached():
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    stale = models.get_task(task_id)
+    key = models._task_key(task_id)
+    models.cache.delete(key)
+
+    def load() -> tuple:
+        models.update_task(task_id, True)  # committed while the row is read
+        return stale
+
+    assert models._cached(key, load) == stale
+    assert models.get_task(task_id).done
@@ -0,0 +1,112 @@
+"""Isolation of the lists of tasks, in one database and in sharded mode, see
+models.tasks.current_list() and models.shards.ShardRouter."""
+
+from datetime import date
+import pytest
+from models import tasks as models
+from models import shards
+from models import sync
+from models.cache import LRUCache
+
+
+@pytest.fixture(params=["shared", "sharded"], autouse=True)
+def mode(request, monkeypatch, tmp_path) -> str:
+    if request.param == "sharded":
+        monkeypatch.setattr(shards, "router", shards.ShardRouter(str(tmp_path)))
+    return request.param
+
+
+def test_reads_only_see_the_current_list():
+    with models.use_list("work"):
+        work = models.add_task("Work", date(2030, 1, 1))
+    with models.use_list("home"):
+        home = models.add_task("Home", date(2030, 1, 2))
+        assert [task.task for task in models.tasks_list()] == ["Home"]
+        assert [task.task for task in models.query_tasks()[0]] == ["Home"]
+        if work != home:
+            assert models.get_task(work) is None
+            assert models.get_tasks([work, home])[1] == [work]
+    with models.use_list("work"):
+        assert [task.task for task in models.query_tasks()[0]] == ["Work"]
+        assert models.get_task(work).task == "Work"
+
+
+def test_writes_do_not_reach_another_list():
+    with models.use_list("work"):
+        work = models.add_task("Work", date(2030, 1, 1))
+    with models.use_list("home"):
+        assert not models.update_task(work, True)
+        assert not models.edit_task(work, models.Task(None, "Moved", date(2031, 1, 1)))
+        assert not models.patch_task(work, {"done": True})
+        assert models.toggle_tasks([work]) == ([], [work])
+        assert not models.remove_task(work)
+    with models.use_list("work"):
+        assert tuple(models.get_task(work))[1:4] == ("Work", date(2030, 1, 1), False)
+
+
+def test_shards_number_their_tasks_apart(mode):
+    with models.use_list("work"):
+        work = models.add_task("Work", date(2030, 1, 1))
+    with models.use_list("home"):
+        home = models.add_task("Home", date(2030, 1, 1))
+        assert (home == work) == (mode == "sharded")
+        models.update_task(home, True)
+    with models.use_list("work"):
+        assert not models.get_task(work).done
+
+
+def test_cached_reads_are_per_list():
+    models.set_cache(LRUCache(100, 60))
+    try:
+        with models.use_list("work"):
+            work = models.add_task("Work", date(2030, 1, 1))
+            assert models.get_task(work).task == "Work"
+            assert [task.task for task in models.query_tasks()[0]] == ["Work"]
+        with models.use_list("home"):
+            home = models.add_task("Home", date(2030, 1, 1))
+            assert models.get_task(home).task == "Home"
+            assert [task.task for task in models.query_tasks()[0]] == ["Home"]
+    finally:
+        models.set_cache(None)
+
+
+def test_versions_and_changes_are_per_list():
+    with models.use_list("work"):
+        models.add_task("Work", date(2030, 1, 1))
+        models.add_task("Work 2", date(2030, 1, 1))
+        work_version = models.table_version()[0]
+    with models.use_list("home"):
+        assert models.table_version()[0] == 0
+        models.add_task("Home", date(2030, 1, 1))
+        assert models.table_version()[0] == 1
+        changes = [change.task for batch in sync.iter_changes() for change in batch]
+        assert changes == ["Home"]
+    with models.use_list("work"):
+        assert models.table_version()[0] == work_version
+
+
+def test_merge_does_not_move_a_task_to_another_list(mode):
+    with models.use_list("work"):
+        models.add_task("Work", date(2030, 1, 1))
+        [[change]] = sync.iter_changes()
+    change.updated_at = change.updated_at.replace(year=change.updated_at.year + 1)
+    with models.use_list("home"):
+        # the uuids are unique in a database, not across the shards
+        expected = ["skipped"] if mode == "shared" else ["added"]
+        assert sync.merge_changes([change]) == expected
+    with models.use_list("work"):
+        assert [task.task for task in models.tasks_list()] == ["Work"]
+
+
+def test_list_names_are_the_written_lists_and_the_current_one():
+    assert models.list_names() == ["default"]
+    with models.use_list("work"):
+        models.add_task("Work", date(2030, 1, 1))
+    with models.use_list("home"):
+        assert models.list_names() == ["home", "work"]
+
+
+def test_invalid_list_names_are_rejected():
+    for name in ("", "-work", "../work", "work list", "w" * 65, None):
+        with pytest.raises(ValueError):
+            models.set_list(name)
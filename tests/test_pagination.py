@@ -0,0 +1,89 @@
+"""Keyset pagination of the listings, see models.tasks.query_tasks()."""
+
+from datetime import date
+import pytest
+from models import tasks as models
+
+END_DATES = [
+    date(2030, 1, 3),
+    date(2030, 1, 1),
+    date(2030, 1, 2),
+    date(2030, 1, 1),
+    date(2030, 1, 3),
+    date(2030, 1, 1),
+    date(2030, 1, 2),
+]  # several tasks end on the same day, the id breaks the ties
+
+
+@pytest.fixture
+def task_ids() -> list[int]:
+    return [
+        models.add_task(f"Task {i}", end_date) for i, end_date in enumerate(END_DATES)
+    ]
+
+
+def walk(limit: int, **filters) -> list[list[int]]:
+    """Read all the pages of a listing, following the cursors."""
+    pages, cursor = [], None
+    while True:
+        tasks, cursor = models.query_tasks(after=cursor, limit=limit, **filters)
+        pages.append([task.id for task in tasks])
+        if cursor is None:
+            return pages
+
+
+def test_pages_by_id(task_ids):
+    assert walk(3) == [task_ids[:3], task_ids[3:6], task_ids[6:]]
+    assert walk(7) == [task_ids]
+    assert walk(3, descending=True) == [
+        task_ids[:3:-1],
+        task_ids[3:0:-1],
+        task_ids[:1],
+    ]
+
+
+def test_pages_by_end_date_keep_the_ties(task_ids):
+    ends = dict(zip(task_ids, END_DATES))
+    expected = sorted(task_ids, key=lambda task_id: (ends[task_id], task_id))
+    for limit in (1, 2, 3, 7):
+        pages = walk(limit, order_by="end_date")
+        assert [task_id for page in pages for task_id in page] == expected
+        assert all(0 < len(page) <= limit for page in pages)
+    pages = walk(2, order_by="end_date", descending=True)
+    assert [task_id for page in pages for task_id in page] == expected[::-1]
+
+
+def test_cursor_of_a_tie_starts_after_it(task_ids):
+    tasks, cursor = models.query_tasks(order_by="end_date", limit=2)
+    assert [task.end_date for task in tasks] == [date(2030, 1, 1)] * 2
+    assert cursor == f"2030-01-01,{tasks[-1].id}"
+    ties = [
+        task_id for task_id, end in zip(task_ids, END_DATES) if end == date(2030, 1, 1)
+    ]
+    tasks, _ = models.query_tasks(order_by="end_date", after=cursor, limit=1)
+    assert (tasks[0].id, tasks[0].end_date) == (max(ties), date(2030, 1, 1))
+
+
+def test_pages_of_a_filter(task_ids):
+    models.set_done(task_ids[::2], True)
+    pages = walk(2, done=True, order_by="end_date")
+    assert sorted(task_id for page in pages for task_id in page) == task_ids[::2]
+    assert models.query_tasks(done=True, after=str(task_ids[-1]), limit=2) == ([], None)
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"after": "next"},
+        {"after": "2030-01-01"},
+        {"after": "2030-01-01,1", "order_by": "id"},
+        {"after": "tomorrow,1", "order_by": "end_date"},
+        {"after": "1", "order_by": "end_date"},
+        {"order_by": "task"},
+        {"limit": 0},
+        {"limit": -1},
+    ],
+)
+def test_invalid_arguments_raise(task_ids, arguments):
+    with pytest.raises(ValueError):
+        models.query_tasks(**{"limit": 2, **arguments})
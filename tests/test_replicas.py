@@ -0,0 +1,105 @@
+"""Reads from a replica, see models.replicas: the read pin after a write, and
+the changes read up to a watermark. The replica is a copy of the database,
+refreshed by the tests only."""
+
+import sqlite3
+from datetime import date
+import pytest
+from models import tasks as models
+from models import replicas
+from models import sync
+from models.cache import LRUCache
+from views.web import create_app
+
+
+def refresh(path: str) -> None:
+    """Copy the database to the replica."""
+    source = sqlite3.connect(models.engine.url.database)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+
+
+@pytest.fixture
+def replica(monkeypatch, tmp_path):
+    path = str(tmp_path / "replica.db")
+    refresh(path)
+    engine = models.build_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(replicas, "read_engines", [engine])
+    token = replicas.pin_reads(0)
+    yield path
+    replicas.reset_pin(token)
+    engine.dispose()
+
+
+def test_reads_go_to_the_replica(replica):
+    assert replicas.read_engine() is replicas.read_engines[0]
+    assert replicas.pinned_for() == 0
+
+
+def test_a_write_pins_the_reads_to_the_primary(replica):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    assert 0 < replicas.pinned_for() <= 1  # TASKS_READ_PIN, 1 s by default
+    assert replicas.read_engine() is models.get_engine()
+    assert models.get_task(task_id).task == "Task"
+    models.update_task(task_id, True)
+    assert models.get_task(task_id).done
+
+    replicas.pin_reads(0)
+    assert models.get_task(task_id) is None  # the replica is behind
+    refresh(replica)
+    assert models.get_task(task_id).done
+
+
+def test_the_pin_can_be_reset(replica):
+    token = replicas.pin_reads(60)
+    assert replicas.read_engine() is models.get_engine()
+    replicas.reset_pin(token)
+    assert replicas.read_engine() is replicas.read_engines[0]
+
+
+def test_reads_of_a_stale_replica_are_not_cached(replica):
+    models.set_cache(LRUCache(100, 60))
+    try:
+        task_id = models.add_task("Task", date(2030, 1, 1))
+        replicas.pin_reads(0)
+        assert models.get_task(task_id) is None
+        refresh(replica)
+        assert models.get_task(task_id).task == "Task"
+    finally:
+        models.set_cache(None)
+
+
+def test_changes_are_read_up_to_the_watermark_of_the_replica(replica):
+    models.add_task("First", date(2030, 1, 1))
+    refresh(replica)
+    models.add_task("Second", date(2030, 1, 1))
+    replicas.pin_reads(0)
+
+    with replicas.stick_reads() as engine:
+        assert engine is replicas.read_engines[0]
+        until = sync.last_change()
+        changes = sync.iter_changes(None, until)
+    assert until == 1
+    assert [change.task for batch in changes for change in batch] == ["First"]
+
+    refresh(replica)
+    with replicas.stick_reads():
+        since, until = until, sync.last_change()
+        changes = sync.iter_changes(since, until)
+    assert until == 2
+    assert [change.task for batch in changes for change in batch] == ["Second"]
+
+
+def test_web_clients_read_their_writes(replica):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    refresh(replica)
+    client = create_app().test_client()
+    response = client.patch(f"/api/tasks/{task_id}", json={"done": True})
+    assert response.status_code == 200
+    assert "tasks_pinned_until" in response.headers["Set-Cookie"]
+    assert client.get(f"/api/tasks/{task_id}").json["done"]  # pinned by the cookie
+
+    client.delete_cookie("tasks_pinned_until")
+    assert not client.get(f"/api/tasks/{task_id}").json["done"]
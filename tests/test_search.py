@@ -0,0 +1,21 @@
+"""Search of the tasks, see models.search."""
+
+from datetime import date
+import pytest
+from models import search
+from models import tasks as models
+
+
+def test_index_check_follows_the_schema():
+    if not models._has_fts5(models.engine):
+        pytest.skip("SQLite without FTS5")
+    assert search.has_index()
+    with models.engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP TABLE {models.FTS_TABLE}")
+        models.metadata.drop_all(connection)
+    assert not search.has_index(refresh=True)
+
+    assert models.create_database()
+    assert search.has_index()
+    models.add_task("Buy milk", date(2030, 1, 1))
+    assert [task.task for task in search.search_tasks("milk")] == ["Buy milk"]
@@ -0,0 +1,117 @@
+"""Snapshot export and import, see services.snapshot_manager."""
+
+import struct
+import uuid
+from datetime import date
+import pytest
+from models import tasks as models
+from models import task_batch
+from services import csv_manager
+from services import snapshot_manager as snapshots
+
+TASKS = [
+    ("Buy milk", date(2030, 1, 1), False),
+    ("Tâche accentuée ✅", date(1, 1, 1), True),
+    ("", date(9999, 12, 31), False),
+    ("Call, \"quoted\"\nnew line", date(2030, 6, 15), True),
+]
+
+
+@pytest.fixture()
+def seeded() -> list:
+    """Add the tasks, and get them without their id."""
+    models.add_tasks(
+        [models.Task(None, task, end, done, uuid.uuid4()) for task, end, done in TASKS]
+    )
+    return all_tasks()
+
+
+def all_tasks() -> list:
+    """Every task, without its id."""
+    return [row[1:] for batch in task_batch.iter_tasks() for row in batch.rows()]
+
+
+def clear() -> None:
+    with models.engine.begin() as connection:
+        connection.execute(models.tasks_table.delete())
+
+
+def snapshot(tmp_path) -> bytes:
+    """Export every task to a snapshot, and get its content."""
+    path = tmp_path / "tasks.snap"
+    snapshots.export_snapshot(str(path))
+    return path.read_bytes()
+
+
+def test_round_trip(seeded, tmp_path):
+    path = tmp_path / "tasks.snap"
+    assert snapshots.export_snapshot(str(path)) == []
+    clear()
+    added, skipped = snapshots.import_snapshot(str(path))
+    assert len(added) == len(TASKS) and skipped == []
+    assert all_tasks() == seeded
+
+    added, skipped = snapshots.import_snapshot(path.read_bytes())
+    assert added == [] and len(skipped) == len(TASKS)  # already imported
+
+
+def test_round_trip_matches_csv(seeded, tmp_path):
+    content = snapshot(tmp_path)
+    csv_content = "".join(csv_manager.export_tasks([])[0])
+    clear()
+    snapshots.import_snapshot(content)
+    from_snapshot = all_tasks()
+    clear()
+    csv_manager.import_tasks(csv_content)
+    assert all_tasks() == from_snapshot == seeded
+
+
+def test_export_of_some_tasks(seeded, tmp_path):
+    ids = [task.id for task in models.query_tasks()[0]]
+    path = tmp_path / "some.snap"
+    assert snapshots.export_snapshot(str(path), [ids[1], 999]) == [999]
+    clear()
+    snapshots.import_snapshot(str(path))
+    assert all_tasks() == [seeded[1]]
+
+
+def test_not_a_snapshot():
+    with pytest.raises(ValueError, match="Not a tasks snapshot"):
+        snapshots.import_snapshot(b"id,task,end_date,done,guid\n")
+
+
+@pytest.mark.parametrize("size", [4, snapshots.HEADER.size, -1])
+def test_truncated_snapshot(seeded, tmp_path, size):
+    content = snapshot(tmp_path)
+    clear()
+    with pytest.raises(ValueError):
+        snapshots.import_snapshot(content[:size])
+    assert all_tasks() == []
+
+
+def corrupt(content: bytes, column: str, index: int, fmt: str, value: int) -> bytes:
+    """Overwrite a value of a column of a snapshot."""
+    _, count, _ = snapshots.HEADER.unpack_from(content)
+    offset = snapshots._layout(count)[column] + index * struct.calcsize(fmt)
+    content = bytearray(content)
+    struct.pack_into(fmt, content, offset, value)
+    return bytes(content)
+
+
+@pytest.mark.parametrize(
+    "column, index, fmt, value",
+    [
+        ("offsets", 2, "<Q", 1),  # before the previous offset
+        ("offsets", 0, "<Q", 1),  # not at the start of the blob
+        ("offsets", len(TASKS), "<Q", 5),  # not at the end of the blob
+        ("end_dates", 0, "<i", 0),
+        ("end_dates", 2, "<i", date.max.toordinal() + 1),
+        ("done", 1, "<B", 7),
+    ],
+)
+def test_corrupted_snapshot(seeded, tmp_path, column, index, fmt, value):
+    content = corrupt(snapshot(tmp_path), column, index, fmt, value)
+    clear()
+    with pytest.raises(ValueError, match="Corrupted tasks snapshot"):
+        snapshots.import_snapshot(content)
+    assert all_tasks() == []
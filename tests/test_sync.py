@@ -0,0 +1,132 @@
+"""Conflict resolution of the delta sync, see models.sync.merge_changes()."""
+
+import uuid
+from datetime import date, timedelta
+from models import tasks as models
+from models import sync
+
+LATER = timedelta(seconds=1)
+
+
+def local(task_id: int) -> sync.Change:
+    """The local version of a task, as a change."""
+    row = models.get_task(task_id)
+    return next(
+        change
+        for batch in sync.iter_changes()
+        for change in batch
+        if change.guid == row.uuid and not change.deleted
+    )
+
+
+def edit(
+    change: sync.Change, delta: timedelta, task: str, **fields
+) -> sync.Change:
+    """A remote edit of the task of a change, `delta` after it."""
+    return sync.Change(
+        change.guid,
+        change.updated_at + delta,
+        False,
+        task,
+        fields.get("end_date", change.end_date),
+        fields.get("done", change.done),
+    )
+
+
+def test_older_edit_is_skipped():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    older = edit(local(task_id), -LATER, "Old")
+    assert sync.merge_changes([older]) == ["skipped"]
+    assert models.get_task(task_id).task == "Local"
+
+
+def test_newer_edit_wins():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    newer = edit(
+        local(task_id), LATER, "Remote", end_date=date(2030, 2, 1), done=True
+    )
+    assert sync.merge_changes([newer]) == ["updated"]
+    assert tuple(models.get_task(task_id))[1:4] == ("Remote", date(2030, 2, 1), True)
+
+
+def test_duplicate_merge_is_skipped():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    newer = edit(local(task_id), LATER, "Remote")
+    assert sync.merge_changes([newer, newer]) == ["updated", "skipped"]
+    assert sync.merge_changes([newer]) == ["skipped"]
+    assert models.get_task(task_id).task == "Remote"
+
+
+def test_tie_is_broken_the_same_way_in_any_order():
+    mine = local(models.add_task("Local", date(2030, 1, 1)))
+    first, second = edit(mine, LATER, "Remote"), edit(mine, LATER, "Tie")
+    assert sync.merge_changes([first, second]) == ["skipped", "updated"]
+    assert sync.merge_changes([first]) == ["skipped"]
+
+    models.create_database(force=True)
+    task_id = models.add_task("Local", date(2030, 1, 1), guid=mine.guid)
+    assert sync.merge_changes([second, first]) == ["updated", "skipped"]
+    assert models.get_task(task_id).task == "Tie"  # "Tie" > "Remote"
+
+
+def test_removal_wins_a_tie_with_an_edit():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    newer = edit(local(task_id), LATER, "Remote")
+    removal = sync.Change(newer.guid, newer.updated_at, True)
+    assert sync.merge_changes([newer, removal]) == ["skipped", "deleted"]
+    assert models.get_task(task_id) is None
+    assert sync.merge_changes([newer]) == ["skipped"]
+
+
+def test_newer_edit_revives_a_removed_task():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    mine = local(task_id)
+    models.remove_task(task_id)
+    assert sync.merge_changes([edit(mine, -LATER, "Old")]) == ["skipped"]
+    assert sync.merge_changes([edit(mine, timedelta(days=1), "Back")]) == ["added"]
+    assert [task.task for task in models.query_tasks()[0]] == ["Back"]
+
+
+def test_local_edit_survives_an_older_removal():
+    task_id = models.add_task("Fresh", date(2030, 1, 1))
+    models.update_task(task_id, True)
+    mine = local(task_id)
+    removal = sync.Change(mine.guid, mine.updated_at - LATER, True)
+    assert sync.merge_changes([removal]) == ["skipped"]
+    assert models.get_task(task_id).done
+
+
+def test_unknown_task_removed_leaves_a_tombstone():
+    guid = uuid.uuid4()
+    now = models.utcnow()
+    changes = [
+        sync.Change(guid, now, False, "New", date(2030, 1, 1)),
+        sync.Change(guid, now + LATER, True),
+    ]
+    assert sync.merge_changes(changes) == ["skipped", "deleted"]
+    removed = [c for batch in sync.iter_changes() for c in batch if c.guid == guid]
+    assert [c.deleted for c in removed] == [True]
+
+
+def test_merged_changes_are_passed_on():
+    task_id = models.add_task("Local", date(2030, 1, 1))
+    since = sync.last_change()
+    newer = edit(local(task_id), LATER, "Remote")
+    assert sync.merge_changes([newer]) == ["updated"]
+    sent = [c for batch in sync.iter_changes(since) for c in batch]
+    assert [(c.task, c.updated_at) for c in sent] == [("Remote", newer.updated_at)]
+
+
+def test_change_numbers_follow_the_writes():
+    done_id = models.add_task("Done", date(2030, 1, 1))
+    removed_id = models.add_task("Removed", date(2030, 1, 1))
+    first = sync.last_change()
+    assert not models.update_task(removed_id + 1, True)
+    assert sync.last_change() == first  # a write changing nothing
+    models.update_task(done_id, True)
+    models.remove_task(removed_id)
+    assert sync.last_change() == first + 2
+    changes = [c for batch in sync.iter_changes(first, first + 1) for c in batch]
+    assert [(c.deleted, c.done) for c in changes] == [(False, True)]
+    changes = [c for batch in sync.iter_changes(first + 1) for c in batch]
+    assert [c.deleted for c in changes] == [True]
@@ -0,0 +1,111 @@
+"""In-memory index of the tasks of the shell, see models.task_index.TaskIndex:
+it catches up with every write, and answers like models.tasks.query_tasks()."""
+
+from datetime import date, timedelta
+import pytest
+from models import tasks as models
+from models import sync
+from models.task_index import TaskIndex
+
+TODAY = date(2030, 1, 10)
+
+
+@pytest.fixture
+def index() -> TaskIndex:
+    for i in range(6):
+        models.add_task(f"Task {i}", TODAY + timedelta(days=i % 3 - 1), i % 2 == 0)
+    index = TaskIndex()
+    index.catch_up()
+    return index
+
+
+def assert_same(index: TaskIndex) -> None:
+    """Check the listings of the index against the ones of the database."""
+    for arguments in (
+        {},
+        {"order_by": "end_date"},
+        {"done": False, "order_by": "end_date"},
+        {"overdue": True},
+        {"limit": 2},
+        {"order_by": "end_date", "limit": 2, "after": f"{TODAY.isoformat()},3"},
+    ):
+        rows, cursor = models.query_tasks(today=TODAY, **arguments)
+        expected = [tuple(row) for row in rows], cursor
+        rows, cursor = index.query_tasks(today=TODAY, **arguments)
+        assert ([tuple(row) for row in rows], cursor) == expected, arguments
+
+
+def test_catches_up_with_the_writes(index):
+    assert_same(index)
+    task_id = models.add_task("Added", TODAY)
+    assert_same(index)
+    models.update_task(task_id, True)
+    models.toggle_tasks([1, 2])
+    assert_same(index)
+    models.edit_task(3, models.Task(None, "Edited", TODAY - timedelta(days=5)))
+    models.patch_task(4, {"end_date": TODAY + timedelta(days=9)})
+    assert_same(index)
+    models.remove_tasks([task_id, 5])
+    assert_same(index)
+    assert index.get_task(5) is None and index.get_task(3).task == "Edited"
+    assert index.version == models.table_version()[0]
+
+
+def test_catches_up_with_the_merged_changes(index):
+    changes = [change for batch in sync.iter_changes() for change in batch]
+    removed = sync.Change(changes[0].guid, changes[0].updated_at + timedelta(1), True)
+    edited = sync.Change(
+        changes[1].guid, changes[1].updated_at + timedelta(1), False, "Merged", TODAY
+    )
+    assert sync.merge_changes([removed, edited]) == ["deleted", "updated"]
+    assert_same(index)
+    revived = sync.Change(
+        changes[0].guid, changes[0].updated_at + timedelta(2), False, "Back", TODAY
+    )
+    assert sync.merge_changes([revived]) == ["added"]
+    assert_same(index)
+    assert [row.task for row in index.query_tasks(contains="back")[0]] == ["Back"]
+
+
+def test_does_not_reload_an_unchanged_list(index, monkeypatch):
+    monkeypatch.setattr(index, "_reload", lambda guids: pytest.fail("reloaded"))
+    index.catch_up()
+    index.query_tasks()
+
+
+def test_reset_loads_the_list_again(index):
+    models.add_task("Added", TODAY)
+    index.reset()
+    assert index.version is None
+    assert_same(index)
+
+
+@pytest.mark.parametrize(
+    ("task", "contains"),
+    [
+        ("Buy MILK", "milk"),
+        ("50% off", "50%"),
+        ("snake_case", "e_c"),
+    ],
+)
+def test_contains_matches_like_sql_on_ascii(task, contains):
+    models.add_task(task, TODAY)
+    models.add_task("Other", TODAY)
+    expected = [row.task for row in models.query_tasks(contains=contains)[0]]
+    assert expected == [task]
+    assert [row.task for row in TaskIndex().query_tasks(contains=contains)[0]] == [task]
+
+
+@pytest.mark.parametrize(
+    ("task", "contains"),
+    [
+        ("Écrire", "écrire"),
+        ("Straße", "STRASSE"),
+    ],
+)
+def test_contains_also_ignores_the_case_of_other_letters(task, contains):
+    """SQLite's LIKE only ignores the case of ASCII letters, the index
+    compares the casefolded texts."""
+    models.add_task(task, TODAY)
+    assert models.query_tasks(contains=contains)[0] == []
+    assert [row.task for row in TaskIndex().query_tasks(contains=contains)[0]] == [task]
@@ -0,0 +1,115 @@
+"""Write-behind buffer of the status changes and edits, see
+models.write_behind.WriteBuffer."""
+
+import logging
+import time
+from datetime import date
+import pytest
+from models import tasks as models
+from models import write_behind
+from models import sync
+
+
+@pytest.fixture()
+def buffer():
+    buffer = write_behind.WriteBuffer(60, 100)  # flushed by the tests only
+    write_behind.set_write_buffer(buffer)
+    yield buffer
+    write_behind.set_write_buffer(None)
+
+
+def committed(task_id: int) -> tuple:
+    """The row of a task in the database, without the buffered changes."""
+    stmt = models._select_tasks.where(models.tasks_table.c.id == task_id)
+    with models.get_engine().begin() as connection:
+        return connection.execute(stmt).fetchone()
+
+
+def test_two_toggles_cancel_out(buffer):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    models.toggle_tasks([task_id])
+    models.toggle_tasks([task_id])
+    assert buffer.stats["merged"] == 1
+    version = sync.last_change()
+    assert not models.get_task(task_id).done
+    assert sync.last_change() == version  # nothing left to commit
+
+
+def test_a_status_set_wins(buffer):
+    first = models.add_task("First", date(2030, 1, 1))
+    second = models.add_task("Second", date(2030, 1, 1))
+    models.toggle_tasks([first, second])
+    models.set_done([first], False)  # a set replaces the toggle
+    models.set_done([second], True)
+    models.toggle_tasks([second])  # a toggle flips the set
+    buffer.flush()
+    assert not committed(first).done and not committed(second).done
+    models.toggle_tasks([first])
+    buffer.flush()
+    assert committed(first).done
+
+
+def test_the_last_edit_wins(buffer):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    models.edit_task(task_id, models.Task(None, "First", date(2030, 1, 2)))
+    models.edit_task(task_id, models.Task(None, "Last", date(2030, 1, 3)))
+    buffer.flush()
+    assert tuple(committed(task_id))[1:3] == ("Last", date(2030, 1, 3))
+
+
+def test_edits_are_committed_to_their_list(buffer):
+    home = models.add_task("Home", date(2030, 1, 1))
+    with models.use_list("work"):
+        work = models.add_task("Work", date(2030, 1, 1))
+        models.edit_task(work, models.Task(None, "Work edited", date(2030, 1, 1)))
+        models.update_task(home, True)  # not a task of this list
+    models.edit_task(home, models.Task(None, "Home edited", date(2030, 1, 1)))
+    buffer.flush()
+    assert committed(home).task == "Home edited" and not committed(home).done
+    assert committed(work).task == "Work edited"
+    with models.use_list("work"):
+        assert models.get_task(home) is None
+
+
+def test_reads_see_the_buffer_without_flushing_it(buffer):
+    ids = [models.add_task(f"Task {i}", date(2030, 1, 1)) for i in range(3)]
+    models.toggle_tasks(ids[:2])
+    models.edit_task(ids[2], models.Task(None, "Edited", date(2030, 1, 2)))
+    version = models.table_version()[0]
+    assert models.get_task(ids[0]).done
+    assert [task.done for task in models.get_tasks(ids)[0]] == [True, True, False]
+    tasks, _ = models.query_tasks(limit=10)
+    assert [(task.task, task.done) for task in tasks] == [
+        ("Task 0", True),
+        ("Task 1", True),
+        ("Edited", False),
+    ]
+    assert write_behind.pending_writes()[0] == 3
+    assert buffer.stats["flushes"] == 0 and models.table_version()[0] == version
+
+    tasks, _ = models.query_tasks(done=True)  # filters on a buffered field
+    assert buffer.stats["flushes"] == 1
+    assert [task.id for task in tasks] == ids[:2]
+
+
+def test_a_failed_flush_is_retried(buffer, monkeypatch, caplog):
+    task_id = models.add_task("Task", date(2030, 1, 1))
+    commit = buffer._commit
+    failures = []
+
+    def fail_once(list_id: str) -> None:
+        if not failures:
+            failures.append(list_id)
+            raise RuntimeError("database unavailable")
+        commit(list_id)
+
+    monkeypatch.setattr(buffer, "_commit", fail_once)
+    buffer.delay = 0.01
+    with caplog.at_level(logging.ERROR, logger=models.__name__):
+        models.update_task(task_id, True)
+        deadline = time.monotonic() + 5
+        while buffer.stats["flushes"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert failures and buffer.stats["flushes"] == 1
+    assert "Could not commit the buffered writes" in caplog.text
+    assert committed(task_id).done